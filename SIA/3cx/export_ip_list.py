@@ -1,6 +1,7 @@
 import csv
 import ipaddress
 import json
+import sys
 
 """
     This Script can be used to:
@@ -76,9 +77,23 @@ def csv_to_json(csv_file, json_file):
         json.dump(whitelist, file, indent=4)
 
 
-# Example usage:
-csv_file = r"C:\Users\ery\Desktop\Whitelist_IP.csv"
-json_file = r"C:\Users\ery\Desktop\IP_Whitelist.json"
+def main(csv_file=None, json_file=None):
+    """
+    Write the JSON whitelist for an IP list and print the CIDR of every range.
+
+    Args:
+        csv_file (path): path to csv file containing the IP's, defaults to the first command line argument
+        json_file (path): output path of the json file, defaults to the second command line argument
+    """
+    if csv_file is None:
+        if len(sys.argv) != 3:
+            print("Usage: python export_ip_list.py <ip_list.csv> <whitelist.json>")
+            sys.exit(1)
+        csv_file, json_file = sys.argv[1], sys.argv[2]
+
+    csv_to_json(csv_file, json_file)
+    CIDR_from_csv(csv_file)
+
 
-csv_to_json(csv_file, json_file)
-CIDR_from_csv(csv_file)
+if __name__ == "__main__":
+    main()
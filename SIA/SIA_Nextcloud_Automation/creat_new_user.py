@@ -1,5 +1,6 @@
 import csv
 import os
+import sys
 import time
 
 import pandas as pd
@@ -67,9 +68,8 @@ def create_new_user(driver, user):
     create_button.click()
 
 
-def main():
+def main(input_csv):
     driver = webdriver.Chrome()
-    input_csv = r"C:\coding\test_Data\nextcloud_test.CSV"
 
     login_nav_cloud(driver)
     users = read_new_user_list(input_csv)
@@ -85,4 +85,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1])
@@ -1,5 +1,6 @@
 import csv
 import os
+import sys
 import time
 
 import pandas as pd
@@ -119,4 +120,4 @@ def main(input_csv):
 
 
 if __name__ == "__main__":
-    main()
+    main(sys.argv[1])
@@ -0,0 +1,301 @@
+# __main__.py
+"""
+Command line entry point for the SIA jobs.
+
+Usage: python -m SIA <job> [options]
+
+Only the module of the job that runs is imported, so heavy dependencies
+(pandas, Selenium) and configuration (.env files, API sessions) are loaded
+on demand and `--help` starts immediately.
+"""
+
+import argparse
+import importlib
+
+ARTIKEL5_EXPORTS = {
+    "artikel5-by-name": (
+        "export_by_name",
+        "Look up companies by name.",
+    ),
+    "artikel5-by-uid": (
+        "export_by_uid",
+        "Look up companies by UID.",
+    ),
+    "artikel5-by-name-and-legal-seat-id": (
+        "export_by_name_and_legal_seat_id",
+        "Look up companies by name and legal seat ID.",
+    ),
+    "artikel5-by-name-and-city": (
+        "export_by_name_and_city",
+        "Look up companies by name and check their legal seat against the city.",
+    ),
+    "artikel5-cascade": (
+        "export_cascade",
+        "Look up companies by UID, then by name and legal seat ID, city or name only.",
+    ),
+}
+
+
+def run_artikel5(args):
+    module = importlib.import_module(f"SIA.artikel5.{args.module}")
+    options = {
+        "engine": args.engine,
+        "max_concurrency": args.max_concurrency,
+        "chunksize": args.chunksize,
+        "journal": args.journal,
+        "checkpoint_every": args.checkpoint_every,
+        "delta": args.delta,
+        "revalidate_after": args.revalidate_after,
+        "output_format": args.output_format,
+        "delimiter": args.delimiter,
+        "encoding": args.encoding,
+        "columns": args.columns.split(",") if args.columns else None,
+    }
+    module.compare_and_update(args.input, args.output, **options)
+
+
+def run_artikel5_shard(args):
+    from SIA.artikel5 import shard
+
+    for path in shard.split(
+        args.input,
+        args.output_prefix,
+        args.shards,
+        args.key.split(","),
+        delimiter=args.delimiter,
+        encoding=args.encoding,
+    ):
+        print(path)
+
+
+def run_artikel5_merge(args):
+    from SIA.artikel5 import shard
+
+    shard.merge(args.shard_outputs, args.output, format=args.output_format)
+    print(f"Merged {len(args.shard_outputs)} shards into {args.output}.")
+
+
+def run_shab_export(args):
+    from SIA.shab import export_shab
+
+    options = {"max_workers": args.max_workers} if args.max_workers else {}
+    if args.archive:
+        options["archive_path"] = args.archive
+    if args.window_days:
+        options["window_days"] = args.window_days
+    if args.index:
+        options["index_path"] = args.index
+    if args.replay:
+        options["replay"] = True
+    if args.config:
+        export_shab.main(args.config, **options)
+    else:
+        export_shab.main(**options)
+
+
+def run_shab_daily(args):
+    from SIA.shab import export_shab_daily_cron
+
+    options = {"max_workers": args.max_workers} if args.max_workers else {}
+    if args.state:
+        options["state_path"] = args.state
+    if args.archive:
+        options["archive_path"] = args.archive
+    if args.window_days:
+        options["window_days"] = args.window_days
+    export_shab_daily_cron.main(
+        [args.start_date, args.output_path] if args.output_path else [], **options
+    )
+
+
+def run_3cx_whitelist(args):
+    export_ip_list = importlib.import_module("SIA.3cx.export_ip_list")
+    export_ip_list.csv_to_json(args.input, args.output)
+
+
+def run_3cx_cidr(args):
+    export_ip_list = importlib.import_module("SIA.3cx.export_ip_list")
+    export_ip_list.CIDR_from_csv(args.input)
+
+
+def run_nextcloud_create_users(args):
+    from SIA.SIA_Nextcloud_Automation import creat_new_user
+
+    creat_new_user.main(args.input)
+
+
+def run_nextcloud_search_users(args):
+    from SIA.SIA_Nextcloud_Automation import search_for_user
+
+    search_for_user.main(args.input)
+
+
+def build_parser():
+    """
+    Build the argument parser with one subcommand per job.
+
+    Returns:
+        ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog="python -m SIA",
+        description="Run an SIA job. Only the modules of the selected job are imported.",
+    )
+    jobs = parser.add_subparsers(dest="job", metavar="<job>", required=True)
+
+    for job, (module, help) in ARTIKEL5_EXPORTS.items():
+        subparser = jobs.add_parser(job, help=help, description=help)
+        subparser.set_defaults(func=run_artikel5, module=module)
+        subparser.add_argument("input", help="The input CSV file.")
+        subparser.add_argument(
+            "output", help="The output file (.csv, .parquet or .arrows)."
+        )
+        subparser.add_argument(
+            "--engine", choices=["thread", "async"], default="thread"
+        )
+        subparser.add_argument("--max-concurrency", type=int, default=32)
+        subparser.add_argument(
+            "--chunksize", type=int, help="Process the input this many rows at a time."
+        )
+        subparser.add_argument("--journal", help="Checkpoint journal to resume from.")
+        subparser.add_argument("--checkpoint-every", type=int, default=1000)
+        subparser.add_argument(
+            "--delta", help="Fingerprint store for incremental runs."
+        )
+        subparser.add_argument(
+            "--revalidate-after",
+            type=float,
+            help="Look up rows again whose stored results are older than this many days.",
+        )
+        subparser.add_argument("--output-format", choices=["csv", "parquet", "arrow"])
+        subparser.add_argument("--delimiter", help="Detected if not given.")
+        subparser.add_argument("--encoding", help="Detected if not given.")
+        subparser.add_argument(
+            "--columns",
+            help="The comma-separated input columns to keep besides the lookup columns.",
+        )
+
+    subparser = jobs.add_parser(
+        "artikel5-shard",
+        help="Split an input CSV file into shards by the hash of the lookup key.",
+    )
+    subparser.set_defaults(func=run_artikel5_shard)
+    subparser.add_argument("input", help="The input CSV file.")
+    subparser.add_argument("output_prefix", help="The path prefix of the shard files.")
+    subparser.add_argument("--shards", type=int, required=True)
+    subparser.add_argument(
+        "--key",
+        required=True,
+        help="The comma-separated lookup key columns, e.g. uid or name,legalSeatId.",
+    )
+    subparser.add_argument("--delimiter", help="Detected if not given.")
+    subparser.add_argument("--encoding", help="Detected if not given.")
+
+    subparser = jobs.add_parser(
+        "artikel5-merge",
+        help="Merge the outputs of the shards in the order of the input.",
+    )
+    subparser.set_defaults(func=run_artikel5_merge)
+    subparser.add_argument("output", help="The merged output file.")
+    subparser.add_argument("shard_outputs", nargs="+", help="The shard output files.")
+    subparser.add_argument("--output-format", choices=["csv", "parquet", "arrow"])
+
+    subparser = jobs.add_parser(
+        "shab-export",
+        help="Export SHAB publications matching the filter configuration.",
+    )
+    subparser.set_defaults(func=run_shab_export)
+    subparser.add_argument("--config", help="The filter configuration (INI) file.")
+    subparser.add_argument(
+        "--archive",
+        help="The archive of raw publications (default: SHAB_ARCHIVE_PATH).",
+    )
+    subparser.add_argument(
+        "--replay",
+        action="store_true",
+        help="Rebuild the export from the archive or the index without network access.",
+    )
+    subparser.add_argument(
+        "--index",
+        help="Search the keywords in this local full-text index (default: SHAB_INDEX_PATH).",
+    )
+    subparser.add_argument(
+        "--max-workers",
+        type=int,
+        help="Requests to amtsblattportal at the same time (default: SHAB_MAX_WORKERS or 8).",
+    )
+    subparser.add_argument(
+        "--window-days",
+        type=int,
+        help="Days per publication list query (default: SHAB_WINDOW_DAYS or 7).",
+    )
+
+    subparser = jobs.add_parser(
+        "shab-daily", help="Export the new SHAB entries since a date."
+    )
+    subparser.set_defaults(func=run_shab_daily)
+    subparser.add_argument(
+        "start_date", nargs="?", help="The start date of the first run (YYYY-MM-DD)."
+    )
+    subparser.add_argument("output_path", nargs="?", help="The output directory.")
+    subparser.add_argument(
+        "--state", help="The state file remembering what earlier runs exported."
+    )
+    subparser.add_argument(
+        "--archive",
+        help="The archive of raw publications (default: SHAB_ARCHIVE_PATH).",
+    )
+    subparser.add_argument(
+        "--max-workers",
+        type=int,
+        help="Requests to amtsblattportal at the same time (default: SHAB_MAX_WORKERS or 8).",
+    )
+    subparser.add_argument(
+        "--window-days",
+        type=int,
+        help="Days per publication list query (default: SHAB_WINDOW_DAYS or 7).",
+    )
+
+    subparser = jobs.add_parser(
+        "3cx-whitelist", help="Convert a 3CX IP list (CSV) to a JSON whitelist."
+    )
+    subparser.set_defaults(func=run_3cx_whitelist)
+    subparser.add_argument("input", help="The IP list CSV file.")
+    subparser.add_argument("output", help="The JSON whitelist file.")
+
+    subparser = jobs.add_parser(
+        "3cx-cidr", help="Print the CIDR of every IP range in a 3CX IP list."
+    )
+    subparser.set_defaults(func=run_3cx_cidr)
+    subparser.add_argument("input", help="The IP list CSV file.")
+
+    subparser = jobs.add_parser(
+        "nextcloud-create-users",
+        help="Create the Nextcloud users listed in a CSV file.",
+    )
+    subparser.set_defaults(func=run_nextcloud_create_users)
+    subparser.add_argument("input", help="The user list CSV file.")
+
+    subparser = jobs.add_parser(
+        "nextcloud-search-users",
+        help="Check which users listed in a CSV file exist in Nextcloud.",
+    )
+    subparser.set_defaults(func=run_nextcloud_search_users)
+    subparser.add_argument("input", help="The user list CSV file.")
+
+    return parser
+
+
+def main(argv=None):
+    """
+    Run the job selected on the command line.
+
+    Args:
+        argv (list, optional): The command line arguments, defaults to sys.argv[1:].
+    """
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# async_engine.py
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+from ..metrics import endpoint_label, metrics
+from .ratelimit import RETRYABLE_STATUS_CODES, backoff_delay, parse_retry_after
+from .utils import interpret_response
+
+MAX_RETRIES = 5
+
+
+async def _fetch(
+    client, semaphore, api_endpoint, params, cache, rate_limiter, circuit_breaker
+):
+    if cache is not None:
+        cached = cache.get(api_endpoint, params)
+        endpoint = endpoint_label(api_endpoint)
+        if cached is not None:
+            metrics.inc("cache_hits_total", endpoint=endpoint)
+            return cached
+        metrics.inc("cache_misses_total", endpoint=endpoint)
+
+    async with semaphore:
+        for attempt in range(MAX_RETRIES + 1):
+            if circuit_breaker is not None and not circuit_breaker.allow():
+                return [], None
+            if rate_limiter is not None:
+                await asyncio.sleep(rate_limiter.reserve())
+
+            start = time.perf_counter()
+            try:
+                async with client.post(api_endpoint, json=params) as response:
+                    status_code = response.status
+                    retry_after = response.headers.get("Retry-After")
+                    content = await response.read()
+            except Exception:
+                status_code = None
+                content = b""
+            metrics.observe_request(
+                api_endpoint, time.perf_counter() - start, status_code, len(content)
+            )
+
+            if status_code is not None and status_code not in RETRYABLE_STATUS_CODES:
+                if rate_limiter is not None:
+                    rate_limiter.on_success()
+                if circuit_breaker is not None:
+                    circuit_breaker.record_success()
+                data, success = interpret_response(status_code, content)
+                if cache is not None and success is not None:
+                    cache.set(api_endpoint, params, data, success)
+                return data, success
+
+            if status_code == 429:
+                if rate_limiter is not None:
+                    rate_limiter.on_throttle(parse_retry_after(retry_after))
+                if circuit_breaker is not None:
+                    circuit_breaker.record_throttle()
+            elif circuit_breaker is not None:
+                circuit_breaker.record_failure()
+            if attempt < MAX_RETRIES:
+                metrics.inc("http_retries_total", endpoint=endpoint_label(api_endpoint))
+                await asyncio.sleep(backoff_delay(attempt))
+
+    return [], None
+
+
+async def _fetch_all(
+    requests, max_concurrency, auth, cache, rate_limiter, circuit_breaker
+):
+    connector = aiohttp.TCPConnector(limit=max_concurrency, keepalive_timeout=60)
+    async with aiohttp.ClientSession(connector=connector, auth=auth) as client:
+        semaphore = asyncio.Semaphore(max_concurrency)
+        return await asyncio.gather(
+            *(
+                _fetch(
+                    client,
+                    semaphore,
+                    api_endpoint,
+                    params,
+                    cache,
+                    rate_limiter,
+                    circuit_breaker,
+                )
+                for api_endpoint, params in requests
+            )
+        )
+
+
+def fetch_all(
+    requests,
+    max_concurrency,
+    username,
+    password,
+    cache=None,
+    rate_limiter=None,
+    circuit_breaker=None,
+):
+    """
+    Send Zefix API requests concurrently on an asyncio event loop.
+
+    At most `max_concurrency` requests are in flight at once, sharing a
+    keep-alive connection pool of the same size.
+
+    Args:
+        requests (list): A list of (api_endpoint, params) tuples.
+        max_concurrency (int): The maximum number of concurrent requests.
+        username (str): The username for the API.
+        password (str): The password for the API.
+        cache (ResponseCache, optional): A response cache consulted before the API is called.
+        rate_limiter (AdaptiveRateLimiter, optional): A rate limiter shared by all requests.
+        circuit_breaker (CircuitBreaker, optional): A circuit breaker shared by all requests.
+
+    Returns:
+        list: A list of (data, success) tuples in the order of `requests`, retried like `fetch_data_from_api`.
+    """
+    if aiohttp is None:
+        raise ImportError("The async engine requires aiohttp (pip install aiohttp).")
+
+    auth = aiohttp.BasicAuth(username, password)
+    return asyncio.run(
+        _fetch_all(
+            requests, max_concurrency, auth, cache, rate_limiter, circuit_breaker
+        )
+    )
@@ -0,0 +1,90 @@
+# generate.py
+import csv
+import hashlib
+import random
+
+from ..uid import check_digit, format_uid
+
+CITIES = [
+    ("Zürich", 261),
+    ("Bern", 351),
+    ("Basel", 2701),
+    ("Genève", 6621),
+    ("Lausanne", 5586),
+    ("Luzern", 1061),
+    ("St. Gallen", 3203),
+    ("Winterthur", 230),
+]
+
+
+def stable_hash(value):
+    """
+    Hash a value the same way in every process (unlike the built-in `hash`).
+
+    Args:
+        value (str): The value to hash.
+
+    Returns:
+        int: The hash.
+    """
+    return int(hashlib.md5(str(value).encode("utf-8")).hexdigest(), 16)
+
+
+def make_uid(number):
+    """
+    Build a valid Swiss UID from an 8-digit number by appending its check digit.
+
+    Numbers whose check digit would be 10 are not valid UIDs, so the next
+    number is used instead.
+
+    Args:
+        number (int): A number below 10**8.
+
+    Returns:
+        str: The UID in the format "CHE-123.456.789".
+    """
+    number %= 10**8
+    while check_digit(number) is None:
+        number = (number + 1) % 10**8
+    return format_uid(number * 10 + check_digit(number))
+
+
+def generate_input(
+    path,
+    rows,
+    duplicate_ratio=0.3,
+    invalid_uid_ratio=0.0,
+    delimiter=";",
+    encoding="ISO-8859-1",
+    seed=0,
+):
+    """
+    Write a synthetic input CSV file for the artikel5 exports.
+
+    The file has the columns used by all exports (name, legalSeatId, uid, city),
+    so the same file can drive every export.
+
+    Args:
+        path (str): The path to the CSV file to write.
+        rows (int): The number of rows.
+        duplicate_ratio (float): The share of rows repeating a company of an earlier row.
+        invalid_uid_ratio (float): The share of rows with a malformed UID.
+        delimiter (str): The delimiter of the CSV file.
+        encoding (str): The encoding of the CSV file.
+        seed (int): The seed of the random generator.
+    """
+    rng = random.Random(seed)
+    distinct = max(1, int(rows * (1 - duplicate_ratio)))
+    with open(path, "w", newline="", encoding=encoding) as csv_file:
+        writer = csv.writer(csv_file, delimiter=delimiter)
+        writer.writerow(["id", "name", "legalSeatId", "uid", "city"])
+        for i in range(rows):
+            company = i if i < distinct else rng.randrange(distinct)
+            name = f"Firma {company} AG"
+            # The mock server puts the first search result at the same seat
+            city, legal_seat_id = CITIES[stable_hash(f"{name}/0") % len(CITIES)]
+            if rng.random() < invalid_uid_ratio:
+                uid = f"CHE-{rng.randrange(10**6):06d}"
+            else:
+                uid = make_uid(company * 7919 % 10**8).replace("-", "").replace(".", "")
+            writer.writerow([i, name, legal_seat_id, uid, city])
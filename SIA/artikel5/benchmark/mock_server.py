@@ -0,0 +1,181 @@
+# mock_server.py
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .generate import CITIES, make_uid, stable_hash as _hash
+
+
+class MockZefixServer:
+    """
+    Local stand-in for the Zefix REST API.
+
+    POST requests to `<url>` are answered like a name search and POST requests
+    to `<url><uid>` like a UID lookup. Responses are deterministic per name or
+    UID, so repeated runs see the same data.
+    """
+
+    def __init__(
+        self,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        rate_limit=None,
+        fanout=1,
+        not_found_rate=0.1,
+        port=0,
+    ):
+        """
+        Create the server. Call `start` to serve requests.
+
+        Args:
+            latency (float): The mean response time in seconds.
+            jitter (float): The maximum random deviation from `latency` in seconds.
+            error_rate (float): The share of requests answered with HTTP 503.
+            rate_limit (float, optional): Requests per second above which HTTP 429 is returned.
+            fanout (int): The number of results returned by a name search.
+            not_found_rate (float): The share of names and UIDs that are not found.
+            port (int): The port to listen on, 0 picks a free port.
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.fanout = fanout
+        self.not_found_rate = not_found_rate
+        self.latencies = []
+        self.status_counts = {}
+        self._window = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        """
+        str: The API endpoint URL to use as API_ENDPOINT.
+        """
+        return f"http://127.0.0.1:{self._server.server_port}/api/v1/company/"
+
+    def start(self):
+        """
+        Serve requests in a background thread.
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stop serving requests and close the socket.
+        """
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_stats(self):
+        """
+        Clear the recorded latencies and status counts.
+        """
+        with self._lock:
+            self.latencies = []
+            self.status_counts = {}
+
+    def _throttled(self):
+        if not self.rate_limit:
+            return False
+        with self._lock:
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 1.0]
+            if len(self._window) >= self.rate_limit:
+                return True
+            self._window.append(now)
+            return False
+
+    def _respond(self, path, params):
+        if self._throttled():
+            return 429, None
+        if random.random() < self.error_rate:
+            return 503, None
+
+        lookup = path.rsplit("/", 1)[-1]
+        if lookup:
+            if _hash(lookup) % 1000 < self.not_found_rate * 1000:
+                return 404, None
+            return 200, [self._company(lookup, _hash(lookup), lookup)]
+
+        name = params.get("name", "")
+        if _hash(name) % 1000 < self.not_found_rate * 1000:
+            return 404, None
+        companies = [
+            self._company(
+                name if i == 0 else f"{name} {i}",
+                _hash(f"{name}/{i}"),
+                make_uid(_hash(f"{name}/{i}") % 10**8),
+            )
+            for i in range(self.fanout)
+        ]
+        if params.get("legalSeatId") not in (None, ""):
+            for company in companies:
+                company["legalSeatId"] = params["legalSeatId"]
+        return 200, companies
+
+    @staticmethod
+    def _company(name, seed, uid):
+        city, legal_seat_id = CITIES[seed % len(CITIES)]
+        return {
+            "name": name,
+            "uid": uid.replace("-", "").replace(".", ""),
+            "chid": f"CH{seed % 10**11:011d}",
+            "legalSeat": city,
+            "legalSeatId": legal_seat_id,
+            "status": "ACTIVE",
+            "address": {
+                "street": "Musterstrasse",
+                "houseNumber": str(seed % 200 + 1),
+                "swissZipCode": str(1000 + seed % 8999),
+                "city": city,
+            },
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                start = time.perf_counter()
+                length = int(self.headers.get("Content-Length", 0))
+                params = json.loads(self.rfile.read(length) or b"{}")
+                if server.latency or server.jitter:
+                    time.sleep(
+                        max(
+                            0.0,
+                            server.latency
+                            + random.uniform(-server.jitter, server.jitter),
+                        )
+                    )
+                status, data = server._respond(self.path, params)
+                body = json.dumps(data).encode("utf-8") if data is not None else b""
+
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                if status == 429:
+                    self.send_header("Retry-After", "1")
+                self.end_headers()
+                self.wfile.write(body)
+
+                with server._lock:
+                    server.latencies.append(time.perf_counter() - start)
+                    server.status_counts[status] = (
+                        server.status_counts.get(status, 0) + 1
+                    )
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,66 @@
+# mock_server_test.py
+import pytest
+import requests
+
+from SIA.artikel5.benchmark.mock_server import MockZefixServer
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(**options):
+        server = MockZefixServer(**options).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def test_name_search(serve):
+    server = serve(fanout=3, not_found_rate=0.0)
+    response = requests.post(server.url, json={"name": "Muster AG"})
+    assert response.status_code == 200
+    companies = response.json()
+    assert [company["name"] for company in companies] == [
+        "Muster AG",
+        "Muster AG 1",
+        "Muster AG 2",
+    ]
+    # Responses are the same for every request
+    assert requests.post(server.url, json={"name": "Muster AG"}).json() == companies
+
+    response = requests.post(server.url, json={"name": "Muster AG", "legalSeatId": 351})
+    assert {company["legalSeatId"] for company in response.json()} == {351}
+
+
+def test_uid_lookup(serve):
+    server = serve(not_found_rate=0.0)
+    response = requests.post(server.url + "CHE109322551", json={})
+    assert response.status_code == 200
+    assert [company["uid"] for company in response.json()] == ["CHE109322551"]
+
+
+def test_not_found(serve):
+    server = serve(not_found_rate=1.0)
+    assert requests.post(server.url, json={"name": "Muster AG"}).status_code == 404
+    assert requests.post(server.url + "CHE109322551", json={}).status_code == 404
+
+
+def test_errors(serve):
+    server = serve(error_rate=1.0)
+    response = requests.post(server.url, json={"name": "Muster AG"})
+    assert (response.status_code, response.content) == (503, b"")
+
+
+def test_rate_limit(serve):
+    server = serve(rate_limit=2, not_found_rate=0.0)
+    statuses = [requests.post(server.url, json={"name": "Muster AG"}) for _ in range(3)]
+    assert [response.status_code for response in statuses] == [200, 200, 429]
+    assert statuses[2].headers["Retry-After"] == "1"
+    assert server.status_counts == {200: 2, 429: 1}
+    assert len(server.latencies) == 3
+    server.reset_stats()
+    assert (server.status_counts, server.latencies) == ({}, [])
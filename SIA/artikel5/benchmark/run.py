@@ -0,0 +1,246 @@
+# run.py
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import time
+
+from .generate import generate_input
+from .mock_server import MockZefixServer
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+EXPORTS = {
+    "name": ("export_by_name", ";", "ISO-8859-1"),
+    "uid": ("export_by_uid", ";", "ISO-8859-1"),
+    "name_and_legal_seat_id": ("export_by_name_and_legal_seat_id", ";", "ISO-8859-1"),
+    "name_and_city": ("export_by_name_and_city", ",", "UTF-8"),
+    "cascade": ("export_cascade", ";", "ISO-8859-1"),
+}
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_export(module_name, input_csv, output_csv, env, options, repeat, queue):
+    # Runs in a fresh process, so the configuration is read from `env` and
+    # the peak RSS only covers this export
+    os.environ.update(env)
+    import importlib
+
+    module = importlib.import_module(f"SIA.artikel5.{module_name}")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        module.compare_and_update(input_csv, output_csv, **options)
+        queue.put(
+            {"seconds": time.perf_counter() - start, "peak_rss_mb": _peak_rss_mb()}
+        )
+
+
+def percentile(values, percent):
+    """
+    Compute a percentile of a list of values.
+
+    Args:
+        values (list): The values.
+        percent (int): The percentile, between 1 and 99.
+
+    Returns:
+        float: The percentile, or None if there are fewer than two values.
+    """
+    if len(values) < 2:
+        return None
+    return statistics.quantiles(values, n=100)[percent - 1]
+
+
+def run_benchmark(
+    exports,
+    rows,
+    server_options,
+    pipeline_options,
+    duplicate_ratio=0.3,
+    repeat=1,
+    client_rate=None,
+    workdir=None,
+):
+    """
+    Run the artikel5 exports against a mock Zefix server and measure them.
+
+    Every export runs in its own process with a fresh response cache. With
+    `repeat` > 1 the later runs reuse the cache of the first one, which
+    measures cache-hot runs.
+
+    Args:
+        exports (list): The names of the exports to run, keys of EXPORTS.
+        rows (int): The number of input rows.
+        server_options (dict): Options for `MockZefixServer`.
+        pipeline_options (dict): Options for `compare_and_update`, e.g. engine and max_concurrency.
+        duplicate_ratio (float): The share of duplicate companies in the input.
+        repeat (int): The number of runs per export.
+        client_rate (float, optional): The initial and maximum client request rate, overriding ZEFIX_RATE/ZEFIX_MAX_RATE.
+        workdir (str, optional): The directory for input, output and cache files.
+
+    Returns:
+        list: One result dictionary per export and run.
+    """
+    workdir = workdir or tempfile.mkdtemp(prefix="artikel5_benchmark_")
+    inputs = {}
+    for delimiter, encoding in {(d, e) for _, d, e in EXPORTS.values()}:
+        path = os.path.join(workdir, f"input_{encoding}.csv")
+        generate_input(
+            path,
+            rows,
+            duplicate_ratio=duplicate_ratio,
+            delimiter=delimiter,
+            encoding=encoding,
+        )
+        inputs[(delimiter, encoding)] = path
+
+    server = MockZefixServer(**server_options).start()
+    context = multiprocessing.get_context("spawn")
+    results = []
+    try:
+        for export in exports:
+            module_name, delimiter, encoding = EXPORTS[export]
+            env = {
+                "API_ENDPOINT": server.url,
+                "USERNAME": "benchmark",
+                "PASSWORD": "benchmark",
+                "ZEFIX_CACHE_PATH": os.path.join(workdir, f"cache_{export}.sqlite3"),
+            }
+            if client_rate:
+                env["ZEFIX_RATE"] = env["ZEFIX_MAX_RATE"] = str(client_rate)
+
+            queue = context.Queue()
+            server.reset_stats()
+            process = context.Process(
+                target=_run_export,
+                args=(
+                    module_name,
+                    inputs[(delimiter, encoding)],
+                    os.path.join(workdir, f"output_{export}.csv"),
+                    env,
+                    pipeline_options,
+                    repeat,
+                    queue,
+                ),
+            )
+            process.start()
+            for run in range(repeat):
+                measurement = queue.get()
+                latencies = server.latencies
+                server.reset_stats()
+                results.append(
+                    {
+                        "export": export,
+                        "run": run + 1,
+                        "rows": rows,
+                        "seconds": measurement["seconds"],
+                        "rows_per_sec": rows / measurement["seconds"],
+                        "requests": len(latencies),
+                        "latency_p50_ms": _ms(percentile(latencies, 50)),
+                        "latency_p95_ms": _ms(percentile(latencies, 95)),
+                        "latency_p99_ms": _ms(percentile(latencies, 99)),
+                        "peak_rss_mb": measurement["peak_rss_mb"],
+                    }
+                )
+            process.join()
+    finally:
+        server.stop()
+    return results
+
+
+def _ms(seconds):
+    return None if seconds is None else seconds * 1000
+
+
+def print_results(results):
+    """
+    Print benchmark results as a table.
+
+    Args:
+        results (list): The result dictionaries returned by `run_benchmark`.
+    """
+    columns = [
+        ("export", "{}"),
+        ("run", "{}"),
+        ("rows_per_sec", "{:.1f}"),
+        ("requests", "{}"),
+        ("latency_p50_ms", "{:.1f}"),
+        ("latency_p95_ms", "{:.1f}"),
+        ("latency_p99_ms", "{:.1f}"),
+        ("peak_rss_mb", "{:.1f}"),
+    ]
+    print("  ".join(f"{name:>22}" for name, _ in columns))
+    for result in results:
+        print(
+            "  ".join(
+                f"{(fmt.format(result[name]) if result[name] is not None else '-'):>22}"
+                for name, fmt in columns
+            )
+        )
+
+
+def main():
+    """
+    Command line entry point of the benchmark runner.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the artikel5 exports against a local mock Zefix server."
+    )
+    parser.add_argument("--exports", default=",".join(EXPORTS))
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--duplicate-ratio", type=float, default=0.3)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--fanout", type=int, default=1)
+    parser.add_argument("--not-found-rate", type=float, default=0.1)
+    parser.add_argument("--engine", default="thread", choices=["thread", "async"])
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--chunksize", type=int, default=None)
+    parser.add_argument("--client-rate", type=float, default=None)
+    parser.add_argument("--workdir", default=None)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        args.exports.split(","),
+        args.rows,
+        server_options={
+            "latency": args.latency,
+            "jitter": args.jitter,
+            "error_rate": args.error_rate,
+            "rate_limit": args.rate_limit,
+            "fanout": args.fanout,
+            "not_found_rate": args.not_found_rate,
+        },
+        pipeline_options={
+            "engine": args.engine,
+            "max_concurrency": args.max_concurrency,
+            "chunksize": args.chunksize,
+        },
+        duplicate_ratio=args.duplicate_ratio,
+        repeat=args.repeat,
+        client_rate=args.client_rate,
+        workdir=args.workdir,
+    )
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump(results, json_file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
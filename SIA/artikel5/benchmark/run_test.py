@@ -0,0 +1,35 @@
+# run_test.py
+from SIA.artikel5.benchmark.run import percentile, run_benchmark
+
+
+def test_percentile():
+    assert percentile([1.0], 50) is None
+    assert percentile([1.0, 2.0, 3.0], 50) == 2.0
+
+
+def test_run_benchmark(tmp_path):
+    results = run_benchmark(
+        ["name", "uid"],
+        20,
+        server_options={"not_found_rate": 0.0},
+        pipeline_options={"max_concurrency": 4},
+        repeat=2,
+        workdir=str(tmp_path),
+    )
+    assert [(result["export"], result["run"]) for result in results] == [
+        ("name", 1),
+        ("name", 2),
+        ("uid", 1),
+        ("uid", 2),
+    ]
+    for result in results:
+        assert result["rows"] == 20
+        assert result["rows_per_sec"] == 20 / result["seconds"]
+        assert result["peak_rss_mb"] is None or result["peak_rss_mb"] > 0
+    # The first run looks up every distinct company, the second one is
+    # answered from the response cache
+    cold, hot = results[0], results[1]
+    assert cold["requests"] == 14
+    assert cold["latency_p50_ms"] <= cold["latency_p95_ms"] <= cold["latency_p99_ms"]
+    assert (hot["requests"], hot["latency_p50_ms"]) == (0, None)
+    assert (tmp_path / "output_name.csv").exists()
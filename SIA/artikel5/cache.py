@@ -0,0 +1,158 @@
+# cache.py
+import json
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache for Zefix API responses.
+
+    Entries are keyed by the endpoint and the canonicalized request parameters.
+    Successful lookups live for `ttl` seconds, "not found" lookups for
+    `negative_ttl` seconds. Once more than `max_entries` entries are stored,
+    the least recently used ones are evicted.
+    """
+
+    def __init__(
+        self, path, ttl=7 * 24 * 3600, negative_ttl=24 * 3600, max_entries=500000
+    ):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            path (str): The path to the SQLite database file.
+            ttl (int): Lifetime of successful lookups in seconds.
+            negative_ttl (int): Lifetime of "not found" lookups in seconds.
+            max_entries (int): Maximum number of entries kept in the cache.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                data TEXT NOT NULL,
+                success INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)"
+        )
+        self._connection.commit()
+        (self._count,) = self._connection.execute(
+            "SELECT COUNT(*) FROM responses"
+        ).fetchone()
+
+    @staticmethod
+    def make_key(api_endpoint, params):
+        """
+        Build the cache key for a request.
+
+        Args:
+            api_endpoint (str): The API endpoint URL.
+            params (dict): The parameters for the API request.
+
+        Returns:
+            str: The cache key.
+        """
+        return api_endpoint + "\n" + json.dumps(params, sort_keys=True, default=str)
+
+    def get(self, api_endpoint, params):
+        """
+        Look up a cached response.
+
+        Args:
+            api_endpoint (str): The API endpoint URL.
+            params (dict): The parameters for the API request.
+
+        Returns:
+            tuple: The cached (data, success) tuple, or None if there is no valid entry.
+        """
+        key = self.make_key(api_endpoint, params)
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT data, success, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[2] < now:
+                self.misses += 1
+                return None
+            self._connection.execute(
+                "UPDATE responses SET last_access = ? WHERE key = ?", (now, key)
+            )
+            self._connection.commit()
+            self.hits += 1
+        return json.loads(row[0]), bool(row[1])
+
+    def set(self, api_endpoint, params, data, success):
+        """
+        Store a response in the cache and evict old entries if the cache is full.
+
+        Args:
+            api_endpoint (str): The API endpoint URL.
+            params (dict): The parameters for the API request.
+            data (list): The data returned from the API.
+            success (bool): Whether the lookup found a result.
+        """
+        key = self.make_key(api_endpoint, params)
+        now = time.time()
+        expires_at = now + (self.ttl if success else self.negative_ttl)
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(data), int(success), expires_at, now),
+            )
+            # Replaced keys are counted too, so this only over-estimates the size
+            self._count += 1
+            if self._count > self.max_entries:
+                self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        self._connection.execute(
+            "DELETE FROM responses WHERE expires_at < ?", (time.time(),)
+        )
+        self._connection.execute(
+            """
+            DELETE FROM responses WHERE key IN (
+                SELECT key FROM responses ORDER BY last_access LIMIT
+                MAX((SELECT COUNT(*) FROM responses) - ?, 0)
+            )
+            """,
+            (self.max_entries,),
+        )
+        (self._count,) = self._connection.execute(
+            "SELECT COUNT(*) FROM responses"
+        ).fetchone()
+
+    def stats(self):
+        """
+        Get the hit/miss counters of the cache.
+
+        Returns:
+            dict: A dictionary with the number of hits, misses and the hit rate.
+        """
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        """
+        Close the underlying database connection.
+        """
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,53 @@
+# cache_test.py
+import pytest
+
+from SIA.artikel5.cache import ResponseCache
+
+ENDPOINT = "https://www.zefix.admin.ch/ZefixPublicREST/api/v1/company/search"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2)
+    yield cache
+    cache.close()
+
+
+def test_get_and_set(cache):
+    assert cache.get(ENDPOINT, {"name": "Muster AG"}) is None
+    cache.set(ENDPOINT, {"name": "Muster AG", "activeOnly": True}, [{"uid": "1"}], True)
+    # The parameters are canonicalized, so their order does not matter
+    assert cache.get(ENDPOINT, {"activeOnly": True, "name": "Muster AG"}) == (
+        [{"uid": "1"}],
+        True,
+    )
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_negative_entries_expire(cache):
+    cache.negative_ttl = -1
+    cache.set(ENDPOINT, {"name": "Beta GmbH"}, [], False)
+    assert cache.get(ENDPOINT, {"name": "Beta GmbH"}) is None
+
+
+def test_least_recently_used_entries_are_evicted(cache):
+    for name in ["a", "b"]:
+        cache.set(ENDPOINT, {"name": name}, [name], True)
+    assert cache.get(ENDPOINT, {"name": "a"}) is not None
+    cache.set(ENDPOINT, {"name": "c"}, ["c"], True)
+    assert cache.get(ENDPOINT, {"name": "b"}) is None
+    assert cache.get(ENDPOINT, {"name": "a"}) == (["a"], True)
+    assert cache.get(ENDPOINT, {"name": "c"}) == (["c"], True)
+
+
+def test_entries_persist(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    cache.set(ENDPOINT, {"uid": "CHE109322551"}, [{"name": "Muster AG"}], True)
+    cache.close()
+    cache = ResponseCache(path)
+    assert cache.get(ENDPOINT, {"uid": "CHE109322551"}) == (
+        [{"name": "Muster AG"}],
+        True,
+    )
+    cache.close()
@@ -4,11 +4,54 @@ import requests
 from dotenv import load_dotenv
 from requests.auth import HTTPBasicAuth
 
+from .cache import ResponseCache
+from .mirror import ZefixMirror
+from .ratelimit import AdaptiveRateLimiter, CircuitBreaker
+
 load_dotenv()
 
-api_endpoint = os.environ["API_ENDPOINT"]
-username = os.environ["USERNAME"]
-password = os.environ["PASSWORD"]
+
+def require_env(name):
+    """
+    Read a required environment variable.
+
+    Args:
+        name (str): The name of the variable.
+
+    Returns:
+        str: The value of the variable.
+    """
+    try:
+        return os.environ[name]
+    except KeyError:
+        raise RuntimeError(
+            f"{name} is not set. Set it in the environment or in a .env file."
+        ) from None
+
+
+api_endpoint = require_env("API_ENDPOINT")
+username = require_env("USERNAME")
+password = require_env("PASSWORD")
 
 session = requests.Session()
 session.auth = HTTPBasicAuth(username, password)
+
+cache = ResponseCache(
+    os.environ.get("ZEFIX_CACHE_PATH", "zefix_cache.sqlite3"),
+    ttl=int(os.environ.get("ZEFIX_CACHE_TTL", 7 * 24 * 3600)),
+    negative_ttl=int(os.environ.get("ZEFIX_CACHE_NEGATIVE_TTL", 24 * 3600)),
+    max_entries=int(os.environ.get("ZEFIX_CACHE_MAX_ENTRIES", 500000)),
+)
+
+# The rate starts at the maximum, so a cold run is not slower than an
+# unthrottled one; the first 429 responses bring it down
+max_rate = float(os.environ.get("ZEFIX_MAX_RATE", 200))
+rate_limiter = AdaptiveRateLimiter(
+    rate=float(os.environ.get("ZEFIX_RATE", max_rate)),
+    max_rate=max_rate,
+)
+circuit_breaker = CircuitBreaker()
+
+# Optional offline index of Zefix records, consulted before the API
+mirror_path = os.environ.get("ZEFIX_MIRROR_PATH")
+mirror = ZefixMirror(mirror_path) if mirror_path else None
@@ -0,0 +1,192 @@
+# delta.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from .journal import _to_json
+
+
+def _canonical(value):
+    # The same row must hash the same whether pandas read a column as
+    # integers or, because of a missing value elsewhere, as floats
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if pd.isna(value):
+        return ""
+    return str(value)
+
+
+def row_fingerprints(df, salt=""):
+    """
+    Hash every row of a DataFrame.
+
+    Args:
+        df (DataFrame): The input rows.
+        salt (str): A value mixed into every hash, e.g. identifying the lookup strategy.
+
+    Returns:
+        list: One hex digest per row, in the order of the rows.
+    """
+    prefix = "\x1e".join([salt] + [str(column) for column in df.columns])
+    return [
+        hashlib.blake2b(
+            "\x1f".join([prefix] + [_canonical(value) for value in row]).encode(
+                "utf-8"
+            ),
+            digest_size=16,
+        ).hexdigest()
+        for row in df.itertuples(index=False, name=None)
+    ]
+
+
+def delta_scope(strategy_id, input_csv):
+    """
+    Identify the entries of an export in a shared fingerprint store.
+
+    Args:
+        strategy_id (str): The identifier of the lookup strategy.
+        input_csv (str): The path to the input file.
+
+    Returns:
+        str: The scope.
+    """
+    return f"{strategy_id}|{os.path.abspath(input_csv)}"
+
+
+class FingerprintStore:
+    """
+    Persistent SQLite store mapping input row fingerprints to their Zefix results.
+
+    Rows whose fingerprint is found can reuse the stored results instead of
+    being looked up again. Entries record when they were fetched, so stale
+    results can be revalidated, and when their row was last seen, so rows that
+    disappeared from the input can be pruned.
+
+    Entries belong to a scope, e.g. a lookup strategy and an input file, so
+    one store can be shared by several exports or shards: each only reads,
+    refreshes and prunes the entries of its own scope.
+    """
+
+    def __init__(self, path, scope=""):
+        """
+        Open (or create) the store database.
+
+        Args:
+            path (str): The path to the SQLite database file.
+            scope (str): The scope of the entries read and written, see `delta_scope`.
+        """
+        self.path = path
+        self.scope = scope
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        columns = [
+            row[1]
+            for row in self._connection.execute("PRAGMA table_info(fingerprints)")
+        ]
+        if columns and "scope" not in columns:
+            # Entries of stores without scopes cannot be attributed to an
+            # export, so they are looked up again once
+            self._connection.execute("DROP TABLE fingerprints")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                scope TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                results TEXT NOT NULL,
+                fetched_at REAL NOT NULL,
+                seen_at REAL NOT NULL,
+                PRIMARY KEY (scope, fingerprint)
+            )
+            """)
+        self._connection.commit()
+
+    def get_many(self, fingerprints, max_age=None):
+        """
+        Look up the stored results of several rows.
+
+        Args:
+            fingerprints (iterable): The row fingerprints.
+            max_age (float, optional): Ignore results fetched more than this many seconds ago.
+
+        Returns:
+            dict: A dictionary mapping each found fingerprint to its list of result rows.
+        """
+        fingerprints = list(dict.fromkeys(fingerprints))
+        oldest = time.time() - max_age if max_age is not None else 0
+        found = {}
+        with self._lock:
+            for start in range(0, len(fingerprints), 500):
+                batch = fingerprints[start : start + 500]
+                rows = self._connection.execute(
+                    "SELECT fingerprint, results FROM fingerprints "
+                    "WHERE scope = ? AND fetched_at >= ? "
+                    f"AND fingerprint IN ({','.join('?' * len(batch))})",
+                    [self.scope, oldest] + batch,
+                ).fetchall()
+                found.update((fingerprint, json.loads(r)) for fingerprint, r in rows)
+        return found
+
+    def put_many(self, entries):
+        """
+        Store the results of several rows.
+
+        Args:
+            entries (iterable): (fingerprint, list of result rows) tuples.
+        """
+        now = time.time()
+        rows = [
+            (self.scope, fingerprint, json.dumps(results, default=_to_json), now, now)
+            for fingerprint, results in entries
+        ]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._connection.commit()
+
+    def touch(self, fingerprints):
+        """
+        Mark rows as seen in the current run.
+
+        Args:
+            fingerprints (iterable): The row fingerprints.
+        """
+        now = time.time()
+        with self._lock:
+            self._connection.executemany(
+                "UPDATE fingerprints SET seen_at = ? "
+                "WHERE scope = ? AND fingerprint = ?",
+                ((now, self.scope, fingerprint) for fingerprint in fingerprints),
+            )
+            self._connection.commit()
+
+    def prune(self, before):
+        """
+        Remove the rows of the scope not seen since a point in time.
+
+        Args:
+            before (float): The Unix time, e.g. the start of a completed run.
+
+        Returns:
+            int: The number of rows removed.
+        """
+        with self._lock:
+            cursor = self._connection.execute(
+                "DELETE FROM fingerprints WHERE scope = ? AND seen_at < ?",
+                (self.scope, before),
+            )
+            self._connection.commit()
+        return cursor.rowcount
+
+    def close(self):
+        """
+        Close the underlying database connection.
+        """
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,66 @@
+# delta_test.py
+import sqlite3
+import time
+
+import pandas as pd
+
+from SIA.artikel5.delta import FingerprintStore, delta_scope, row_fingerprints
+
+
+def test_row_fingerprints_ignore_int_float_dtype():
+    ints = pd.DataFrame({"name": ["Muster"], "legalSeatId": [351]})
+    floats = pd.DataFrame({"name": ["Muster"], "legalSeatId": [351.0]})
+    assert row_fingerprints(ints) == row_fingerprints(floats)
+    assert row_fingerprints(ints, "name") != row_fingerprints(ints, "uid")
+
+
+def test_prune_keeps_the_entries_of_other_scopes(tmp_path):
+    path = str(tmp_path / "delta.sqlite3")
+    by_name = FingerprintStore(path, delta_scope("name", "input.csv"))
+    by_uid = FingerprintStore(path, delta_scope("uid", "input.csv"))
+    by_name.put_many([("a", [{"name": "A AG"}])])
+    by_uid.put_many([("b", [{"uid": "CHE123456789"}])])
+
+    started = time.time() + 1
+    by_name.touch(["a"])
+    assert by_name.prune(started) == 1
+    assert by_uid.get_many(["b"]) == {"b": [{"uid": "CHE123456789"}]}
+    by_name.close()
+    by_uid.close()
+
+
+def test_reuse_across_runs_of_a_shared_store(tmp_path):
+    path = str(tmp_path / "delta.sqlite3")
+    for run in range(2):
+        stores = [
+            FingerprintStore(path, delta_scope(strategy, "input.csv"))
+            for strategy in ("name", "uid")
+        ]
+        started = time.time()
+        for store in stores:
+            found = store.get_many(["a"])
+            assert found == ({} if run == 0 else {"a": [{"id": store.scope}]})
+            if not found:
+                store.put_many([("a", [{"id": store.scope}])])
+            store.touch(["a"])
+        assert [store.prune(started) for store in stores] == [0, 0]
+        for store in stores:
+            store.close()
+
+
+def test_store_without_scopes_is_reset(tmp_path):
+    path = str(tmp_path / "delta.sqlite3")
+    connection = sqlite3.connect(path)
+    connection.execute(
+        "CREATE TABLE fingerprints (fingerprint TEXT PRIMARY KEY, results TEXT, "
+        "fetched_at REAL, seen_at REAL)"
+    )
+    connection.execute("INSERT INTO fingerprints VALUES ('a', '[]', 0, 0)")
+    connection.commit()
+    connection.close()
+
+    store = FingerprintStore(path, "name")
+    assert store.get_many(["a"]) == {}
+    store.put_many([("a", [])])
+    assert store.get_many(["a"]) == {"a": []}
+    store.close()
@@ -1,9 +1,36 @@
-from concurrent.futures import ThreadPoolExecutor
+from ..metrics import metrics
+from . import pipeline
+from .config import api_endpoint, cache, circuit_breaker, mirror, rate_limiter, session
+from .utils import fetch_data_from_api, result_rows_with_city_check
 
-import pandas as pd
 
-from .config import api_endpoint, session
-from .utils import fetch_data_from_api, process_row_with_city_check
+def build_request(name):
+    """
+    Build the Zefix API request for a lookup.
+
+    Args:
+        name (str): The name of the company to search for.
+
+    Returns:
+        tuple: The API endpoint URL and the parameters for the API request.
+    """
+    params = {"name": name, "activeOnly": "true"}
+    return api_endpoint, params
+
+
+def lookup_mirror(name):
+    """
+    Look up the company name in the offline mirror.
+
+    Args:
+        name (str): The name of the company to search for.
+
+    Returns:
+        list: The matching company records, empty if there is no mirror or no match.
+    """
+    if mirror is None:
+        return []
+    return mirror.by_name(name)
 
 
 def fetch_data(name):
@@ -16,30 +43,42 @@ def fetch_data(name):
     Returns:
         tuple: A tuple containing the data returned from the API and a boolean indicating the success of the request.
     """
-    params = {"name": name, "activeOnly": "true"}
-    return fetch_data_from_api(session, api_endpoint, params)
+    data = lookup_mirror(name)
+    if data:
+        return data, True
+    return fetch_data_from_api(
+        session,
+        *build_request(name),
+        cache=cache,
+        rate_limiter=rate_limiter,
+        circuit_breaker=circuit_breaker,
+    )
+
+
+STRATEGY = pipeline.Strategy(
+    key_columns=("name",),
+    extra_columns=("city",),
+    build_request=build_request,
+    lookup_mirror=lookup_mirror,
+    fetch_data=fetch_data,
+    result_rows=result_rows_with_city_check,
+)
 
 
-def compare_and_update(input_csv, output_csv):
+def compare_and_update(input_csv, output_csv, **options):
     """
     Compare and update a CSV file with data fetched from the Zefix API.
 
     Args:
         input_csv (str): The path to the input CSV file.
         output_csv (str): The path to the output CSV file.
+        options (dict): Additional options for `pipeline.compare_and_update`, e.g. engine="async" and max_concurrency.
     """
-    df = pd.read_csv(input_csv, delimiter=",", encoding="UTF-8")
-
-    with ThreadPoolExecutor() as executor:
-        results = executor.map(
-            lambda row: process_row_with_city_check(
-                row, fetch_data, row.get("name", "")
-            ),
-            [row for _, row in df.iterrows()],
-        )
-
-    updated_rows = [item for sublist in results for item in sublist]
-    updated_df = pd.DataFrame(updated_rows)
-    updated_df.reset_index(drop=True, inplace=True)
-    updated_df.to_csv(output_csv, index=False)
-    print(f"Updated data saved to {output_csv}.")
+    pipeline.compare_and_update(
+        input_csv,
+        output_csv,
+        STRATEGY,
+        **options,
+    )
+    print(f"Cache stats: {cache.stats()}")
+    metrics.export("artikel5_export_by_name_and_city")
@@ -1,43 +1,92 @@
-from concurrent.futures import ThreadPoolExecutor
+from ..metrics import metrics
+from . import pipeline
+from .config import api_endpoint, cache, circuit_breaker, mirror, rate_limiter, session
+from .uid import compact_uid, parse_uid
+from .utils import fetch_data_from_api, result_rows_uid
 
-import pandas as pd
 
-from .config import api_endpoint, session
-from .utils import fetch_data_from_api, process_row_uid
+def build_request(uid):
+    """
+    Build the Zefix API request for a lookup.
+
+    Args:
+        uid (int): The UID of the company to search for, as returned by `normalize_key`.
+
+    Returns:
+        tuple: The API endpoint URL and the parameters for the API request.
+    """
+    params = {"activeOnly": "true"}
+    return api_endpoint + compact_uid(uid), params
+
+
+def lookup_mirror(uid):
+    """
+    Look up the company UID in the offline mirror.
+
+    Args:
+        uid (int): The UID of the company to search for, as returned by `normalize_key`.
+
+    Returns:
+        list: The matching company records, empty if there is no mirror or no match.
+    """
+    if mirror is None:
+        return []
+    return mirror.by_uid(compact_uid(uid))
 
 
 def fetch_data(uid):
     """
     Fetch data from the Zefix API based on the company UID.
 
+    UIDs that are malformed or fail the check digit are reported as not
+    found without calling the API.
+
     Args:
-        uid (str): The UID of the company to search for.
+        uid (str): The UID of the company to search for, in any spelling accepted by `uid.parse_uid`.
 
     Returns:
         tuple: A tuple containing the data returned from the API and a boolean indicating the success of the request.
     """
-    params = {"activeOnly": "true"}
-    return fetch_data_from_api(session, api_endpoint + uid, params)
+    uid = parse_uid(uid)
+    if uid is None:
+        return [], False
+    data = lookup_mirror(uid)
+    if data:
+        return data, True
+    return fetch_data_from_api(
+        session,
+        *build_request(uid),
+        cache=cache,
+        rate_limiter=rate_limiter,
+        circuit_breaker=circuit_breaker,
+    )
+
+
+STRATEGY = pipeline.Strategy(
+    key_columns=("uid",),
+    extra_columns=(),
+    build_request=build_request,
+    lookup_mirror=lookup_mirror,
+    fetch_data=fetch_data,
+    result_rows=result_rows_uid,
+    normalize_key=parse_uid,
+)
 
 
-def compare_and_update(input_csv, output_csv):
+def compare_and_update(input_csv, output_csv, **options):
     """
     Compare and update a CSV file with data fetched from the Zefix API.
 
     Args:
         input_csv (str): The path to the input CSV file.
         output_csv (str): The path to the output CSV file.
+        options (dict): Additional options for `pipeline.compare_and_update`, e.g. engine="async" and max_concurrency.
     """
-    df = pd.read_csv(input_csv, delimiter=";", encoding="ISO-8859-1")
-
-    with ThreadPoolExecutor() as executor:
-        results = executor.map(
-            lambda row: process_row_uid(row, fetch_data, row.get("uid", "")),
-            [row for _, row in df.iterrows()],
-        )
-
-    updated_rows = [item for sublist in results for item in sublist]
-    updated_df = pd.DataFrame(updated_rows)
-    updated_df.reset_index(drop=True, inplace=True)
-    updated_df.to_csv(output_csv, index=False)
-    print(f"Updated data saved to {output_csv}.")
+    pipeline.compare_and_update(
+        input_csv,
+        output_csv,
+        STRATEGY,
+        **options,
+    )
+    print(f"Cache stats: {cache.stats()}")
+    metrics.export("artikel5_export_by_uid")
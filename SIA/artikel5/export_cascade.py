@@ -0,0 +1,42 @@
+from ..metrics import metrics
+from . import (
+    export_by_name,
+    export_by_name_and_city,
+    export_by_name_and_legal_seat_id,
+    export_by_uid,
+    pipeline,
+)
+from .config import cache
+
+CASCADE = pipeline.Cascade(
+    steps=(
+        ("uid", export_by_uid.STRATEGY),
+        ("name_legal_seat_id", export_by_name_and_legal_seat_id.STRATEGY),
+        ("name_city", export_by_name_and_city.STRATEGY),
+        ("name", export_by_name.STRATEGY),
+    )
+)
+
+
+def compare_and_update(input_csv, output_csv, **options):
+    """
+    Compare and update a CSV file with data fetched from the Zefix API in a single pass.
+
+    Each row is looked up by UID if it has one, then by name and legal seat ID,
+    then by name with a city check and finally by name only. A strategy only
+    runs for the rows the previous ones did not resolve. The `zefixStrategy`
+    column records which strategy matched.
+
+    Args:
+        input_csv (str): The path to the input CSV file.
+        output_csv (str): The path to the output CSV file.
+        options (dict): Additional options for `pipeline.compare_and_update`, e.g. engine="async" and max_concurrency.
+    """
+    pipeline.compare_and_update(
+        input_csv,
+        output_csv,
+        CASCADE,
+        **options,
+    )
+    print(f"Cache stats: {cache.stats()}")
+    metrics.export("artikel5_export_cascade")
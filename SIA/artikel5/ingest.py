@@ -0,0 +1,282 @@
+# ingest.py
+import codecs
+import csv
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pa_compute
+    import pyarrow.csv as pa_csv
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+# Candidate delimiters, in order of preference when the sniffer is undecided
+DELIMITERS = ";,\t|"
+
+# Encodings announced by a byte order mark
+BOMS = (
+    (codecs.BOM_UTF8, "UTF-8-SIG"),
+    (codecs.BOM_UTF16_LE, "UTF-16"),
+    (codecs.BOM_UTF16_BE, "UTF-16"),
+)
+
+# Files that are not valid UTF-8 are read as Latin-1, which decodes any byte
+FALLBACK_ENCODING = "ISO-8859-1"
+
+# The values pandas reads as missing, so both readers return the same rows
+NULL_VALUES = [
+    "",
+    "#N/A",
+    "#N/A N/A",
+    "#NA",
+    "-1.#IND",
+    "-1.#QNAN",
+    "-NaN",
+    "-nan",
+    "1.#IND",
+    "1.#QNAN",
+    "<NA>",
+    "N/A",
+    "NA",
+    "NULL",
+    "NaN",
+    "None",
+    "n/a",
+    "nan",
+    "null",
+]
+
+# The values pandas reads as booleans
+BOOLEAN_VALUES = ["True", "TRUE", "true", "False", "FALSE", "false"]
+
+# Integers as pandas reads them, after blanks and a leading plus are removed
+INTEGER = r"^-?[0-9]+$"
+
+SAMPLE_SIZE = 64 * 1024
+BLOCK_SIZE = 1024 * 1024
+
+Dialect = namedtuple("Dialect", ["delimiter", "encoding", "columns", "multiline"])
+Dialect.__doc__ = """
+The format of an input CSV file.
+
+Args:
+    delimiter (str): The delimiter.
+    encoding (str): The encoding.
+    columns (list): The column names from the header line.
+    multiline (bool): Whether quoted values may contain line breaks.
+"""
+
+
+def sniff_encoding(path):
+    """
+    Detect the encoding of a file.
+
+    The whole file is checked, so a file that is UTF-8 only in its first
+    lines is not mistaken for UTF-8 and does not fail halfway through.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        str: "UTF-8-SIG" or "UTF-16" for files with a byte order mark, else "UTF-8" or FALLBACK_ENCODING.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    with open(path, "rb") as file:
+        block = file.read(BLOCK_SIZE)
+        for bom, encoding in BOMS:
+            if block.startswith(bom):
+                return encoding
+        try:
+            while block:
+                decoder.decode(block)
+                block = file.read(BLOCK_SIZE)
+            decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return FALLBACK_ENCODING
+    return "UTF-8"
+
+
+def sniff_delimiter(sample):
+    """
+    Detect the delimiter of a CSV sample.
+
+    Args:
+        sample (str): The first lines of the file.
+
+    Returns:
+        str: One of DELIMITERS, "," if none is found.
+    """
+    try:
+        return csv.Sniffer().sniff(sample, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        header = sample.splitlines()[0] if sample else ""
+        counts = {delimiter: header.count(delimiter) for delimiter in DELIMITERS}
+        best = max(DELIMITERS, key=lambda delimiter: counts[delimiter])
+        return best if counts[best] else ","
+
+
+def sniff(path, delimiter=None, encoding=None):
+    """
+    Detect the format of an input CSV file.
+
+    Args:
+        path (str): The path to the CSV file.
+        delimiter (str, optional): The delimiter, detected if not given.
+        encoding (str, optional): The encoding, detected if not given.
+
+    Returns:
+        Dialect: The format of the file.
+    """
+    if encoding is None:
+        encoding = sniff_encoding(path)
+    with open(path, "r", newline="", encoding=encoding) as file:
+        sample = file.read(SAMPLE_SIZE)
+    # Drop the last line, which is usually cut off by the sample size
+    lines = sample.splitlines(keepends=True)
+    if len(lines) > 1:
+        sample = "".join(lines[:-1])
+    if delimiter is None:
+        delimiter = sniff_delimiter(sample)
+    columns = next(csv.reader(sample.splitlines()[:1], delimiter=delimiter), [])
+    return Dialect(delimiter, encoding, columns, '"' in sample)
+
+
+def _numbers(column):
+    # pandas ignores blanks around numbers and a plus sign in front of them
+    text = pa_compute.utf8_trim(column, characters=" \t")
+    return pa_compute.replace_substring_regex(
+        text, pattern=r"^\+([0-9.])", replacement=r"\1"
+    )
+
+
+def _infer_types(table):
+    # pyarrow reads every column as text, so a value that does not fit the
+    # type guessed from the first block cannot fail the read halfway. Columns
+    # are then converted per chunk like pandas does: booleans, integers, else
+    # floats, else text. Integer columns with missing values become floats
+    # and boolean columns with missing values stay objects, as in pandas.
+    for i, field in enumerate(table.schema):
+        column = table.column(i)
+        # A failed cast is slow, so text columns are recognized by a sample
+        sample = column.slice(0, 100).drop_null().to_pylist()[:1]
+        if not sample:
+            sample = column.drop_null().slice(0, 1).to_pylist()
+        if not sample:
+            # pandas reads a column without any value as floats
+            table = table.set_column(i, field.name, column.cast(pa.float64()))
+            continue
+        if sample[0] in BOOLEAN_VALUES:
+            values = column.drop_null()
+            if pa_compute.all(
+                pa_compute.is_in(values, pa.array(BOOLEAN_VALUES))
+            ).as_py():
+                column = pa_compute.cast(pa_compute.utf8_lower(column), pa.bool_())
+                table = table.set_column(i, field.name, column)
+            continue
+        try:
+            float(sample[0])
+        except ValueError:
+            continue
+        numbers = _numbers(column)
+        if pa_compute.all(pa_compute.match_substring_regex(numbers, INTEGER)).as_py():
+            # Integers too large for int64 stay text; pandas reads them as
+            # Python ints, which are written out the same
+            types = (pa.int64(),)
+        else:
+            types = (pa.float64(),)
+        for type in types:
+            try:
+                column = pa_compute.cast(numbers, type)
+            except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+                continue
+            table = table.set_column(i, field.name, column)
+            break
+    return table
+
+
+def _to_frame(table, start):
+    df = _infer_types(table).to_pandas()
+    for column in df.columns[df.dtypes == object]:
+        # pandas marks missing text and booleans with NaN, not None
+        if df[column].isna().any():
+            df[column] = df[column].where(df[column].notna(), np.nan)
+    df.index = pd.RangeIndex(start, start + len(df))
+    return df
+
+
+def _arrow_frames(path, dialect, usecols, chunksize):
+    read_options = pa_csv.ReadOptions(
+        encoding=dialect.encoding.replace("-SIG", ""), block_size=BLOCK_SIZE
+    )
+    parse_options = pa_csv.ParseOptions(
+        delimiter=dialect.delimiter, newlines_in_values=dialect.multiline
+    )
+    columns = dialect.columns if usecols is None else usecols
+    convert_options = pa_csv.ConvertOptions(
+        column_types={column: pa.string() for column in columns},
+        include_columns=usecols,
+        null_values=NULL_VALUES,
+        strings_can_be_null=True,
+        quoted_strings_can_be_null=True,
+    )
+    if chunksize is None:
+        table = pa_csv.read_csv(path, read_options, parse_options, convert_options)
+        yield _to_frame(table, 0)
+        return
+
+    reader = pa_csv.open_csv(path, read_options, parse_options, convert_options)
+    start = 0
+    pending = None
+    for batch in reader:
+        table = pa.Table.from_batches([batch])
+        if pending is not None:
+            table = pa.concat_tables([pending, table])
+        while table.num_rows >= chunksize:
+            yield _to_frame(table.slice(0, chunksize), start)
+            start += chunksize
+            table = table.slice(chunksize)
+        pending = table
+    if pending is not None and pending.num_rows:
+        yield _to_frame(pending, start)
+
+
+def read_input(path, delimiter=None, encoding=None, columns=None, chunksize=None):
+    """
+    Read an input CSV file with the multithreaded pyarrow CSV reader.
+
+    The delimiter and encoding are detected unless given. The rows and dtypes
+    are the same as with `pandas.read_csv`, which is used when pyarrow is not
+    installed.
+
+    Args:
+        path (str): The path to the CSV file.
+        delimiter (str, optional): The delimiter, detected if not given.
+        encoding (str, optional): The encoding, detected if not given.
+        columns (list, optional): The columns to load. Columns missing from the file are skipped; None loads all.
+        chunksize (int, optional): The number of rows per DataFrame. None reads the whole file at once.
+
+    Returns:
+        iterable: An iterable of DataFrames, indexed by the position of their rows in the file.
+    """
+    dialect = sniff(path, delimiter, encoding)
+    usecols = None
+    if columns is not None:
+        usecols = [column for column in dialect.columns if column in set(columns)]
+        if not usecols:
+            raise ValueError(f"None of the columns {list(columns)} found in {path}")
+
+    if pa is not None:
+        frames = _arrow_frames(path, dialect, usecols, chunksize)
+        return frames if chunksize is not None else list(frames)
+
+    frames = pd.read_csv(
+        path,
+        delimiter=dialect.delimiter,
+        encoding=dialect.encoding,
+        usecols=usecols,
+        chunksize=chunksize,
+    )
+    return frames if chunksize is not None else [frames]
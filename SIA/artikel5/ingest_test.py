@@ -0,0 +1,56 @@
+# ingest_test.py
+import pandas as pd
+import pytest
+
+from SIA.artikel5.ingest import read_input, sniff
+
+pytest.importorskip("pyarrow")
+
+COLUMNS = {
+    "plus": ["+5", "6", "-7"],
+    "blanks": [" 12", "3\t", "4"],
+    "missing_int": ["1", "", "3"],
+    "float": [" +1.5", "2.5", "1e3"],
+    "bool": ["True", "false", "TRUE"],
+    "missing_bool": ["True", "", "False"],
+    "ones": ["True", "1", "0"],
+    "hex": ["0x10", "1", "2"],
+    "text": ["a", "", "NA"],
+    "empty": ["", "", ""],
+}
+
+
+@pytest.fixture
+def input_csv(tmp_path):
+    path = tmp_path / "input.csv"
+    lines = [";".join(COLUMNS)]
+    lines += [";".join(values[i] for values in COLUMNS.values()) for i in range(3)]
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def test_sniff(input_csv):
+    dialect = sniff(input_csv)
+    assert (dialect.delimiter, dialect.encoding) == (";", "UTF-8")
+    assert dialect.columns == list(COLUMNS)
+
+
+def test_read_input_matches_pandas(input_csv):
+    expected = pd.read_csv(input_csv, delimiter=";")
+    pd.testing.assert_frame_equal(read_input(input_csv)[0], expected)
+
+
+@pytest.mark.parametrize("chunksize", [1, 2])
+def test_read_input_chunks_match_pandas(input_csv, chunksize):
+    chunks = list(read_input(input_csv, chunksize=chunksize))
+    expected = list(pd.read_csv(input_csv, delimiter=";", chunksize=chunksize))
+    assert len(chunks) == len(expected)
+    for chunk, expected_chunk in zip(chunks, expected):
+        pd.testing.assert_frame_equal(chunk, expected_chunk)
+
+
+def test_read_input_columns(input_csv):
+    df = read_input(input_csv, columns=["text", "plus", "missing"])[0]
+    assert list(df.columns) == ["plus", "text"]
+    with pytest.raises(ValueError):
+        read_input(input_csv, columns=["missing"])
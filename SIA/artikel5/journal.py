@@ -0,0 +1,91 @@
+# journal.py
+import json
+import os
+
+import pandas as pd
+
+
+def _to_json(value):
+    if hasattr(value, "item"):
+        return value.item()
+    if pd.isna(value):
+        return None
+    return str(value)
+
+
+class Journal:
+    """
+    Append-only checkpoint journal of completed input rows.
+
+    Every line holds the index of an input row and the output rows produced
+    for it. The first line identifies the input file, so a journal left over
+    from a different input is discarded instead of being resumed.
+    """
+
+    def __init__(self, path, input_csv):
+        """
+        Open the journal and load the rows completed by a previous run.
+
+        Args:
+            path (str): The path to the journal file.
+            input_csv (str): The path to the input CSV file being processed.
+        """
+        self.path = path
+        self.completed = {}
+        stat = os.stat(input_csv)
+        header = {
+            "input": os.path.abspath(input_csv),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+        }
+
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as file:
+                lines = file.read().splitlines()
+            if lines and json.loads(lines[0]) == header:
+                for line in lines[1:]:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; the row is simply redone
+                        break
+                    self.completed[entry["row"]] = entry["results"]
+
+        # The compacted journal replaces the old one only once it is on disk,
+        # so a crash while rewriting it keeps the old checkpoints
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding="utf-8") as file:
+            file.write(json.dumps(header) + "\n")
+            for row, results in self.completed.items():
+                file.write(json.dumps({"row": row, "results": results}) + "\n")
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def record(self, entries):
+        """
+        Durably record a batch of completed rows.
+
+        Args:
+            entries (list): A list of (row index, list of output rows) tuples.
+        """
+        for row, results in entries:
+            line = json.dumps({"row": int(row), "results": results}, default=_to_json)
+            self._file.write(line + "\n")
+        self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self, remove=False):
+        """
+        Close the journal.
+
+        Args:
+            remove (bool): Delete the journal file, e.g. after a completed run.
+        """
+        self._file.close()
+        if remove:
+            os.remove(self.path)
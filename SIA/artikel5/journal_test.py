@@ -0,0 +1,76 @@
+# journal_test.py
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from SIA.artikel5.journal import Journal
+
+
+@pytest.fixture
+def input_csv(tmp_path):
+    path = tmp_path / "input.csv"
+    path.write_text("name\nMuster\nBeta\n", encoding="utf-8")
+    return str(path)
+
+
+def test_resume_after_a_crash(tmp_path, input_csv):
+    path = str(tmp_path / "journal.jsonl")
+    journal = Journal(path, input_csv)
+    journal.record(
+        [(np.int64(0), [{"name": "Muster AG", "legalSeatId": np.int64(351)}])]
+    )
+    journal.record([(1, [{"name": "Beta", "uid": np.nan}])])
+    # A crash in the middle of the next record leaves half a line
+    journal._file.write('{"row": 2, "res')
+    journal._file.close()
+
+    journal = Journal(path, input_csv)
+    assert sorted(journal.completed) == [0, 1]
+    assert journal.completed[0] == [{"name": "Muster AG", "legalSeatId": 351}]
+    # Missing values come back as missing, which is written as an empty cell
+    assert pd.isna(journal.completed[1][0]["uid"])
+    journal.close()
+    # The half line is gone, so a second resume sees the same rows
+    journal = Journal(path, input_csv)
+    assert sorted(journal.completed) == [0, 1]
+    journal.close(remove=True)
+    assert not os.path.exists(path)
+
+
+def test_crash_while_compacting_keeps_the_checkpoints(tmp_path, input_csv, monkeypatch):
+    path = str(tmp_path / "journal.jsonl")
+    journal = Journal(path, input_csv)
+    journal.record([(0, [{"name": "Muster AG"}]), (1, [{"name": "Beta"}])])
+    journal.close()
+
+    def crash(source, destination):
+        raise KeyboardInterrupt
+
+    with monkeypatch.context() as patch:
+        patch.setattr(os, "replace", crash)
+        with pytest.raises(KeyboardInterrupt):
+            Journal(path, input_csv)
+
+    journal = Journal(path, input_csv)
+    assert journal.completed == {0: [{"name": "Muster AG"}], 1: [{"name": "Beta"}]}
+    journal.record([(2, [])])
+    journal.close()
+    journal = Journal(path, input_csv)
+    assert sorted(journal.completed) == [0, 1, 2]
+    assert not os.path.exists(path + ".tmp")
+    journal.close()
+
+
+def test_journal_of_another_input_is_discarded(tmp_path, input_csv):
+    path = str(tmp_path / "journal.jsonl")
+    journal = Journal(path, input_csv)
+    journal.record([(0, [])])
+    journal.close()
+
+    with open(input_csv, "a", encoding="utf-8") as file:
+        file.write("Gamma\n")
+    journal = Journal(path, input_csv)
+    assert journal.completed == {}
+    journal.close()
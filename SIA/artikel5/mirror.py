@@ -0,0 +1,243 @@
+# mirror.py
+import json
+import re
+import sqlite3
+import sys
+import threading
+import unicodedata
+
+
+def normalize_name(name):
+    """
+    Normalize a company name for index lookups.
+
+    Args:
+        name (str): The company name.
+
+    Returns:
+        str: The name case-folded, without punctuation and with single spaces.
+    """
+    name = unicodedata.normalize("NFKC", str(name)).casefold()
+    return " ".join(re.sub(r"[^\w]+", " ", name).split())
+
+
+def normalize_uid(uid):
+    """
+    Normalize a UID for index lookups.
+
+    Args:
+        uid (str): The UID, e.g. "CHE-123.456.789" or "CHE123456789".
+
+    Returns:
+        str: The UID in the compact form used by the API, e.g. "CHE123456789".
+    """
+    return re.sub(r"[^0-9A-Z]", "", str(uid).upper())
+
+
+class ZefixMirror:
+    """
+    Local SQLite index of Zefix company records.
+
+    Records are stored in the same JSON shape the API returns, so lookups can
+    be used in place of API responses. Only active companies are returned,
+    matching the `activeOnly` parameter of the exports.
+    """
+
+    def __init__(self, path):
+        """
+        Open (or create) the mirror database.
+
+        Args:
+            path (str): The path to the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS companies (
+                uid TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                legal_seat TEXT,
+                legal_seat_id INTEGER,
+                active INTEGER NOT NULL,
+                data TEXT NOT NULL
+            )
+            """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS companies_name ON companies (name, legal_seat_id)"
+        )
+        self._connection.commit()
+
+    def add(self, companies):
+        """
+        Add or replace company records.
+
+        Args:
+            companies (iterable): Company records in the format returned by the Zefix API.
+
+        Returns:
+            int: The number of records added.
+        """
+        rows = [
+            (
+                normalize_uid(company["uid"]),
+                normalize_name(company.get("name", "")),
+                normalize_name(company.get("legalSeat", "") or ""),
+                company.get("legalSeatId"),
+                int(company.get("status", "ACTIVE") == "ACTIVE"),
+                json.dumps(company),
+            )
+            for company in companies
+            if company.get("uid")
+        ]
+        with self._lock:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO companies VALUES (?, ?, ?, ?, ?, ?)", rows
+            )
+            self._connection.commit()
+        return len(rows)
+
+    def load_json(self, path):
+        """
+        Load company records from a JSON file.
+
+        The file may hold a JSON array of companies or one company (or one
+        array of companies) per line.
+
+        Args:
+            path (str): The path to the JSON file.
+
+        Returns:
+            int: The number of records loaded.
+        """
+        with open(path, "r", encoding="utf-8") as file:
+            first = file.read(1)
+            file.seek(0)
+            if first == "[":
+                return self.add(json.load(file))
+            count = 0
+            for line in file:
+                if line.strip():
+                    record = json.loads(line)
+                    count += self.add(record if isinstance(record, list) else [record])
+            return count
+
+    def load_cache(self, cache_path):
+        """
+        Load the company records found in a response cache database.
+
+        Args:
+            cache_path (str): The path to the `ResponseCache` SQLite file.
+
+        Returns:
+            int: The number of records loaded.
+        """
+        connection = sqlite3.connect(cache_path)
+        try:
+            count = 0
+            for (data,) in connection.execute(
+                "SELECT data FROM responses WHERE success = 1"
+            ):
+                records = json.loads(data)
+                count += self.add(records if isinstance(records, list) else [records])
+            return count
+        finally:
+            connection.close()
+
+    def _query(self, where, args):
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT data FROM companies WHERE active = 1 AND {where}", args
+            ).fetchall()
+        return [json.loads(data) for (data,) in rows]
+
+    def by_uid(self, uid):
+        """
+        Look up a company by UID.
+
+        Args:
+            uid (str): The UID of the company.
+
+        Returns:
+            list: The matching company records.
+        """
+        return self._query("uid = ?", (normalize_uid(uid),))
+
+    def by_name(self, name):
+        """
+        Look up companies by normalized name.
+
+        Args:
+            name (str): The name of the company.
+
+        Returns:
+            list: The matching company records.
+        """
+        return self._query("name = ?", (normalize_name(name),))
+
+    def by_name_and_legal_seat_id(self, name, legalSeatId):
+        """
+        Look up companies by normalized name and legal seat ID.
+
+        Args:
+            name (str): The name of the company.
+            legalSeatId (str): The legal seat ID of the company.
+
+        Returns:
+            list: The matching company records.
+        """
+        try:
+            legal_seat_id = int(float(legalSeatId))
+        except (TypeError, ValueError):
+            return []
+        return self._query(
+            "name = ? AND legal_seat_id = ?", (normalize_name(name), legal_seat_id)
+        )
+
+    def by_name_and_city(self, name, city):
+        """
+        Look up companies by normalized name and legal seat.
+
+        Args:
+            name (str): The name of the company.
+            city (str): The legal seat of the company.
+
+        Returns:
+            list: The matching company records.
+        """
+        return self._query(
+            "name = ? AND legal_seat = ?", (normalize_name(name), normalize_name(city))
+        )
+
+    def close(self):
+        """
+        Close the underlying database connection.
+        """
+        with self._lock:
+            self._connection.close()
+
+
+def main():
+    """
+    Load JSON files or response caches into a mirror database.
+
+    Usage: python -m SIA.artikel5.mirror <mirror.sqlite3> <file> [<file> ...]
+    """
+    if len(sys.argv) < 3:
+        print(
+            "Usage: python -m SIA.artikel5.mirror <mirror.sqlite3> <file> [<file> ...]"
+        )
+        sys.exit(1)
+
+    mirror = ZefixMirror(sys.argv[1])
+    for path in sys.argv[2:]:
+        if path.endswith((".sqlite3", ".sqlite", ".db")):
+            count = mirror.load_cache(path)
+        else:
+            count = mirror.load_json(path)
+        print(f"Loaded {count} companies from {path}.")
+    mirror.close()
+
+
+if __name__ == "__main__":
+    main()
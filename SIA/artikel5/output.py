@@ -0,0 +1,160 @@
+# output.py
+import os
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = None
+
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".arrows": "arrow"}
+
+# Zefix columns with few distinct values, stored dictionary-encoded
+CATEGORICAL_COLUMNS = (
+    "zefixLegalSeat",
+    "zefixLegalSeatId",
+    "zefixSwissZipCode",
+    "zefixCity",
+    "zefixStrategy",
+)
+
+
+def output_format(path, format=None):
+    """
+    Determine the output format of a file.
+
+    Args:
+        path (str): The path to the output file.
+        format (str, optional): "csv", "parquet" or "arrow". Defaults to the format matching the file extension, or "csv".
+
+    Returns:
+        str: The output format.
+    """
+    if format is None:
+        format = FORMATS.get(os.path.splitext(path)[1].lower(), "csv")
+    if format not in FORMATS.values():
+        raise ValueError(f"Unknown output format: {format}")
+    return format
+
+
+def compact_frame(df):
+    """
+    Convert the Zefix columns to compact dtypes.
+
+    The Zefix columns mix API values with the NOT_FOUND and FETCH_ERROR
+    placeholders, so they are stored as strings; the columns listed in
+    CATEGORICAL_COLUMNS become categoricals.
+
+    Args:
+        df (DataFrame): The output rows.
+
+    Returns:
+        DataFrame: The output rows with converted Zefix columns.
+    """
+    columns = {}
+    for column in df.columns:
+        if str(column).startswith("zefix"):
+            values = df[column].astype("string")
+            if column in CATEGORICAL_COLUMNS:
+                values = values.astype("category")
+            columns[column] = values
+    return df.assign(**columns)
+
+
+def _arrow_schema(table):
+    # Later chunks are converted to the schema of the first one. Dictionary
+    # indices are widened so every chunk fits, and columns that were empty in
+    # the first chunk (read as null or as all-NaN floats) are assumed to hold
+    # strings.
+    fields = []
+    for field, column in zip(table.schema, table.columns):
+        empty = table.num_rows and column.null_count == table.num_rows
+        if pa.types.is_dictionary(field.type):
+            field = field.with_type(pa.dictionary(pa.int32(), pa.string()))
+        elif (
+            empty
+            or pa.types.is_null(field.type)
+            or pa.types.is_large_string(field.type)
+        ):
+            field = field.with_type(pa.string())
+        fields.append(field)
+    return pa.schema(fields, metadata=table.schema.metadata)
+
+
+class OutputWriter:
+    """
+    Writer appending chunks of output rows to a CSV, Parquet or Arrow IPC file.
+
+    Every chunk is written with the columns of the first one. Parquet files
+    get one row group per chunk; Arrow output uses the zstd-compressed IPC
+    stream format, which allows each chunk to bring its own dictionaries.
+    """
+
+    def __init__(self, path, format=None):
+        """
+        Create the writer. The file is created when the first chunk is written.
+
+        Args:
+            path (str): The path to the output file.
+            format (str, optional): "csv", "parquet" or "arrow", see `output_format`.
+        """
+        self.path = path
+        self.format = output_format(path, format)
+        if self.format != "csv" and pa is None:
+            raise ImportError(
+                f"Writing {self.format} files requires pyarrow (pip install pyarrow)."
+            )
+        self.columns = None
+        self._started = False
+        self._schema = None
+        self._writer = None
+
+    def write(self, df):
+        """
+        Append output rows to the file.
+
+        Args:
+            df (DataFrame): The output rows.
+        """
+        if self.columns is None:
+            self.columns = list(df.columns)
+        else:
+            df = df.reindex(columns=self.columns)
+
+        if self.format == "csv":
+            mode = "a" if self._started else "w"
+            df.to_csv(self.path, index=False, header=not self._started, mode=mode)
+            self._started = True
+            return
+
+        df = compact_frame(df)
+        if self._schema is None:
+            self._schema = _arrow_schema(pa.Table.from_pandas(df, preserve_index=False))
+        # A string column may hold numbers or only NaN in a later chunk
+        df = df.assign(
+            **{
+                field.name: df[field.name].astype("string")
+                for field in self._schema
+                if pa.types.is_string(field.type)
+                and df[field.name].dtype.kind in "biuf"
+            }
+        )
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        if self._writer is None:
+            if self.format == "parquet":
+                self._writer = pq.ParquetWriter(self.path, self._schema)
+            else:
+                self._writer = pa.ipc.new_stream(
+                    self.path,
+                    self._schema,
+                    options=pa.ipc.IpcWriteOptions(compression="zstd"),
+                )
+        self._writer.write_table(table)
+
+    def close(self):
+        """
+        Finish the file.
+        """
+        if self._writer is not None:
+            self._writer.close()
+        self._writer = None
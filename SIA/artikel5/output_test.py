@@ -0,0 +1,81 @@
+# output_test.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from SIA.artikel5.output import OutputWriter, compact_frame, output_format
+
+pa = pytest.importorskip("pyarrow")
+
+CHUNKS = [
+    pd.DataFrame(
+        {
+            "name": ["Muster AG", "Beta GmbH"],
+            "note": [np.nan, np.nan],
+            "zefixLegalSeatId": [230, "#N/V"],
+        }
+    ),
+    pd.DataFrame(
+        {
+            "name": ["Gamma AG", "Delta SA"],
+            "note": ["x", np.nan],
+            "zefixLegalSeatId": ["#ERR", 351],
+        }
+    ),
+    pd.DataFrame({"name": ["Epsilon AG"], "note": [1.5], "zefixLegalSeatId": [230]}),
+]
+
+
+def read_back(path):
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path)
+    with pa.ipc.open_stream(path) as reader:
+        return reader.read_pandas()
+
+
+def test_output_format():
+    assert output_format("out.parquet") == "parquet"
+    assert output_format("out.arrows") == "arrow"
+    assert output_format("out.txt") == "csv"
+    assert output_format("out.csv", "parquet") == "parquet"
+    with pytest.raises(ValueError):
+        output_format("out.csv", "xlsx")
+
+
+def test_compact_frame():
+    df = compact_frame(CHUNKS[0])
+    assert df["zefixLegalSeatId"].dtype == "category"
+    assert list(df["zefixLegalSeatId"]) == ["230", "#N/V"]
+
+
+@pytest.mark.parametrize("name", ["out.parquet", "out.arrows"])
+def test_chunks_with_a_column_empty_in_the_first_chunk(tmp_path, name):
+    path = str(tmp_path / name)
+    writer = OutputWriter(path)
+    for chunk in CHUNKS:
+        writer.write(chunk)
+    writer.close()
+
+    df = read_back(path)
+    assert list(df["name"]) == [
+        "Muster AG",
+        "Beta GmbH",
+        "Gamma AG",
+        "Delta SA",
+        "Epsilon AG",
+    ]
+    assert df["note"].fillna("").tolist() == ["", "", "x", "", "1.5"]
+    assert list(df["zefixLegalSeatId"]) == ["230", "#N/V", "#ERR", "351", "230"]
+
+
+def test_csv_chunks(tmp_path):
+    path = str(tmp_path / "out.csv")
+    writer = OutputWriter(path)
+    for chunk in CHUNKS:
+        # Later chunks are written with the columns of the first one
+        writer.write(chunk[chunk.columns[::-1]])
+    writer.close()
+    expected = pd.concat(CHUNKS, ignore_index=True)[CHUNKS[0].columns[::-1]]
+    pd.testing.assert_frame_equal(
+        pd.read_csv(path, dtype=str), expected.astype(str).replace("nan", np.nan)
+    )
@@ -0,0 +1,527 @@
+# pipeline.py
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from ..metrics import metrics
+from . import async_engine
+from .delta import FingerprintStore, delta_scope, row_fingerprints
+from .ingest import read_input
+from .journal import Journal
+from .output import OutputWriter
+from .shard import ROW_COLUMN
+from .utils import FETCH_ERROR, NOT_FOUND, size_connection_pool
+
+DEFAULT_MAX_CONCURRENCY = 32
+
+Strategy = namedtuple(
+    "Strategy",
+    [
+        "key_columns",
+        "extra_columns",
+        "build_request",
+        "lookup_mirror",
+        "fetch_data",
+        "result_rows",
+        "normalize_key",
+    ],
+    defaults=(None,),
+)
+Strategy.__doc__ = """
+A lookup strategy used by the export scripts.
+
+Args:
+    key_columns (tuple): The input columns passed to `fetch_data`, in order.
+    extra_columns (tuple): Further input columns passed to `result_rows`, e.g. the city to check.
+    build_request (function): The function building the (api_endpoint, params) tuple for one lookup key.
+    lookup_mirror (function): The function looking up one lookup key in the offline mirror.
+    fetch_data (function): The function fetching the data for one lookup key.
+    result_rows (function): The function building the Zefix columns from (data, success, *extra values).
+    normalize_key (function, optional): The function mapping the key column values to one lookup key, or to None if they cannot be found. Rows with the same normalized key share one lookup; rows mapped to None are not looked up.
+"""
+
+
+Cascade = namedtuple("Cascade", ["steps"])
+Cascade.__doc__ = """
+A sequence of lookup strategies tried one after another.
+
+Args:
+    steps (tuple): (label, Strategy) tuples in the order they are tried.
+"""
+
+
+def column_values(df, columns):
+    """
+    Get the values of the given columns as row tuples.
+
+    Columns missing from the DataFrame yield empty strings, like `row.get(column, "")`.
+
+    Args:
+        df (DataFrame): The input rows.
+        columns (tuple): The columns to read.
+
+    Returns:
+        list: One tuple of column values per row.
+    """
+    values = [
+        df[column].tolist() if column in df.columns else [""] * len(df)
+        for column in columns
+    ]
+    return list(zip(*values)) if values else [()] * len(df)
+
+
+def output_columns(strategy):
+    """
+    Get the Zefix columns a lookup strategy adds to the input rows.
+
+    Args:
+        strategy (Strategy): The lookup strategy, or a Cascade of strategies.
+
+    Returns:
+        list: The column names.
+    """
+    if isinstance(strategy, Cascade):
+        columns = []
+        for _, step in strategy.steps:
+            columns.extend(c for c in output_columns(step) if c not in columns)
+        return columns + ["zefixStrategy"]
+    placeholder = strategy.result_rows([], False, *[""] * len(strategy.extra_columns))
+    return list(placeholder[0])
+
+
+def input_columns(strategy):
+    """
+    Get the input columns a lookup strategy reads.
+
+    Args:
+        strategy (Strategy): The lookup strategy, or a Cascade of strategies.
+
+    Returns:
+        list: The column names.
+    """
+    if isinstance(strategy, Cascade):
+        columns = []
+        for _, step in strategy.steps:
+            columns.extend(c for c in input_columns(step) if c not in columns)
+        return columns
+    return list(strategy.key_columns + strategy.extra_columns)
+
+
+def strategy_id(strategy):
+    """
+    Identify a lookup strategy by the columns it reads, or a Cascade by its step labels.
+
+    Args:
+        strategy (Strategy): The lookup strategy, or a Cascade of strategies.
+
+    Returns:
+        str: The identifier.
+    """
+    if isinstance(strategy, Cascade):
+        return "cascade:" + ",".join(label for label, _ in strategy.steps)
+    return ",".join(strategy.key_columns + strategy.extra_columns)
+
+
+def fetch_unique(
+    strategy, keys, engine="thread", max_concurrency=DEFAULT_MAX_CONCURRENCY
+):
+    """
+    Fetch every distinct lookup key exactly once.
+
+    Args:
+        strategy (Strategy): The lookup strategy.
+        keys (list): The lookup keys, possibly containing duplicates.
+        engine (str): "thread" to use a thread pool, "async" to use the asyncio engine.
+        max_concurrency (int): The maximum number of concurrent requests.
+
+    Returns:
+        dict: A dictionary mapping each distinct key to its (data, success) tuple.
+    """
+    unique_keys = list(dict.fromkeys(keys))
+    # Keys a strategy normalized to None cannot be found, so they are not looked up
+    invalid = {key: ([], False) for key in unique_keys if key == (None,)}
+    if invalid:
+        unique_keys = [key for key in unique_keys if key not in invalid]
+        metrics.inc("lookups_skipped_total", len(invalid))
+
+    if engine == "async":
+        from .config import cache, circuit_breaker, password, rate_limiter, username
+
+        results = {}
+        for key in unique_keys:
+            data = strategy.lookup_mirror(*key)
+            if data:
+                results[key] = (data, True)
+        unique_keys = [key for key in unique_keys if key not in results]
+        fetched = async_engine.fetch_all(
+            [strategy.build_request(*key) for key in unique_keys],
+            max_concurrency,
+            username,
+            password,
+            cache=cache,
+            rate_limiter=rate_limiter,
+            circuit_breaker=circuit_breaker,
+        )
+        results.update(zip(unique_keys, fetched))
+        results.update(invalid)
+        return results
+
+    if engine != "thread":
+        raise ValueError(f"Unknown engine: {engine}")
+
+    from .config import session
+
+    size_connection_pool(session, max_concurrency)
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        results = dict(
+            zip(
+                unique_keys,
+                executor.map(lambda key: strategy.fetch_data(*key), unique_keys),
+            )
+        )
+    results.update(invalid)
+    return results
+
+
+def enrich_frame(df, strategy, **options):
+    """
+    Enrich rows with data fetched from the Zefix API.
+
+    Duplicate lookup keys are fetched once. The Zefix columns are built once
+    per distinct key and joined onto the input rows in a single merge, so a
+    key with several results fans out to several output rows.
+
+    Args:
+        df (DataFrame): The input rows.
+        strategy (Strategy): The lookup strategy.
+        options (dict): Additional options for `fetch_unique` (engine, max_concurrency).
+
+    Returns:
+        tuple: The updated rows, with an `_index` column holding the index of
+        their input row, and a list telling for each input row whether its
+        lookup completed (False if it failed transiently).
+    """
+    keys = column_values(df, strategy.key_columns + strategy.extra_columns)
+    fetch_width = len(strategy.key_columns)
+    if strategy.normalize_key is not None:
+        normalized = {
+            key: (strategy.normalize_key(*key),)
+            for key in {key[:fetch_width] for key in keys}
+        }
+        keys = [normalized[key[:fetch_width]] + key[fetch_width:] for key in keys]
+        fetch_width = 1
+    groups = {}
+    row_groups = [groups.setdefault(key, len(groups)) for key in keys]
+
+    with metrics.stage("fetch"):
+        results = fetch_unique(
+            strategy, [key[:fetch_width] for key in groups], **options
+        )
+
+    with metrics.stage("assemble"):
+        return _assemble(df, strategy, groups, row_groups, results, fetch_width)
+
+
+def _assemble(df, strategy, groups, row_groups, results, fetch_width):
+    records = []
+    record_groups = []
+    group_complete = []
+    for key, group in groups.items():
+        data, success = results[key[:fetch_width]]
+        fields = strategy.result_rows(data, success, *key[fetch_width:])
+        records.extend(fields)
+        record_groups.extend([group] * len(fields))
+        group_complete.append(success is not None)
+
+    results_df = pd.DataFrame.from_records(records)
+    results_df["_group"] = record_groups
+    left = df.drop(columns=[c for c in results_df.columns if c in df.columns])
+    left = left.assign(_index=df.index, _group=row_groups)
+    updated_df = left.merge(results_df, on="_group", how="left", sort=False)
+    updated_df.drop(columns="_group", inplace=True)
+    return updated_df, [group_complete[group] for group in row_groups]
+
+
+def enrich_cascade(df, cascade, **options):
+    """
+    Enrich rows by trying several lookup strategies in order.
+
+    A step only sees the rows that no earlier step resolved and that have a
+    value in every column the step needs. The label of the step that
+    resolved a row is written to the `zefixStrategy` column. Rows no step
+    resolves are marked NOT_FOUND, or FETCH_ERROR if a step failed transiently.
+
+    Args:
+        df (DataFrame): The input rows.
+        cascade (Cascade): The lookup strategies.
+        options (dict): Additional options for `fetch_unique` (engine, max_concurrency).
+
+    Returns:
+        tuple: The updated rows with an `_index` column and the per-row completion flags, like `enrich_frame`.
+    """
+    result_columns = []
+    parts = []
+    remaining = df
+    errored = set()
+    for label, strategy in cascade.steps:
+        result_columns.extend(
+            c for c in output_columns(strategy) if c not in result_columns
+        )
+
+        columns = list(strategy.key_columns + strategy.extra_columns)
+        if remaining.empty or not set(columns) <= set(remaining.columns):
+            continue
+        values = remaining[columns]
+        eligible = remaining[
+            (values.notna() & (values.astype(str).apply(lambda c: c.str.strip()) != ""))
+            .all(axis=1)
+            .to_numpy()
+        ]
+        if eligible.empty:
+            continue
+
+        updated_df, complete = enrich_frame(eligible, strategy, **options)
+        errored.update(eligible.index[[not c for c in complete]])
+        found = ~updated_df["zefixName"].isin([NOT_FOUND, FETCH_ERROR])
+        resolved = set(updated_df.loc[found, "_index"])
+        parts.append(
+            updated_df[updated_df["_index"].isin(resolved)].assign(zefixStrategy=label)
+        )
+        remaining = remaining[~remaining.index.isin(resolved)]
+
+    unresolved = remaining.assign(_index=remaining.index)
+    for column in result_columns:
+        unresolved[column] = [
+            FETCH_ERROR if index in errored else NOT_FOUND for index in remaining.index
+        ]
+    parts.append(unresolved.assign(zefixStrategy=""))
+
+    position = pd.Series(range(len(df)), index=df.index)
+    updated_df = pd.concat(parts, ignore_index=True)
+    updated_df = updated_df.iloc[
+        position[updated_df["_index"]].to_numpy().argsort(kind="stable")
+    ]
+    input_columns = [c for c in df.columns if c not in result_columns]
+    updated_df = updated_df[
+        input_columns + ["_index"] + result_columns + ["zefixStrategy"]
+    ]
+    unresolved_errors = errored & set(remaining.index)
+    return updated_df, [index not in unresolved_errors for index in df.index]
+
+
+def read_chunks(
+    input_csv, delimiter, encoding, chunksize=None, batch_size=None, columns=None
+):
+    """
+    Read the input CSV file, either at once or in chunks.
+
+    Args:
+        input_csv (str): The path to the input CSV file.
+        delimiter (str, optional): The delimiter of the input CSV file, detected if None.
+        encoding (str, optional): The encoding of the input CSV file, detected if None.
+        chunksize (int, optional): The number of rows per chunk read from disk. None reads the whole file.
+        batch_size (int, optional): When the whole file is read, split it into batches of this many rows.
+        columns (list, optional): The columns to load. None loads all columns.
+
+    Returns:
+        iterable: An iterable of DataFrames.
+    """
+    chunks = read_input(input_csv, delimiter, encoding, columns, chunksize)
+    if chunksize is not None:
+        return chunks
+    df = chunks[0]
+    if batch_size is None:
+        return [df]
+    return (
+        df.iloc[start : start + batch_size] for start in range(0, len(df), batch_size)
+    )
+
+
+def reuse_rows(df, stored, columns):
+    """
+    Build the output rows of input rows from stored results.
+
+    Args:
+        df (DataFrame): The input rows.
+        stored (list): For each input row, its list of stored result rows.
+        columns (list): The Zefix columns, replaced by the stored values.
+
+    Returns:
+        DataFrame: The output rows with an `_index` column, like `enrich_frame`.
+    """
+    results_df = pd.DataFrame.from_records(
+        [
+            dict(result, _index=index)
+            for index, results in zip(df.index, stored)
+            for result in results
+        ],
+        columns=columns + ["_index"],
+    )
+    left = df.drop(columns=[c for c in columns if c in df.columns])
+    left = left.assign(_index=df.index)
+    return left.merge(results_df, on="_index", how="left", sort=False)
+
+
+def compare_and_update(
+    input_csv,
+    output_csv,
+    strategy,
+    delimiter=None,
+    encoding=None,
+    engine="thread",
+    max_concurrency=DEFAULT_MAX_CONCURRENCY,
+    chunksize=None,
+    journal=None,
+    checkpoint_every=1000,
+    delta=None,
+    revalidate_after=None,
+    output_format=None,
+    columns=None,
+):
+    """
+    Compare and update a CSV file with data fetched from the Zefix API.
+
+    With `chunksize` set, the input is read, enriched and appended to the
+    output one chunk at a time, so memory use stays flat regardless of the
+    size of the input.
+
+    The delimiter and encoding of the input are detected unless given, and
+    the input is read with pyarrow when it is installed. With `columns` set,
+    only those columns and the ones the strategy reads are loaded.
+
+    With `journal` set, completed rows are checkpointed to the journal file.
+    A run restarted after a crash skips the rows found in the journal and
+    produces the same output as an uninterrupted run. The journal is deleted
+    once the run has finished without transient failures; otherwise running
+    again retries only the failed rows.
+
+    The output is written as CSV, or as Parquet or Arrow IPC (stream format)
+    when `output_format` or the extension of `output_csv` (.parquet, .arrows)
+    says so. Parquet and Arrow output store the Zefix columns as strings and
+    the repetitive ones as dictionary-encoded categoricals.
+
+    With `delta` set, the Zefix results of every row are kept in a fingerprint
+    store keyed by a hash of the input row. Later runs look up only new or
+    changed rows and reuse the stored results for the others. A store can be
+    shared by several exports and shards; each keeps and prunes its own rows.
+
+    Args:
+        input_csv (str): The path to the input CSV file.
+        output_csv (str): The path to the output file.
+        strategy (Strategy): The lookup strategy, or a Cascade of strategies.
+        delimiter (str, optional): The delimiter of the input CSV file, detected if None.
+        encoding (str, optional): The encoding of the input CSV file, detected if None.
+        engine (str): "thread" (default) to fetch with a thread pool, "async" to fetch with aiohttp.
+        max_concurrency (int): The maximum number of concurrent requests.
+        chunksize (int, optional): The number of rows per chunk. None processes the whole file at once.
+        journal (str, optional): The path to the checkpoint journal file.
+        checkpoint_every (int): Rows per checkpoint when `journal` is set and `chunksize` is not.
+        delta (str, optional): The path to the fingerprint store database.
+        revalidate_after (float, optional): Look up rows again whose stored results are older than this many days.
+        output_format (str, optional): "csv", "parquet" or "arrow". Defaults to the format matching the extension of `output_csv`.
+        columns (list, optional): The input columns to keep besides the ones the strategy reads. None keeps all columns.
+    """
+    started = time.time()
+    writer = OutputWriter(output_csv, output_format)
+    batch_size = None
+    if journal is not None:
+        journal = Journal(journal, input_csv)
+        if journal.completed:
+            print(f"Resuming: {len(journal.completed)} rows already completed.")
+        batch_size = checkpoint_every
+    if delta is not None:
+        delta = FingerprintStore(delta, delta_scope(strategy_id(strategy), input_csv))
+        max_age = revalidate_after * 24 * 3600 if revalidate_after else None
+        columns_out = output_columns(strategy)
+    with metrics.stage("read"):
+        if columns is not None:
+            columns = list(columns) + input_columns(strategy) + [ROW_COLUMN]
+        chunks = read_chunks(
+            input_csv, delimiter, encoding, chunksize, batch_size, columns
+        )
+
+    failed = 0
+    reused = 0
+    for chunk in metrics.timed(chunks, "read"):
+        pending = chunk
+        if journal is not None:
+            pending = chunk[[index not in journal.completed for index in chunk.index]]
+        known = []
+        if delta is not None:
+            # The position of a row in a shard is not part of its content
+            content = chunk.drop(columns=ROW_COLUMN, errors="ignore")
+            fingerprints = pd.Series(
+                row_fingerprints(content, strategy_id(strategy)), index=chunk.index
+            )
+            stored = delta.get_many(fingerprints[pending.index], max_age)
+            hit = fingerprints[pending.index].isin(stored).to_numpy()
+            if hit.any():
+                known.append(
+                    reuse_rows(
+                        pending[hit],
+                        [stored[f] for f in fingerprints[pending.index][hit]],
+                        columns_out,
+                    )
+                )
+                reused += int(hit.sum())
+                pending = pending[~hit]
+
+        enrich = enrich_cascade if isinstance(strategy, Cascade) else enrich_frame
+        updated_df, complete = enrich(
+            pending, strategy, engine=engine, max_concurrency=max_concurrency
+        )
+        failed += complete.count(False)
+        metrics.inc("rows_total", len(chunk))
+        metrics.inc("rows_failed_total", complete.count(False))
+
+        # Rows that failed transiently are left out so a later run retries them
+        done = set(pending.index[complete])
+        if delta is not None:
+            delta.put_many(
+                (fingerprints[index], group[columns_out].to_dict("records"))
+                for index, group in updated_df.groupby("_index", sort=False)
+                if index in done
+            )
+            delta.touch(fingerprints)
+        if journal is not None:
+            journal.record(
+                (index, group.drop(columns="_index").to_dict("records"))
+                for index, group in updated_df.groupby("_index", sort=False)
+                if index in done
+            )
+            resumed = [
+                dict(record, _index=index)
+                for index in chunk.index
+                if index in journal.completed
+                for record in journal.completed[index]
+            ]
+            if resumed:
+                known.append(pd.DataFrame(resumed))
+
+        if known:
+            position = pd.Series(range(len(chunk)), index=chunk.index)
+            # Without pending rows the enriched frame only holds float64
+            # placeholder columns, which would turn reused integers into floats
+            parts = [updated_df] if not pending.empty else []
+            updated_df = pd.concat(parts + known)
+            updated_df = updated_df.iloc[
+                position[updated_df["_index"]].to_numpy().argsort(kind="stable")
+            ]
+
+        updated_df = updated_df.drop(columns="_index").reset_index(drop=True)
+        with metrics.stage("write"):
+            writer.write(updated_df)
+
+    writer.close()
+    if journal is not None:
+        journal.close(remove=not failed)
+    if delta is not None:
+        metrics.inc("rows_reused_total", reused)
+        pruned = delta.prune(started)
+        delta.close()
+        print(f"Delta: reused {reused} unchanged rows, pruned {pruned} stale rows.")
+    if failed:
+        print(f"{failed} rows could not be fetched and are marked {FETCH_ERROR}.")
+    print(f"Updated data saved to {output_csv}.")
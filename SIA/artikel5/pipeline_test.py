@@ -0,0 +1,408 @@
+# pipeline_test.py
+import sys
+import types
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+
+from SIA.artikel5 import pipeline
+from SIA.artikel5.uid import parse_uid
+from SIA.artikel5.utils import (
+    FETCH_ERROR,
+    NOT_FOUND,
+    result_rows,
+    result_rows_uid,
+    result_rows_with_city_check,
+)
+
+
+def company(name, legal_seat, legal_seat_id, uid):
+    return {
+        "name": name,
+        "legalSeat": legal_seat,
+        "legalSeatId": legal_seat_id,
+        "uid": uid,
+        "chid": "CH" + uid[4:].replace(".", ""),
+        "address": {"street": "Weg", "houseNumber": "1", "city": legal_seat},
+    }
+
+
+MUSTER = company("Muster AG", "Bern", 351, "CHE-109.322.551")
+BETA_ZURICH = company("Beta GmbH", "Zürich", 261, "CHE-116.281.710")
+BETA_BASEL = company("Beta GmbH", "Basel", 2701, "CHE-100.000.004")
+
+# The stub API: names and UIDs missing here are not found, "Error AG"
+# fails transiently
+BY_NAME = {"Muster AG": [MUSTER], "Beta GmbH": [BETA_ZURICH, BETA_BASEL]}
+BY_UID = {parse_uid(MUSTER["uid"]): [MUSTER]}
+
+# Every chunk of 4 rows holds different cases; the rows of the second
+# chunk are all found and the note column is empty in the first one
+INPUT = pd.DataFrame(
+    {
+        "id": range(1, 13),
+        "name": [
+            "Muster AG",
+            "Beta GmbH",
+            "Gamma AG",
+            "Error AG",
+            "Muster AG",
+            "Beta GmbH",
+            "Muster AG",
+            "Beta GmbH",
+            np.nan,
+            "Gamma AG",
+            "Beta GmbH",
+            "Delta SA",
+        ],
+        "city": [
+            "Bern",
+            "Basel",
+            "Bern",
+            "",
+            "",
+            "Zürich",
+            "Thun",
+            "basel",
+            "Thun",
+            np.nan,
+            "Genf",
+            "Lausanne",
+        ],
+        "uid": [
+            "",
+            "",
+            "CHE-109.322.551",
+            "",
+            "CHE109322551",
+            "",
+            "",
+            "",
+            "CHE-109.322.552",
+            "",
+            "",
+            "CHE-116.281.710",
+        ],
+        "note": ["", "", "", "", "", "x", "", "y", "", "", "z", ""],
+    }
+)
+
+
+class StubApi:
+    def __init__(self, crash_after=None):
+        self.calls = []
+        self.crash_after = crash_after
+
+    def fetch(self, table, key):
+        if self.crash_after is not None and len(self.calls) >= self.crash_after:
+            raise RuntimeError("crash")
+        self.calls.append(key)
+        if key == "Error AG":
+            return [], None
+        data = table.get(key, [])
+        return data, bool(data)
+
+    def by_name(self, name):
+        return self.fetch(BY_NAME, name)
+
+    def by_uid(self, uid):
+        return self.fetch(BY_UID, uid)
+
+
+def name_strategy(api):
+    return pipeline.Strategy(
+        key_columns=("name",),
+        extra_columns=(),
+        build_request=None,
+        lookup_mirror=lambda name: [],
+        fetch_data=api.by_name,
+        result_rows=result_rows,
+    )
+
+
+def city_strategy(api):
+    return pipeline.Strategy(
+        key_columns=("name",),
+        extra_columns=("city",),
+        build_request=None,
+        lookup_mirror=lambda name: [],
+        fetch_data=api.by_name,
+        result_rows=result_rows_with_city_check,
+    )
+
+
+def uid_strategy(api):
+    return pipeline.Strategy(
+        key_columns=("uid",),
+        extra_columns=(),
+        build_request=None,
+        lookup_mirror=lambda uid: [],
+        fetch_data=api.by_uid,
+        result_rows=result_rows_uid,
+        normalize_key=parse_uid,
+    )
+
+
+def cascade(api):
+    return pipeline.Cascade(
+        steps=(
+            ("uid", uid_strategy(api)),
+            ("name_city", city_strategy(api)),
+            ("name", name_strategy(api)),
+        )
+    )
+
+
+@pytest.fixture(autouse=True)
+def config(monkeypatch):
+    # The thread engine takes the HTTP session from the config module, which
+    # needs API credentials; the stub strategies never use it
+    stub = types.ModuleType("SIA.artikel5.config")
+    stub.session = requests.Session()
+    monkeypatch.setitem(sys.modules, "SIA.artikel5.config", stub)
+
+
+@pytest.fixture
+def input_csv(tmp_path):
+    path = str(tmp_path / "input.csv")
+    INPUT.to_csv(path, index=False)
+    return path
+
+
+def run(input_csv, output, strategy, **options):
+    pipeline.compare_and_update(input_csv, output, strategy, **options)
+    return pd.read_csv(output)
+
+
+def lookup(strategy, row):
+    # The result of one row looked up on its own, like the original scripts
+    key = [row[column] for column in strategy.key_columns]
+    extra = [row[column] for column in strategy.extra_columns]
+    if strategy.normalize_key is not None:
+        key = [strategy.normalize_key(*key)]
+    data, success = ([], False) if key == [None] else strategy.fetch_data(*key)
+    return strategy.result_rows(data, success, *extra), success
+
+
+def per_row(input_csv, strategy):
+    df = pd.read_csv(input_csv)
+    records = []
+    for _, row in df.iterrows():
+        fields, _ = lookup(strategy, row)
+        records.extend(dict(row, **values) for values in fields)
+    return pd.DataFrame.from_records(records)
+
+
+def per_row_cascade(input_csv, cascade):
+    df = pd.read_csv(input_csv)
+    result_columns = pipeline.output_columns(cascade)
+    records = []
+    for _, row in df.iterrows():
+        errored = False
+        for label, strategy in cascade.steps:
+            values = [row[c] for c in strategy.key_columns + strategy.extra_columns]
+            if any(pd.isna(value) or not str(value).strip() for value in values):
+                continue
+            fields, success = lookup(strategy, row)
+            errored = errored or success is None
+            if any(v["zefixName"] not in (NOT_FOUND, FETCH_ERROR) for v in fields):
+                records.extend(dict(row, **v, zefixStrategy=label) for v in fields)
+                break
+        else:
+            missing = FETCH_ERROR if errored else NOT_FOUND
+            values = dict.fromkeys(result_columns[:-1], missing)
+            records.append(dict(row, **values, zefixStrategy=""))
+    return pd.DataFrame.from_records(records, columns=list(df.columns) + result_columns)
+
+
+def assert_same_file(path, expected):
+    expected_path = path + ".expected.csv"
+    expected.to_csv(expected_path, index=False)
+    with open(path, encoding="utf-8") as output:
+        with open(expected_path, encoding="utf-8") as expected_output:
+            assert output.read() == expected_output.read()
+
+
+@pytest.mark.parametrize("chunksize", [None, 4, 5])
+@pytest.mark.parametrize("make_strategy", [name_strategy, city_strategy, uid_strategy])
+def test_matches_the_per_row_result(tmp_path, input_csv, make_strategy, chunksize):
+    strategy = make_strategy(StubApi())
+    output = str(tmp_path / "output.csv")
+    pipeline.compare_and_update(input_csv, output, strategy, chunksize=chunksize)
+    assert_same_file(output, per_row(input_csv, strategy))
+
+
+def test_placeholders_and_fan_out(tmp_path, input_csv):
+    api = StubApi()
+    df = run(input_csv, str(tmp_path / "output.csv"), name_strategy(api))
+    assert list(df.columns) == list(INPUT.columns) + [
+        "zefixName",
+        "zefixLegalSeat",
+        "zefixLegalSeatId",
+        "zefixUid",
+    ]
+    assert list(zip(df["id"], df["zefixLegalSeat"])) == [
+        (1, "Bern"),
+        (2, "Zürich"),
+        (2, "Basel"),
+        (3, NOT_FOUND),
+        (4, FETCH_ERROR),
+        (5, "Bern"),
+        (6, "Zürich"),
+        (6, "Basel"),
+        (7, "Bern"),
+        (8, "Zürich"),
+        (8, "Basel"),
+        (9, NOT_FOUND),
+        (10, NOT_FOUND),
+        (11, "Zürich"),
+        (11, "Basel"),
+        (12, NOT_FOUND),
+    ]
+    # Every distinct key is fetched once
+    assert sorted(map(str, api.calls)) == [
+        "Beta GmbH",
+        "Delta SA",
+        "Error AG",
+        "Gamma AG",
+        "Muster AG",
+        "nan",
+    ]
+
+
+def test_uid_spellings_share_one_lookup(tmp_path, input_csv):
+    api = StubApi()
+    run(input_csv, str(tmp_path / "output.csv"), uid_strategy(api))
+    # CHE-109.322.552 fails the check digit and is not looked up
+    assert sorted(api.calls) == [
+        parse_uid("CHE-109.322.551"),
+        parse_uid("CHE-116.281.710"),
+    ]
+
+
+@pytest.mark.parametrize("chunksize", [None, 4])
+def test_cascade_matches_the_per_row_result(tmp_path, input_csv, chunksize):
+    strategy = cascade(StubApi())
+    output = str(tmp_path / "output.csv")
+    pipeline.compare_and_update(input_csv, output, strategy, chunksize=chunksize)
+    assert_same_file(output, per_row_cascade(input_csv, strategy))
+
+    df = pd.read_csv(output, keep_default_na=False)
+    assert list(zip(df["id"], df["zefixStrategy"], df["zefixLegalSeat"])) == [
+        (1, "name_city", "Bern"),
+        (2, "name_city", "Basel"),
+        (3, "uid", "Bern"),
+        (4, "", FETCH_ERROR),
+        (5, "uid", "Bern"),
+        (6, "name_city", "Zürich"),
+        (7, "name", "Bern"),
+        (8, "name_city", "Basel"),
+        (9, "", NOT_FOUND),
+        (10, "", NOT_FOUND),
+        (11, "name", "Zürich"),
+        (11, "name", "Basel"),
+        (12, "", NOT_FOUND),
+    ]
+
+
+# The lookups after resuming: of the first batch of 4 rows only the failed
+# one is repeated
+RESUMED_CALLS = [
+    (
+        name_strategy,
+        [
+            "Error AG",
+            "Muster AG",
+            "Beta GmbH",
+            "nan",
+            "Gamma AG",
+            "Beta GmbH",
+            "Delta SA",
+        ],
+    ),
+    (
+        cascade,
+        [
+            "Error AG",
+            "109322551",
+            "Muster AG",
+            "Beta GmbH",
+            "Muster AG",
+            "Beta GmbH",
+            "116281710",
+            "Gamma AG",
+            "Beta GmbH",
+            "Delta SA",
+            "Delta SA",
+        ],
+    ),
+]
+
+
+@pytest.mark.parametrize("chunksize", [None, 4])
+@pytest.mark.parametrize("make_strategy, calls", RESUMED_CALLS)
+def test_resume_from_the_journal(tmp_path, input_csv, make_strategy, calls, chunksize):
+    fresh = str(tmp_path / "fresh.csv")
+    pipeline.compare_and_update(input_csv, fresh, make_strategy(StubApi()))
+
+    # The first run crashes in the second batch of rows
+    output = str(tmp_path / "output.csv")
+    journal = str(tmp_path / "journal.jsonl")
+    options = dict(chunksize=chunksize, journal=journal, checkpoint_every=4)
+    with pytest.raises(RuntimeError):
+        pipeline.compare_and_update(
+            input_csv, output, make_strategy(StubApi(crash_after=5)), **options
+        )
+
+    api = StubApi()
+    pipeline.compare_and_update(input_csv, output, make_strategy(api), **options)
+    assert sorted(map(str, api.calls)) == sorted(calls)
+    with open(output, encoding="utf-8") as output_file:
+        with open(fresh, encoding="utf-8") as fresh_file:
+            assert output_file.read() == fresh_file.read()
+
+
+@pytest.mark.parametrize("make_strategy", [name_strategy, cascade])
+def test_chunked_parquet_matches_csv(tmp_path, input_csv, make_strategy):
+    pytest.importorskip("pyarrow")
+    strategy = make_strategy(StubApi())
+    output = str(tmp_path / "output.parquet")
+    fresh = run(input_csv, str(tmp_path / "fresh.csv"), strategy)
+    pipeline.compare_and_update(input_csv, output, strategy, chunksize=4)
+    df = pd.read_parquet(output)
+    pd.testing.assert_frame_equal(
+        df.astype("string").fillna(""), fresh.astype("string").fillna("")
+    )
+
+
+@pytest.mark.parametrize("chunksize", [None, 4])
+@pytest.mark.parametrize("make_strategy", [name_strategy, cascade])
+def test_delta_rerun_matches_a_fresh_run(tmp_path, input_csv, make_strategy, chunksize):
+    api = StubApi()
+    strategy = make_strategy(api)
+    delta = str(tmp_path / "delta.sqlite3")
+    fresh = run(input_csv, str(tmp_path / "fresh.csv"), strategy, chunksize=chunksize)
+    run(
+        input_csv,
+        str(tmp_path / "first.csv"),
+        strategy,
+        chunksize=chunksize,
+        delta=delta,
+    )
+
+    # Only the transiently failed row is looked up again
+    api.calls.clear()
+    rerun = run(
+        input_csv,
+        str(tmp_path / "rerun.csv"),
+        strategy,
+        chunksize=chunksize,
+        delta=delta,
+    )
+    assert api.calls == ["Error AG"]
+    pd.testing.assert_frame_equal(rerun, fresh)
+    with open(str(tmp_path / "rerun.csv")) as rerun_file:
+        with open(str(tmp_path / "fresh.csv")) as fresh_file:
+            assert rerun_file.read() == fresh_file.read()
@@ -0,0 +1,202 @@
+# ratelimit.py
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket shared by all workers whose rate adapts to the API.
+
+    Every success raises the rate a little (additive increase), every 429
+    halves it (multiplicative decrease) and blocks all workers for the
+    Retry-After period. The rate therefore settles just below the highest
+    rate the API accepts.
+    """
+
+    def __init__(self, rate=10.0, min_rate=0.5, max_rate=200.0, burst=1):
+        """
+        Create the rate limiter.
+
+        Args:
+            rate (float): The initial number of requests per second.
+            min_rate (float): The lowest rate the limiter backs off to.
+            max_rate (float): The highest rate the limiter ramps up to.
+            burst (int): The bucket capacity, i.e. how many requests may be sent at once.
+        """
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.burst = burst
+        # The bucket is tracked as the time at which it will be full again
+        # (generic cell rate algorithm), which avoids a refill timer
+        self._full_at = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """
+        Take a token from the bucket.
+
+        Returns:
+            float: The number of seconds the caller has to wait before sending its request.
+        """
+        with self._lock:
+            now = time.monotonic()
+            interval = 1.0 / self.rate
+            full_at = max(self._full_at, now, self._blocked_until)
+            self._full_at = full_at + interval
+            return max(0.0, full_at - now - (self.burst - 1) * interval)
+
+    def acquire(self):
+        """
+        Block until the caller may send its request.
+        """
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def on_success(self):
+        """
+        Record a request the API accepted and ramp up the rate.
+        """
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 1.0 / self.rate)
+
+    def on_throttle(self, retry_after=None):
+        """
+        Record a 429 response and slow down.
+
+        Args:
+            retry_after (float, optional): The number of seconds the API asked us to wait.
+        """
+        with self._lock:
+            now = time.monotonic()
+            # Responses to requests sent before the last decrease should not
+            # halve the rate again
+            if now - self._last_decrease > 1.0:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._last_decrease = now
+            if retry_after:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+
+
+class CircuitBreaker:
+    """
+    Stop calling the API after too many consecutive transient failures.
+
+    Once `failure_threshold` failures in a row are recorded, the breaker opens
+    and calls fail fast for `reset_timeout` seconds. Afterwards one trial call
+    is let through; its outcome closes or re-opens the breaker. A trial that
+    is throttled, or whose outcome is never recorded, is replaced by a new
+    trial, the latter after another `reset_timeout` seconds.
+    """
+
+    def __init__(self, failure_threshold=20, reset_timeout=30.0):
+        """
+        Create the circuit breaker.
+
+        Args:
+            failure_threshold (int): The number of consecutive failures that opens the breaker.
+            reset_timeout (float): The number of seconds the breaker stays open.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """
+        Check whether a call may be made.
+
+        Returns:
+            bool: True if the call may be made, False if it should fail fast.
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at < self.reset_timeout:
+                return False
+            if (
+                self._trial_started is not None
+                and now - self._trial_started < self.reset_timeout
+            ):
+                return False
+            self._trial_started = now
+            return True
+
+    def record_success(self):
+        """
+        Record a successful call and close the breaker.
+        """
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_started = None
+
+    def record_failure(self):
+        """
+        Record a transient failure and open the breaker if the threshold is reached.
+        """
+        with self._lock:
+            self._failures += 1
+            if (
+                self._trial_started is not None
+                or self._failures >= self.failure_threshold
+            ):
+                self._opened_at = time.monotonic()
+                self._trial_started = None
+
+    def record_throttle(self):
+        """
+        Record a 429 response and end the running trial, if any.
+
+        Throttling does not count as a failure, but the throttled trial will
+        not report an outcome either, so the next call becomes the new trial.
+        """
+        with self._lock:
+            self._trial_started = None
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """
+    Compute the delay before a retry using exponential backoff with full jitter.
+
+    Args:
+        attempt (int): The number of the failed attempt, starting at 0.
+        base (float): The delay after the first failure in seconds.
+        cap (float): The maximum delay in seconds.
+
+    Returns:
+        float: The number of seconds to wait.
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def parse_retry_after(value):
+    """
+    Parse the value of a Retry-After header.
+
+    Args:
+        value (str): The header value, either a number of seconds or an HTTP date.
+
+    Returns:
+        float: The number of seconds to wait, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
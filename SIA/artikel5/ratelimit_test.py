@@ -0,0 +1,97 @@
+# ratelimit_test.py
+import time
+
+import pytest
+
+from SIA.artikel5.ratelimit import (
+    AdaptiveRateLimiter,
+    CircuitBreaker,
+    backoff_delay,
+    parse_retry_after,
+)
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = AdaptiveRateLimiter(rate=10.0)
+    waits = [limiter.reserve() for _ in range(3)]
+    assert waits[0] == 0.0
+    assert waits[1] == pytest.approx(0.1, abs=0.01)
+    assert waits[2] == pytest.approx(0.2, abs=0.01)
+
+
+def test_rate_limiter_adapts_to_throttling():
+    limiter = AdaptiveRateLimiter(rate=10.0, min_rate=4.0, max_rate=10.05)
+    limiter.on_success()
+    assert limiter.rate == 10.05
+    limiter.on_throttle()
+    assert limiter.rate == pytest.approx(5.025)
+    # A second 429 right after the first one does not halve the rate again
+    limiter.on_throttle(retry_after=2)
+    assert limiter.rate == pytest.approx(5.025)
+    assert limiter.reserve() == pytest.approx(2.0, abs=0.05)
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    # Once the timeout has passed a single trial call is let through
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    # A failed trial re-opens the breaker
+    breaker.record_failure()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.allow() and breaker.allow()
+
+
+def test_circuit_breaker_throttled_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    breaker.record_failure()
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    # A 429 ends the trial without closing or re-opening the breaker
+    breaker.record_throttle()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert all(breaker.allow() for _ in range(3))
+
+
+def test_circuit_breaker_abandoned_trial_times_out():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow()
+    assert not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow()
+
+
+def test_circuit_breaker_fails_fast_while_open():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60)
+    breaker.record_failure()
+    assert not breaker.allow()
+
+
+def test_backoff_delay():
+    assert all(0 <= backoff_delay(attempt) <= 0.5 * 2**attempt for attempt in range(5))
+    assert all(backoff_delay(20, cap=3.0) <= 3.0 for _ in range(100))
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [("3", 3.0), ("-1", 0.0), ("", None), (None, None), ("soon", None)],
+)
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_http_date():
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
@@ -0,0 +1,196 @@
+# shard.py
+import csv
+import hashlib
+import heapq
+import os
+
+import pandas as pd
+
+from .ingest import sniff
+from .output import OutputWriter, output_format
+from .uid import compact_uid, parse_uid
+
+# Column added to every shard row holding the position of the row in the input
+ROW_COLUMN = "_row"
+
+
+def _uid_key(value):
+    number = parse_uid(value)
+    return compact_uid(number) if number is not None else value
+
+
+# Key columns the lookup strategies normalize before looking them up
+KEY_NORMALIZERS = {"uid": _uid_key}
+
+
+def normalize_key(columns, values):
+    """
+    Normalize the values of the key columns the way the lookup strategies do.
+
+    Values are stripped, and UIDs in any spelling accepted by
+    `uid.parse_uid` become the compact form, e.g. "CHE109322551".
+
+    Args:
+        columns (list): The key columns.
+        values (list): The values of the key columns as read from the CSV file.
+
+    Returns:
+        list: The normalized values.
+    """
+    normalized = []
+    for column, value in zip(columns, values):
+        value = value.strip()
+        normalize = KEY_NORMALIZERS.get(column)
+        normalized.append(normalize(value) if normalize and value else value)
+    return normalized
+
+
+def shard_of(values, shards):
+    """
+    Assign a lookup key to a shard.
+
+    The assignment only depends on the key, so rows with the same key always
+    land in the same shard and are looked up once. Keys spelled differently
+    have to be passed through `normalize_key` first.
+
+    Args:
+        values (list): The values of the key columns.
+        shards (int): The number of shards.
+
+    Returns:
+        int: The shard number, between 0 and `shards` - 1.
+    """
+    key = "\x1f".join(value.strip() for value in values).encode("utf-8")
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, "big") % shards
+
+
+def shard_paths(output_prefix, shards):
+    """
+    Get the paths of the shard files written by `split`.
+
+    Args:
+        output_prefix (str): The path prefix of the shard files.
+        shards (int): The number of shards.
+
+    Returns:
+        list: The paths, e.g. "input.shard-001-of-004.csv".
+    """
+    return [f"{output_prefix}.shard-{i:03d}-of-{shards:03d}.csv" for i in range(shards)]
+
+
+def split(
+    input_csv,
+    output_prefix,
+    shards,
+    key_columns,
+    delimiter=None,
+    encoding=None,
+):
+    """
+    Split an input CSV file into shards by the hash of the lookup key.
+
+    The shards keep the delimiter and encoding of the input, so every shard
+    can be processed by the same export as the whole file. Keys are
+    normalized with `normalize_key`, so e.g. all spellings of a UID land in
+    the same shard. Each row gets a
+    ROW_COLUMN with its position in the input, which `merge` uses to restore
+    the input order.
+
+    Args:
+        input_csv (str): The path to the input CSV file.
+        output_prefix (str): The path prefix of the shard files.
+        shards (int): The number of shards.
+        key_columns (list): The columns making up the lookup key, e.g. ["uid"].
+        delimiter (str, optional): The delimiter of the input CSV file, detected if None.
+        encoding (str, optional): The encoding of the input CSV file, detected if None.
+
+    Returns:
+        list: The paths of the shard files.
+    """
+    dialect = sniff(input_csv, delimiter, encoding)
+    delimiter, encoding = dialect.delimiter, dialect.encoding
+    paths = shard_paths(output_prefix, shards)
+    files = [open(path, "w", newline="", encoding=encoding) for path in paths]
+    try:
+        writers = [csv.writer(file, delimiter=delimiter) for file in files]
+        with open(input_csv, "r", newline="", encoding=encoding) as input_file:
+            reader = csv.reader(input_file, delimiter=delimiter)
+            header = next(reader)
+            missing = [column for column in key_columns if column not in header]
+            if missing:
+                raise ValueError(f"Key columns not found in {input_csv}: {missing}")
+            positions = [header.index(column) for column in key_columns]
+            for writer in writers:
+                writer.writerow(header + [ROW_COLUMN])
+            for row_number, row in enumerate(reader):
+                key = [row[i] if i < len(row) else "" for i in positions]
+                key = normalize_key(key_columns, key)
+                writers[shard_of(key, shards)].writerow(row + [row_number])
+    finally:
+        for file in files:
+            file.close()
+    return paths
+
+
+def _csv_rows(path, columns):
+    with open(path, "r", newline="", encoding="utf-8") as file:
+        reader = csv.reader(file)
+        header = next(reader)
+        if sorted(header) != sorted(columns):
+            raise ValueError(f"{path} does not have the columns of the other shards")
+        order = [header.index(column) for column in columns]
+        row_position = header.index(ROW_COLUMN)
+        for row in reader:
+            yield int(row[row_position]), [row[i] for i in order]
+
+
+def _read_output(path):
+    format = output_format(path)
+    if format == "parquet":
+        return pd.read_parquet(path)
+    if format == "arrow":
+        import pyarrow as pa
+
+        with pa.ipc.open_stream(path) as reader:
+            return reader.read_pandas()
+    return pd.read_csv(path)
+
+
+def merge(shard_outputs, output_csv, format=None):
+    """
+    Merge the outputs of the shards into one file in the order of the input.
+
+    CSV outputs are merged as text, streaming, so the values are written
+    exactly as the shards wrote them. Parquet and Arrow outputs are loaded
+    into memory and sorted.
+
+    Args:
+        shard_outputs (list): The paths of the output files of all shards.
+        output_csv (str): The path to the merged output file.
+        format (str, optional): The format of the merged output, see `output.output_format`.
+    """
+    if output_format(output_csv, format) == "csv" and all(
+        output_format(path) == "csv" for path in shard_outputs
+    ):
+        with open(shard_outputs[0], "r", newline="", encoding="utf-8") as file:
+            columns = next(csv.reader(file))
+        output_columns = [column for column in columns if column != ROW_COLUMN]
+        with open(output_csv, "w", newline="", encoding="utf-8") as file:
+            # Same line ending as the CSV files written by pandas
+            writer = csv.writer(file, lineterminator=os.linesep)
+            writer.writerow(output_columns)
+            keep = [i for i, column in enumerate(columns) if column != ROW_COLUMN]
+            rows = heapq.merge(
+                *(_csv_rows(path, columns) for path in shard_outputs),
+                key=lambda entry: entry[0],
+            )
+            for _, row in rows:
+                writer.writerow([row[i] for i in keep])
+        return
+
+    df = pd.concat([_read_output(path) for path in shard_outputs], ignore_index=True)
+    df = df.sort_values(ROW_COLUMN, kind="stable").drop(columns=ROW_COLUMN)
+    writer = OutputWriter(output_csv, format)
+    writer.write(df.reset_index(drop=True))
+    writer.close()
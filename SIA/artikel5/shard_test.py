@@ -0,0 +1,83 @@
+# shard_test.py
+import csv
+
+import pytest
+
+from SIA.artikel5.shard import ROW_COLUMN, merge, normalize_key, shard_of, split
+
+ROWS = [[str(i), f"Firma {i % 7}", "Zürich" if i % 2 else "Bern"] for i in range(50)]
+
+
+@pytest.fixture
+def input_csv(tmp_path):
+    path = tmp_path / "input.csv"
+    with open(path, "w", newline="", encoding="ISO-8859-1") as file:
+        writer = csv.writer(file, delimiter=";")
+        writer.writerow(["id", "name", "city"])
+        writer.writerows(ROWS)
+    return str(path)
+
+
+def read_rows(path, encoding="utf-8", delimiter=","):
+    with open(path, newline="", encoding=encoding) as file:
+        return list(csv.reader(file, delimiter=delimiter))
+
+
+def test_shard_of_depends_only_on_the_key():
+    assert shard_of(["Firma 1"], 4) == shard_of([" Firma 1 "], 4)
+    assert {shard_of([f"Firma {i}"], 4) for i in range(100)} == {0, 1, 2, 3}
+
+
+def test_normalize_key():
+    assert normalize_key(["uid", "name"], [" CHE-109.322.551 ", " Muster "]) == [
+        "CHE109322551",
+        "Muster",
+    ]
+    # Values that are no valid UID are kept as they are
+    assert normalize_key(["uid"], ["CHE-109.322.552"]) == ["CHE-109.322.552"]
+    assert normalize_key(["uid"], [""]) == [""]
+
+
+def test_split_keeps_uid_spellings_together(tmp_path):
+    input_csv = tmp_path / "uids.csv"
+    spellings = ["CHE-109.322.551", "CHE109322551", "109322551", "che 109 322 551"]
+    input_csv.write_text("uid\n" + "\n".join(spellings) + "\n", encoding="utf-8")
+    paths = split(str(input_csv), str(tmp_path / "uids"), 8, ["uid"])
+    sizes = [len(read_rows(path)) - 1 for path in paths]
+    assert sorted(sizes) == [0] * 7 + [4]
+
+
+def test_split_keeps_keys_together(input_csv, tmp_path):
+    paths = split(input_csv, str(tmp_path / "input"), 3, ["name"])
+    shards = [read_rows(path, "ISO-8859-1", ";") for path in paths]
+    assert all(rows[0] == ["id", "name", "city", ROW_COLUMN] for rows in shards)
+    names = [{row[1] for row in rows[1:]} for rows in shards]
+    assert sum(len(rows) - 1 for rows in shards) == len(ROWS)
+    assert not (names[0] & names[1] or names[0] & names[2] or names[1] & names[2])
+
+
+def test_split_and_merge_round_trip(input_csv, tmp_path):
+    paths = split(input_csv, str(tmp_path / "input"), 3, ["name"])
+    outputs = []
+    for path in paths:
+        # Stand-in for an export: every input row gives two output rows
+        rows = read_rows(path, "ISO-8859-1", ";")
+        output = path.replace(".csv", ".out.csv")
+        with open(output, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(rows[0] + ["result"])
+            for row in rows[1:]:
+                writer.writerows([row + ["AG"], row + ["GmbH"]])
+        outputs.append(output)
+
+    merged = str(tmp_path / "merged.csv")
+    merge(outputs, merged)
+    expected = [["id", "name", "city", "result"]] + [
+        row + [result] for row in ROWS for result in ("AG", "GmbH")
+    ]
+    assert read_rows(merged) == expected
+
+
+def test_split_requires_the_key_columns(input_csv, tmp_path):
+    with pytest.raises(ValueError):
+        split(input_csv, str(tmp_path / "input"), 2, ["uid"])
@@ -0,0 +1,98 @@
+# uid.py
+import math
+import numbers
+import re
+
+# Weights of the eight leading digits in the mod-11 check digit
+UID_WEIGHTS = (5, 4, 3, 2, 7, 6, 5, 4)
+
+# Accepts "CHE-123.456.789", "CHE123456789", "123456789" and the register
+# suffixes (e.g. "CHE-123.456.789 MWST") once separators are removed
+_UID_PATTERN = re.compile(r"(?:CHE)?(\d{9})(?:MWST|TVA|IVA|HR|RC|RI)?")
+_SEPARATORS = re.compile(r"[\s.\-_/]")
+
+
+def check_digit(number):
+    """
+    Compute the mod-11 check digit of the eight leading UID digits.
+
+    Args:
+        number (int): The eight leading digits as an integer.
+
+    Returns:
+        int: The check digit, or None if the digits cannot form a valid UID.
+    """
+    digits = f"{number:08d}"
+    check = 11 - sum(int(d) * w for d, w in zip(digits, UID_WEIGHTS)) % 11
+    if check == 11:
+        return 0
+    if check == 10:
+        return None
+    return check
+
+
+def is_valid(number):
+    """
+    Check the mod-11 check digit of a UID.
+
+    Args:
+        number (int): The nine UID digits as an integer.
+
+    Returns:
+        bool: True if the last digit is the check digit of the others.
+    """
+    return 0 <= number < 10**9 and check_digit(number // 10) == number % 10
+
+
+def parse_uid(value, validate=True):
+    """
+    Parse a UID in any common spelling into its compact integer form.
+
+    Args:
+        value (str): The UID, e.g. "CHE-123.456.789", "CHE123456789", "123456789" or a number.
+        validate (bool): Reject UIDs whose check digit does not match.
+
+    Returns:
+        int: The nine UID digits as an integer, or None if the value is not a (valid) UID.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, float):
+        if math.isnan(value) or not value.is_integer():
+            return None
+        value = int(value)
+    if isinstance(value, numbers.Integral):
+        number = value if 0 <= value < 10**9 else None
+    else:
+        match = _UID_PATTERN.fullmatch(_SEPARATORS.sub("", str(value).upper()))
+        number = int(match.group(1)) if match else None
+    if number is None or (validate and not is_valid(number)):
+        return None
+    return number
+
+
+def format_uid(number):
+    """
+    Format a UID in the Swiss UID format.
+
+    Args:
+        number (int): The nine UID digits as an integer.
+
+    Returns:
+        str: The formatted UID, e.g. "CHE-123.456.789".
+    """
+    digits = f"{number:09d}"
+    return f"CHE-{digits[0:3]}.{digits[3:6]}.{digits[6:9]}"
+
+
+def compact_uid(number):
+    """
+    Format a UID in the compact form used by the Zefix API.
+
+    Args:
+        number (int): The nine UID digits as an integer.
+
+    Returns:
+        str: The compact UID, e.g. "CHE123456789".
+    """
+    return f"CHE{number:09d}"
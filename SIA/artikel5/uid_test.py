@@ -0,0 +1,74 @@
+# uid_test.py
+import pytest
+
+from SIA.artikel5.uid import (
+    check_digit,
+    compact_uid,
+    format_uid,
+    is_valid,
+    parse_uid,
+)
+
+
+def test_check_digit():
+    # CHE-109.322.551: 1*5 + 0*4 + 9*3 + 3*2 + 2*7 + 2*6 + 5*5 + 5*4 = 109
+    assert check_digit(10932255) == 1
+    assert is_valid(109322551)
+    assert not is_valid(109322552)
+    assert not is_valid(10**9)
+
+
+def test_check_digit_of_every_remainder():
+    seen = set()
+    for number in range(0, 10**8, 999983):
+        digit = check_digit(number)
+        seen.add(digit)
+        if digit is not None:
+            assert is_valid(number * 10 + digit)
+    assert None in seen and 0 in seen
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "CHE-109.322.551",
+        "CHE109322551",
+        "che 109 322 551",
+        "109322551",
+        "CHE-109.322.551 MWST",
+        "CHE-109.322.551 HR",
+        109322551,
+        109322551.0,
+    ],
+)
+def test_parse_uid(value):
+    assert parse_uid(value) == 109322551
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        "CHE-109.322.552",
+        "CHE-109.322.55",
+        "DE109322551",
+        "",
+        None,
+        True,
+        1.5,
+        float("nan"),
+    ],
+)
+def test_parse_uid_rejects(value):
+    assert parse_uid(value) is None
+
+
+def test_parse_uid_without_validation():
+    assert parse_uid("CHE-109.322.552") is None
+    assert parse_uid("CHE-109.322.552", validate=False) == 109322552
+
+
+def test_format_uid():
+    assert format_uid(109322551) == "CHE-109.322.551"
+    assert format_uid(1) == "CHE-000.000.001"
+    assert compact_uid(109322551) == "CHE109322551"
+    assert parse_uid(format_uid(109322551)) == 109322551
@@ -1,29 +1,228 @@
 # utils.py
+import json
+import threading
+import time
+from concurrent.futures import Future
+
 import requests
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
+from ..metrics import endpoint_label, metrics
+from .cache import ResponseCache
+from .ratelimit import RETRYABLE_STATUS_CODES, backoff_delay, parse_retry_after
+from .uid import format_uid as _format_uid
+from .uid import parse_uid
+
+NOT_FOUND = "#N/V"
+FETCH_ERROR = "#ERR"
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls for the same key into a single call.
+
+    While a call for a key is running, other callers asking for the same key
+    wait for it and receive its result instead of starting their own call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func, *args):
+        """
+        Run `func(*args)` unless a call for `key` is already in flight.
+
+        Args:
+            key (hashable): The key identifying the call.
+            func (function): The function to call.
+            args (tuple): Arguments for the function.
+
+        Returns:
+            object: The result of the (shared) call.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result()
+
+        try:
+            result = func(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+_in_flight = SingleFlight()
 
-def fetch_data_from_api(session, api_endpoint, params):
+
+def fetch_data_from_api(
+    session,
+    api_endpoint,
+    params,
+    cache=None,
+    rate_limiter=None,
+    circuit_breaker=None,
+    max_retries=5,
+):
     """
     Fetch data from the Zefix API.
 
+    Throttled (429) and failed (5xx, connection error) requests are retried
+    with jittered exponential backoff. If they still fail, the success flag
+    is None instead of False, so a transient failure can be told apart from
+    a company that was not found.
+
     Args:
         session (requests.Session): The session object with authentication.
         api_endpoint (str): The API endpoint URL.
         params (dict): The parameters for the API request.
+        cache (ResponseCache, optional): A response cache consulted before the API is called.
+        rate_limiter (AdaptiveRateLimiter, optional): A rate limiter shared by all workers.
+        circuit_breaker (CircuitBreaker, optional): A circuit breaker shared by all workers.
+        max_retries (int): The maximum number of retries of a failed request.
 
     Returns:
-        tuple: A tuple containing the data returned from the API and a boolean indicating the success of the request.
+        tuple: A tuple containing the data returned from the API and a boolean indicating the success of the request (None on a transient failure).
     """
-    try:
-        response = session.post(api_endpoint, json=params)
-        data = response.json()
-        if response.status_code == 200 and data:
-            return data, True
-        else:
-            return [], False
-    except Exception as e:
+    if cache is not None:
+        cached = cache.get(api_endpoint, params)
+        endpoint = endpoint_label(api_endpoint)
+        if cached is not None:
+            metrics.inc("cache_hits_total", endpoint=endpoint)
+            return cached
+        metrics.inc("cache_misses_total", endpoint=endpoint)
+
+    key = ResponseCache.make_key(api_endpoint, params)
+    return _in_flight.do(
+        key,
+        _post,
+        session,
+        api_endpoint,
+        params,
+        cache,
+        rate_limiter,
+        circuit_breaker,
+        max_retries,
+    )
+
+
+def _post(
+    session, api_endpoint, params, cache, rate_limiter, circuit_breaker, max_retries
+):
+    for attempt in range(max_retries + 1):
+        if circuit_breaker is not None and not circuit_breaker.allow():
+            return [], None
+        if rate_limiter is not None:
+            rate_limiter.acquire()
+
+        start = time.perf_counter()
+        try:
+            response = session.post(api_endpoint, json=params)
+        except Exception:
+            response = None
+        metrics.observe_request(
+            api_endpoint,
+            time.perf_counter() - start,
+            response.status_code if response is not None else None,
+            len(response.content) if response is not None else 0,
+        )
+
+        if response is not None and response.status_code not in RETRYABLE_STATUS_CODES:
+            if rate_limiter is not None:
+                rate_limiter.on_success()
+            if circuit_breaker is not None:
+                circuit_breaker.record_success()
+            data, success = interpret_response(response.status_code, response.content)
+            if cache is not None and success is not None:
+                cache.set(api_endpoint, params, data, success)
+            return data, success
+
+        if response is not None and response.status_code == 429:
+            # Throttling slows down the rate limiter but is no failure
+            if rate_limiter is not None:
+                rate_limiter.on_throttle(
+                    parse_retry_after(response.headers.get("Retry-After"))
+                )
+            if circuit_breaker is not None:
+                circuit_breaker.record_throttle()
+        elif circuit_breaker is not None:
+            circuit_breaker.record_failure()
+        if attempt < max_retries:
+            metrics.inc("http_retries_total", endpoint=endpoint_label(api_endpoint))
+            time.sleep(backoff_delay(attempt))
+
+    return [], None
+
+
+def size_connection_pool(session, size):
+    """
+    Mount HTTP adapters whose keep-alive pool holds `size` connections.
+
+    The default adapter keeps only 10 connections per host, so more workers
+    than that would block on the pool or open throwaway connections.
+
+    Args:
+        session (requests.Session): The session object with authentication.
+        size (int): The number of connections to keep per host.
+    """
+    adapter = session.get_adapter("https://")
+    if getattr(adapter, "_pool_maxsize", 0) >= size:
+        return
+    adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+def interpret_response(status_code, content):
+    """
+    Interpret the status code and body of a Zefix API response.
+
+    A 200 with an empty body and a 404 both mean that the company was not found,
+    so they can be cached as negative results. Any other failure is reported
+    with a success flag of None and must not be cached.
+
+    Args:
+        status_code (int): The HTTP status code of the response.
+        content (bytes): The raw body of the response.
+
+    Returns:
+        tuple: The data and a boolean indicating the success of the request (None on failure).
+    """
+    if status_code == 404:
         return [], False
+    if status_code != 200:
+        return [], None
+    try:
+        data = json.loads(content) if content else []
+    except ValueError:
+        return [], None
+    if data:
+        return data, True
+    return [], False
+
+
+def missing_value(success):
+    """
+    Get the placeholder written to the Zefix columns of a row without result.
+
+    Args:
+        success (bool): The success flag returned by `fetch_data_from_api`.
+
+    Returns:
+        str: NOT_FOUND if the company was not found, FETCH_ERROR if the request failed.
+    """
+    return FETCH_ERROR if success is None else NOT_FOUND
 
 
 def format_uid(uid):
@@ -31,122 +230,164 @@ def format_uid(uid):
     Format a UID into the Swiss UID format.
 
     Args:
-        uid (str): The UID to format.
+        uid (str): The UID to format, in any spelling accepted by `uid.parse_uid`.
 
     Returns:
-        str: The formatted UID.
+        str: The formatted UID, or the value unchanged if it is not a UID.
     """
-    return "CHE-{}.{}.{}".format(uid[3:6], uid[6:9], uid[9:])
+    number = parse_uid(uid, validate=False)
+    return uid if number is None else _format_uid(number)
 
 
-def process_row(row, fetch_data_func, *fetch_args):
+def result_rows(data, success):
     """
-    Process a row of data by fetching additional information from the Zefix API.
+    Build the Zefix columns for the result of a lookup.
 
     Args:
-        row (dict): A dictionary representing a row of data.
-        fetch_data_func (function): The function to fetch data from the API.
-        fetch_args (tuple): Additional arguments for the fetch_data_func.
+        data (list): The data returned from the API.
+        success (bool): The success flag returned by `fetch_data_from_api`.
 
     Returns:
-        list: A list of dictionaries, each representing an updated row of data.
+        list: A list of dictionaries, one per output row.
     """
-    data, success = fetch_data_func(*fetch_args)
     if success:
         return [
-            dict(
-                row,
-                zefixName=item.get("name", ""),
-                zefixLegalSeat=item.get("legalSeat", ""),
-                zefixLegalSeatId=item.get("legalSeatId", ""),
-                zefixUid=item.get("uid", ""),
-            )
+            {
+                "zefixName": item.get("name", ""),
+                "zefixLegalSeat": item.get("legalSeat", ""),
+                "zefixLegalSeatId": item.get("legalSeatId", ""),
+                "zefixUid": item.get("uid", ""),
+            }
             for item in data
         ]
-    else:
-        return [
-            dict(
-                row,
-                zefixName="#N/V",
-                zefixLegalSeat="#N/V",
-                zefixLegalSeatId="#N/V",
-                zefixUid="#N/V",
-            )
-        ]
+    missing = missing_value(success)
+    return [
+        {
+            "zefixName": missing,
+            "zefixLegalSeat": missing,
+            "zefixLegalSeatId": missing,
+            "zefixUid": missing,
+        }
+    ]
 
 
-def process_row_uid(row, fetch_data_func, *fetch_args):
+def result_rows_uid(data, success):
     """
-    Process a row of data by fetching additional information from the Zefix API.
-    Specifically for fetching data by UID.
+    Build the Zefix columns for the result of a lookup by UID.
 
+    Args:
+        data (list): The data returned from the API.
+        success (bool): The success flag returned by `fetch_data_from_api`.
+
+    Returns:
+        list: A list of dictionaries, one per output row.
     """
-    data, success = fetch_data_func(*fetch_args)
     if success:
         return [
-            dict(
-                row,
-                zefixName=item.get("name", ""),
-                zefixLegalSeat=item.get("legalSeat", ""),
-                zefixLegalSeatId=item.get("legalSeatId", ""),
-                zefixUid=format_uid(item.get("uid", "")),
-                zefixStreet=(item.get("address", {}).get("street", "") or "")
+            {
+                "zefixName": item.get("name", ""),
+                "zefixLegalSeat": item.get("legalSeat", ""),
+                "zefixLegalSeatId": item.get("legalSeatId", ""),
+                "zefixUid": format_uid(item.get("uid", "")),
+                "zefixStreet": (item.get("address", {}).get("street", "") or "")
                 + (
                     " " + (item.get("address", {}).get("houseNumber", "") or "")
                     if item.get("address", {}).get("houseNumber", "")
                     else ""
                 ),
-                zefixSwissZipCode=item.get("address", {}).get("swissZipCode", ""),
-                zefixCity=item.get("address", {}).get("city", ""),
-            )
+                "zefixSwissZipCode": item.get("address", {}).get("swissZipCode", ""),
+                "zefixCity": item.get("address", {}).get("city", ""),
+            }
             for item in data
         ]
-    else:
-        return [
-            dict(
-                row,
-                zefixName="#N/V",
-                zefixLegalSeat="#N/V",
-                zefixLegalSeatId="#N/V",
-                zefixUid="#N/V",
-                zefixStreet="#N/V",
-                zefixSwissZipCode="#N/V",
-                zefixCity="#N/V",
-            )
-        ]
+    missing = missing_value(success)
+    return [
+        {
+            "zefixName": missing,
+            "zefixLegalSeat": missing,
+            "zefixLegalSeatId": missing,
+            "zefixUid": missing,
+            "zefixStreet": missing,
+            "zefixSwissZipCode": missing,
+            "zefixCity": missing,
+        }
+    ]
 
 
-def process_row_with_city_check(row, fetch_data_func, *fetch_args):
+def result_rows_with_city_check(data, success, city):
     """
-    Process a row of data by fetching additional information from the Zefix API and checking the city.
-    Specifically for fetching data by name and checking the city.
+    Build the Zefix columns for the first result whose legal seat is the given city.
 
+    Args:
+        data (list): The data returned from the API.
+        success (bool): The success flag returned by `fetch_data_from_api`.
+        city (str): The city the legal seat has to match.
+
+    Returns:
+        list: A list with one dictionary.
     """
-    data, success = fetch_data_func(*fetch_args)
     if success:
-        city = row.get("city", "").lower()
+        city = city.lower() if isinstance(city, str) else ""
         matching_item = next(
             (item for item in data if item.get("legalSeat", "").lower() == city),
             None,
         )
         if matching_item:
             return [
-                dict(
-                    row,
-                    zefixName=matching_item.get("name", ""),
-                    zefixLegalSeat=matching_item.get("legalSeat", ""),
-                    zefixLegalSeatId=matching_item.get("legalSeatId", ""),
-                    zefixUid=matching_item.get("uid", ""),
-                    zefixChid=matching_item.get("chid", ""),
-                )
+                {
+                    "zefixName": matching_item.get("name", ""),
+                    "zefixLegalSeat": matching_item.get("legalSeat", ""),
+                    "zefixLegalSeatId": matching_item.get("legalSeatId", ""),
+                    "zefixUid": matching_item.get("uid", ""),
+                    "zefixChid": matching_item.get("chid", ""),
+                }
             ]
+    missing = missing_value(success)
     return [
-        dict(
-            row,
-            zefixName="#N/V",
-            zefixLegalSeat="#N/V",
-            zefixLegalSeatId="#N/V",
-            zefixUid="#N/V",
-            zefixChid="#N/V",
-        )
+        {
+            "zefixName": missing,
+            "zefixLegalSeat": missing,
+            "zefixLegalSeatId": missing,
+            "zefixUid": missing,
+            "zefixChid": missing,
+        }
+    ]
+
+
+def process_row(row, fetch_data_func, *fetch_args):
+    """
+    Process a row of data by fetching additional information from the Zefix API.
+
+    Args:
+        row (dict): A dictionary representing a row of data.
+        fetch_data_func (function): The function to fetch data from the API.
+        fetch_args (tuple): Additional arguments for the fetch_data_func.
+
+    Returns:
+        list: A list of dictionaries, each representing an updated row of data.
+    """
+    data, success = fetch_data_func(*fetch_args)
+    return [dict(row, **fields) for fields in result_rows(data, success)]
+
+
+def process_row_uid(row, fetch_data_func, *fetch_args):
+    """
+    Process a row of data by fetching additional information from the Zefix API.
+    Specifically for fetching data by UID.
+
+    """
+    data, success = fetch_data_func(*fetch_args)
+    return [dict(row, **fields) for fields in result_rows_uid(data, success)]
+
+
+def process_row_with_city_check(row, fetch_data_func, *fetch_args):
+    """
+    Process a row of data by fetching additional information from the Zefix API and checking the city.
+    Specifically for fetching data by name and checking the city.
+
+    """
+    data, success = fetch_data_func(*fetch_args)
+    return [
+        dict(row, **fields)
+        for fields in result_rows_with_city_check(data, success, row.get("city", ""))
     ]
@@ -0,0 +1,76 @@
+# utils_test.py
+import time
+
+import pytest
+
+from SIA.artikel5 import utils
+from SIA.artikel5.ratelimit import AdaptiveRateLimiter, CircuitBreaker
+from SIA.artikel5.utils import (
+    FETCH_ERROR,
+    NOT_FOUND,
+    fetch_data_from_api,
+    interpret_response,
+    missing_value,
+)
+
+
+class FakeResponse:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {}
+
+
+class FakeSession:
+    def __init__(self, status_codes):
+        self.status_codes = list(status_codes)
+
+    def post(self, api_endpoint, json=None):
+        status_code = self.status_codes.pop(0)
+        return FakeResponse(status_code, b'[{"name": "Muster AG"}]')
+
+
+@pytest.mark.parametrize(
+    "status_code, content, expected",
+    [
+        (200, b'[{"name": "Muster AG"}]', ([{"name": "Muster AG"}], True)),
+        (200, b"", ([], False)),
+        (200, b"[]", ([], False)),
+        (404, b"", ([], False)),
+        (200, b"<html>", ([], None)),
+        (429, b"", ([], None)),
+        (500, b'[{"name": "Muster AG"}]', ([], None)),
+        (None, b"", ([], None)),
+    ],
+)
+def test_interpret_response(status_code, content, expected):
+    assert interpret_response(status_code, content) == expected
+
+
+def test_missing_value():
+    assert missing_value(False) == NOT_FOUND
+    assert missing_value(None) == FETCH_ERROR
+
+
+def test_throttled_trial_does_not_lock_the_circuit_breaker(monkeypatch):
+    monkeypatch.setattr(utils, "backoff_delay", lambda attempt: 0)
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    limiter = AdaptiveRateLimiter(rate=1000.0)
+    session = FakeSession([503, 503, 429, 200, 200])
+
+    def fetch(name):
+        return fetch_data_from_api(
+            session,
+            "https://zefix.test/company/search",
+            {"name": name},
+            rate_limiter=limiter,
+            circuit_breaker=breaker,
+        )
+
+    # Two failures open the breaker, the remaining retries fail fast
+    assert fetch("a") == ([], None)
+    time.sleep(0.06)
+    # The trial is throttled, its retry becomes the new trial and succeeds
+    assert fetch("b") == ([{"name": "Muster AG"}], True)
+    assert fetch("c") == ([{"name": "Muster AG"}], True)
+    assert session.status_codes == []
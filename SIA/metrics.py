@@ -0,0 +1,301 @@
+# metrics.py
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import urlsplit
+
+PREFIX = "sia_"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+DESCRIPTIONS = {
+    "http_requests_total": "HTTP requests sent, by endpoint and status code.",
+    "http_request_duration_seconds": "HTTP request latency, by endpoint.",
+    "http_response_bytes_total": "Bytes received in HTTP responses, by endpoint.",
+    "http_retries_total": "Retried HTTP requests, by endpoint.",
+    "cache_hits_total": "Responses served from the response cache, by endpoint.",
+    "cache_misses_total": "Lookups not found in the response cache, by endpoint.",
+    "stage_duration_seconds_total": "Time spent in each processing stage.",
+    "lookups_skipped_total": "Lookups skipped because the key cannot be found, e.g. an invalid UID.",
+    "publications_deduplicated_total": "Publications matched by several keywords and fetched once.",
+    "archive_hits_total": "Publications read from the archive instead of being downloaded.",
+    "publications_skipped_total": "Publications skipped because an earlier run exported them.",
+    "rows_total": "Rows processed.",
+    "rows_failed_total": "Rows that could not be fetched.",
+    "rows_reused_total": "Rows whose results were reused from the fingerprint store.",
+    "run_duration_seconds": "Duration of the last run.",
+    "run_last_timestamp_seconds": "Unix time at which the last run finished.",
+}
+
+# Path segments holding IDs (UIDs, publication UUIDs) are collapsed so the
+# number of endpoint labels stays bounded
+_ID_SEGMENT = re.compile(r"\d{3}|^[0-9a-fA-F-]{16,}$")
+
+
+def endpoint_label(url):
+    """
+    Build the endpoint label of a request URL.
+
+    Args:
+        url (str): The request URL.
+
+    Returns:
+        str: The URL path with ID segments replaced by "{id}", e.g. "/api/v1/company/uid/{id}".
+    """
+    segments = urlsplit(url).path.split("/")
+    return "/".join("{id}" if _ID_SEGMENT.search(s) else s for s in segments) or "/"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (
+            name,
+            str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"),
+        )
+        for name, value in labels
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+def _write_atomic(path, content):
+    # The node exporter may read the file at any time, so never expose a partial file
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(content)
+    os.replace(temp_path, path)
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and latency histograms for one run.
+
+    The values are exported as a Prometheus textfile (for the node exporter's
+    textfile collector) and as a JSON run summary.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._started = time.time()
+        self._start = time.perf_counter()
+
+    def inc(self, name, value=1, **labels):
+        """
+        Increase a counter.
+
+        Args:
+            name (str): The name of the counter, without prefix.
+            value (float): The amount to add.
+            labels (dict): The labels of the counter.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe_request(self, url, seconds, status=None, size=0):
+        """
+        Record one HTTP request.
+
+        Args:
+            url (str): The request URL.
+            seconds (float): The time until the response was read.
+            status (int, optional): The HTTP status code, None if no response was received.
+            size (int): The number of bytes received.
+        """
+        endpoint = endpoint_label(url)
+        labels = (("endpoint", endpoint),)
+        with self._lock:
+            histogram = self._histograms.get(labels)
+            if histogram is None:
+                histogram = self._histograms[labels] = [
+                    [0] * len(LATENCY_BUCKETS),
+                    0.0,
+                    0,
+                ]
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+        self.inc(
+            "http_requests_total",
+            endpoint=endpoint,
+            status="error" if status is None else status,
+        )
+        self.inc("http_response_bytes_total", size, endpoint=endpoint)
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Time a processing stage. Repeated stages (e.g. per chunk) add up.
+
+        Args:
+            name (str): The name of the stage, e.g. "read", "fetch", "assemble" or "write".
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.inc(
+                "stage_duration_seconds_total",
+                time.perf_counter() - start,
+                stage=name,
+            )
+
+    def timed(self, iterable, stage):
+        """
+        Count the time spent producing the items of an iterable as a stage.
+
+        Args:
+            iterable (iterable): The iterable, e.g. a chunked CSV reader.
+            stage (str): The name of the stage.
+
+        Yields:
+            object: The items of the iterable.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def _samples(self):
+        duration = time.perf_counter() - self._start
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                labels: (list(buckets), total, count)
+                for labels, (buckets, total, count) in self._histograms.items()
+            }
+        counters[("run_duration_seconds", ())] = duration
+        counters[("run_last_timestamp_seconds", ())] = time.time()
+        return counters, histograms
+
+    def prometheus(self, job):
+        """
+        Render the metrics in the Prometheus text exposition format.
+
+        Args:
+            job (str): The name of the job, added as `job` label.
+
+        Returns:
+            str: The metrics.
+        """
+        counters, histograms = self._samples()
+        job_label = (("job", job),)
+        lines = []
+        for name in sorted({name for name, _ in counters}):
+            kind = "gauge" if name.startswith("run_") else "counter"
+            lines.append(f"# HELP {PREFIX}{name} {DESCRIPTIONS.get(name, name)}")
+            lines.append(f"# TYPE {PREFIX}{name} {kind}")
+            for (counter, labels), value in sorted(counters.items(), key=str):
+                if counter == name:
+                    labels = _format_labels(job_label + labels)
+                    lines.append(f"{PREFIX}{name}{labels} {value}")
+
+        if histograms:
+            name = f"{PREFIX}http_request_duration_seconds"
+            description = DESCRIPTIONS["http_request_duration_seconds"]
+            lines.append(f"# HELP {name} {description}")
+            lines.append(f"# TYPE {name} histogram")
+            for labels, (buckets, total, count) in sorted(histograms.items()):
+                for bound, value in zip(LATENCY_BUCKETS, buckets):
+                    bucket = _format_labels(job_label + labels + (("le", bound),))
+                    lines.append(f"{name}_bucket{bucket} {value}")
+                bucket = _format_labels(job_label + labels + (("le", "+Inf"),))
+                lines.append(f"{name}_bucket{bucket} {count}")
+                lines.append(f"{name}_sum{_format_labels(job_label + labels)} {total}")
+                lines.append(
+                    f"{name}_count{_format_labels(job_label + labels)} {count}"
+                )
+        return "\n".join(lines) + "\n"
+
+    def summary(self, job):
+        """
+        Build the JSON run summary.
+
+        Args:
+            job (str): The name of the job.
+
+        Returns:
+            dict: The run summary with per-endpoint request statistics and stage timings.
+        """
+        counters, histograms = self._samples()
+        endpoints = {}
+        for (name, labels), value in counters.items():
+            labels = dict(labels)
+            if "endpoint" not in labels:
+                continue
+            endpoint = endpoints.setdefault(
+                labels["endpoint"],
+                {
+                    "requests": 0,
+                    "status": {},
+                    "bytes": 0,
+                    "retries": 0,
+                    "cache_hits": 0,
+                    "cache_misses": 0,
+                },
+            )
+            if name == "http_requests_total":
+                endpoint["requests"] += value
+                endpoint["status"][str(labels["status"])] = value
+            elif name == "http_response_bytes_total":
+                endpoint["bytes"] = value
+            elif name == "http_retries_total":
+                endpoint["retries"] = value
+            elif name == "cache_hits_total":
+                endpoint["cache_hits"] = value
+            elif name == "cache_misses_total":
+                endpoint["cache_misses"] = value
+        for ((_, endpoint),), (buckets, total, count) in histograms.items():
+            endpoints[endpoint]["latency_mean_seconds"] = total / count
+            endpoints[endpoint]["latency_buckets"] = {
+                str(bound): value for bound, value in zip(LATENCY_BUCKETS, buckets)
+            }
+
+        return {
+            "job": job,
+            "started": datetime.fromtimestamp(self._started).isoformat(),
+            "duration_seconds": counters[("run_duration_seconds", ())],
+            "stages": {
+                dict(labels)["stage"]: value
+                for (name, labels), value in counters.items()
+                if name == "stage_duration_seconds_total"
+            },
+            "rows": counters.get(("rows_total", ()), 0),
+            "rows_failed": counters.get(("rows_failed_total", ()), 0),
+            "endpoints": endpoints,
+        }
+
+    def export(self, job, directory=None):
+        """
+        Write `<job>.prom` and `<job>.json` to the metrics directory.
+
+        Args:
+            job (str): The name of the job.
+            directory (str, optional): The directory to write to. Defaults to the
+                SIA_METRICS_DIR environment variable; nothing is written if neither is set.
+        """
+        directory = directory or os.environ.get("SIA_METRICS_DIR")
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        _write_atomic(os.path.join(directory, f"{job}.prom"), self.prometheus(job))
+        _write_atomic(
+            os.path.join(directory, f"{job}.json"),
+            json.dumps(self.summary(job), indent=4),
+        )
+
+
+metrics = Metrics()
@@ -0,0 +1,202 @@
+# archive.py
+import hashlib
+import io
+import sqlite3
+import threading
+import time
+import zlib
+from xml.etree import ElementTree
+
+
+def publication_meta(xml_content):
+    """
+    Read the publication date and sub-rubric from the meta data of a publication.
+
+    Only the beginning of the document is parsed, up to the end of the meta data.
+
+    Args:
+        xml_content (bytes): The XML content of the publication.
+
+    Returns:
+        tuple: The publication date (YYYY-MM-DD) and the sub-rubric (e.g. "HR01"), None if missing.
+    """
+    values = {"publicationDate": None, "subRubric": None}
+    try:
+        for _, element in ElementTree.iterparse(io.BytesIO(xml_content)):
+            if element.tag in values and values[element.tag] is None:
+                values[element.tag] = (element.text or "").strip() or None
+            elif element.tag == "meta":
+                break
+    except ElementTree.ParseError:
+        pass
+    return values["publicationDate"], values["subRubric"]
+
+
+class PublicationArchive:
+    """
+    Local SQLite archive of the raw XML of complete SHAB publications.
+
+    The XML is stored zlib-compressed and content-addressed: identical
+    documents are stored once, however many refs point to them. Publications
+    are indexed by publication date and sub-rubric, so the exports of any
+    date range can be rebuilt from the archive without network access.
+    """
+
+    def __init__(self, path):
+        """
+        Open (or create) the archive database.
+
+        Args:
+            path (str): The path to the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                digest TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                content BLOB NOT NULL
+            )
+            """)
+        self._connection.execute("""
+            CREATE TABLE IF NOT EXISTS publications (
+                ref TEXT PRIMARY KEY,
+                digest TEXT NOT NULL,
+                publication_date TEXT,
+                sub_rubric TEXT,
+                archived_at REAL NOT NULL
+            )
+            """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS publications_date "
+            "ON publications (publication_date, sub_rubric)"
+        )
+        self._connection.commit()
+
+    def put(self, ref, xml_content):
+        """
+        Store the XML of a publication.
+
+        Args:
+            ref (str): The reference URL of the publication.
+            xml_content (bytes): The XML content of the publication.
+        """
+        digest = hashlib.sha256(xml_content).hexdigest()
+        publication_date, sub_rubric = publication_meta(xml_content)
+        with self._lock:
+            exists = self._connection.execute(
+                "SELECT 1 FROM documents WHERE digest = ?", (digest,)
+            ).fetchone()
+            if exists is None:
+                self._connection.execute(
+                    "INSERT INTO documents VALUES (?, ?, ?)",
+                    (digest, len(xml_content), zlib.compress(xml_content, 9)),
+                )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO publications VALUES (?, ?, ?, ?, ?)",
+                (ref, digest, publication_date, sub_rubric, time.time()),
+            )
+            self._connection.commit()
+
+    def get(self, ref):
+        """
+        Look up the XML of a publication.
+
+        Args:
+            ref (str): The reference URL of the publication.
+
+        Returns:
+            bytes: The XML content, or None if the publication is not archived.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT content FROM documents JOIN publications USING (digest) "
+                "WHERE ref = ?",
+                (ref,),
+            ).fetchone()
+        return None if row is None else zlib.decompress(row[0])
+
+    def refs(self, start_date, end_date, sub_rubrics=None):
+        """
+        List the archived publications of a date range.
+
+        Args:
+            start_date (str): The first publication date (YYYY-MM-DD).
+            end_date (str): The last publication date (YYYY-MM-DD).
+            sub_rubrics (list, optional): The sub-rubrics to list, e.g. ["HR01"]. None lists all.
+
+        Returns:
+            list: The reference URLs, ordered by publication date and ref.
+        """
+        query = "SELECT ref FROM publications WHERE publication_date BETWEEN ? AND ?"
+        params = [start_date, end_date]
+        if sub_rubrics:
+            query += f" AND sub_rubric IN ({', '.join('?' * len(sub_rubrics))})"
+            params.extend(sub_rubrics)
+        query += " ORDER BY publication_date, ref"
+        with self._lock:
+            return [ref for (ref,) in self._connection.execute(query, params)]
+
+    def stats(self):
+        """
+        Get the size of the archive.
+
+        Returns:
+            dict: The number of publications and distinct documents, and the raw and compressed size of the documents in bytes.
+        """
+        with self._lock:
+            (publications,) = self._connection.execute(
+                "SELECT COUNT(*) FROM publications"
+            ).fetchone()
+            documents, size, compressed = self._connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), "
+                "COALESCE(SUM(LENGTH(content)), 0) FROM documents"
+            ).fetchone()
+        return {
+            "publications": publications,
+            "documents": documents,
+            "bytes": size,
+            "compressed_bytes": compressed,
+        }
+
+    def replay(self, keywords, start_date, end_date, sub_rubrics, matched_keywords):
+        """
+        Yield the archived publications of a date range that match the keywords.
+
+        Keywords are matched case-insensitively against the text of the
+        publication, which stands in for the search of the portal. As in a
+        live export, the publications are ordered by the first keyword they
+        matched, then by publication date.
+
+        Args:
+            keywords (list): The keywords to search for.
+            start_date (str): The first publication date (YYYY-MM-DD).
+            end_date (str): The last publication date (YYYY-MM-DD).
+            sub_rubrics (list, optional): The sub-rubrics to include, e.g. ["HR01"]. None includes all.
+            matched_keywords (dict): Filled with the reference URL of each yielded publication mapped to the keywords it matched.
+
+        Yields:
+            tuple: The reference URL and the XML content of each matching publication.
+        """
+        matches = []
+        for ref in self.refs(start_date, end_date, sub_rubrics):
+            xml_content = self.get(ref)
+            text = " ".join(ElementTree.fromstring(xml_content).itertext()).lower()
+            matched = [keyword for keyword in keywords if keyword.lower() in text]
+            if matched:
+                matched_keywords[ref] = matched
+                matches.append((keywords.index(matched[0]), ref, xml_content))
+        # The sort is stable, so the publications of a keyword stay in date order
+        matches.sort(key=lambda match: match[0])
+        for _, ref, xml_content in matches:
+            yield ref, xml_content
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._connection.close()
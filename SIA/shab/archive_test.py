@@ -0,0 +1,60 @@
+# archive_test.py
+import pytest
+
+from SIA.shab.archive import PublicationArchive, publication_meta
+
+
+def publication_xml(day, sub_rubric, purpose):
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<HR01:publication xmlns:HR01="https://shab.ch/shab/HR01-export">'
+        f"<meta><subRubric>{sub_rubric}</subRubric>"
+        f"<publicationDate>{day}</publicationDate></meta>"
+        f"<content><purpose>{purpose}</purpose></content>"
+        "</HR01:publication>"
+    ).encode("utf-8")
+
+
+@pytest.fixture
+def archive(tmp_path):
+    archive = PublicationArchive(str(tmp_path / "archive.sqlite"))
+    archive.put("b", publication_xml("2024-01-02", "HR01", "Ingenieurwesen"))
+    archive.put("a", publication_xml("2024-01-02", "HR01", "Architektur"))
+    archive.put("c", publication_xml("2024-01-01", "HR02", "Architektur"))
+    # The same document under a second ref is stored once
+    archive.put("d", publication_xml("2024-01-01", "HR02", "Architektur"))
+    yield archive
+    archive.close()
+
+
+def test_publication_meta():
+    xml_content = publication_xml("2024-01-02", "HR01", "Bau")
+    assert publication_meta(xml_content) == ("2024-01-02", "HR01")
+    assert publication_meta(b"<publication/>") == (None, None)
+
+
+def test_put_and_get(archive):
+    assert archive.get("a") == publication_xml("2024-01-02", "HR01", "Architektur")
+    assert archive.get("z") is None
+    stats = archive.stats()
+    assert (stats["publications"], stats["documents"]) == (4, 3)
+    assert stats["compressed_bytes"] < stats["bytes"]
+
+
+def test_refs(archive):
+    assert archive.refs("2024-01-01", "2024-01-31") == ["c", "d", "a", "b"]
+    assert archive.refs("2024-01-02", "2024-01-02", ["HR01"]) == ["a", "b"]
+
+
+def test_replay(archive):
+    matched_keywords = {}
+    replayed = archive.replay(
+        ["ingenieur", "Architektur"], "2024-01-01", "2024-01-31", None, matched_keywords
+    )
+    assert [ref for ref, _ in replayed] == ["b", "c", "d", "a"]
+    assert matched_keywords == {
+        "b": ["ingenieur"],
+        "c": ["Architektur"],
+        "d": ["Architektur"],
+        "a": ["Architektur"],
+    }
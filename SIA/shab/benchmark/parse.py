@@ -0,0 +1,237 @@
+# parse.py
+import argparse
+import glob
+import hashlib
+import json
+import os
+import time
+from xml.etree import ElementTree
+
+from ..utils import (
+    MAX_WORKERS,
+    _lxml_parser,
+    extract_publication,
+    fetch_complete_publications,
+    limit_connections,
+    list_publication_refs,
+    lxml_etree,
+)
+
+
+def legacy_parse(xml_content, keyword):
+    """
+    Extract the fields the way the exporters did before the single-pass
+    extractor, with one descendant search per element and field.
+
+    Args:
+        xml_content (bytes): The XML content of the publication.
+        keyword (str): The keyword used for the search.
+
+    Returns:
+        dict: The extracted information.
+    """
+    root = ElementTree.fromstring(xml_content)
+    company = root.find(".//company")
+    address = root.find(".//address")
+    purpose = root.find(".//purpose")
+
+    def get_text(element, path):
+        return (element.findtext(path) or "") if element is not None else "#"
+
+    return {
+        "keyword": keyword,
+        "company": get_text(company, ".//name"),
+        "uid": get_text(company, ".//uid"),
+        "seat": get_text(company, ".//seat"),
+        "street": get_text(address, ".//street"),
+        "houseNumber": get_text(address, ".//houseNumber"),
+        "swissZipCode": get_text(address, ".//swissZipCode"),
+        "town": get_text(address, ".//town"),
+        "purpose": get_text(purpose, "."),
+    }
+
+
+def _elementtree_parse(xml_content, keyword):
+    return extract_publication(ElementTree.fromstring(xml_content), keyword)._asdict()
+
+
+def _lxml_parse(xml_content, keyword):
+    # The parser of the exporters, so the benchmark times what they run
+    root = lxml_etree.fromstring(xml_content, parser=_lxml_parser)
+    return extract_publication(root, keyword)._asdict()
+
+
+PARSERS = {
+    "legacy": legacy_parse,
+    "elementtree": _elementtree_parse,
+    "lxml": _lxml_parse,
+}
+
+
+def _file_name(publication_ref):
+    # Refs look like ".../publications/<id>/xml"
+    parts = [part for part in publication_ref.split("/") if part]
+    if len(parts) >= 2 and parts[-1] == "xml":
+        return f"{parts[-2]}.xml"
+    return hashlib.sha1(publication_ref.encode("utf-8")).hexdigest() + ".xml"
+
+
+def record_corpus(directory, params, limit=None, max_workers=MAX_WORKERS):
+    """
+    Download publications from amtsblattportal into a corpus directory.
+
+    Args:
+        directory (str): The directory to write one XML file per publication to.
+        params (dict): The parameters for the publication list request (date range, sub-rubrics, states).
+        limit (int, optional): The maximum number of publications to download.
+        max_workers (int): The maximum number of concurrent downloads.
+
+    Returns:
+        int: The number of publications written.
+    """
+    os.makedirs(directory, exist_ok=True)
+    limit_connections(max_workers)
+    refs = list_publication_refs(params, max_workers)
+    if limit is not None:
+        refs = (ref for _, ref in zip(range(limit), refs))
+    count = 0
+    for ref, xml_content in fetch_complete_publications(refs, max_workers):
+        if xml_content:
+            with open(os.path.join(directory, _file_name(ref)), "wb") as file:
+                file.write(xml_content)
+            count += 1
+    return count
+
+
+def load_corpus(directory):
+    """
+    Load the publications of a corpus directory.
+
+    Args:
+        directory (str): The directory holding one XML file per publication.
+
+    Returns:
+        list: The XML content of each publication.
+    """
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.xml"))):
+        with open(path, "rb") as file:
+            corpus.append(file.read())
+    return corpus
+
+
+def run_benchmark(corpus, parsers=None, repeat=5):
+    """
+    Time the publication parsers over a corpus.
+
+    Every parser must return the same records as the legacy parser.
+
+    Args:
+        corpus (list): The XML content of the publications.
+        parsers (list, optional): The names of the parsers to time, defaults to all available.
+        repeat (int): The number of passes over the corpus; the fastest pass counts.
+
+    Returns:
+        list: One result dictionary per parser.
+    """
+    if parsers is None:
+        parsers = [name for name in PARSERS if name != "lxml" or lxml_etree is not None]
+    expected = [legacy_parse(xml_content, "") for xml_content in corpus]
+
+    results = []
+    for name in parsers:
+        parse = PARSERS[name]
+        records = [parse(xml_content, "") for xml_content in corpus]
+        if records != expected:
+            raise AssertionError(f"The {name} parser does not match the legacy parser")
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for xml_content in corpus:
+                parse(xml_content, "")
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results.append(
+            {
+                "parser": name,
+                "publications": len(corpus),
+                "us_per_publication": best / len(corpus) * 1e6,
+                "publications_per_sec": len(corpus) / best,
+            }
+        )
+    baseline = results[0]["us_per_publication"]
+    for result in results:
+        result["speedup"] = baseline / result["us_per_publication"]
+    return results
+
+
+def print_results(results):
+    """
+    Print benchmark results as a table.
+
+    Args:
+        results (list): The result dictionaries returned by `run_benchmark`.
+    """
+    columns = [
+        ("parser", "{}"),
+        ("publications", "{}"),
+        ("us_per_publication", "{:.1f}"),
+        ("publications_per_sec", "{:.0f}"),
+        ("speedup", "{:.2f}"),
+    ]
+    print("  ".join(f"{name:>20}" for name, _ in columns))
+    for result in results:
+        print("  ".join(f"{fmt.format(result[name]):>20}" for name, fmt in columns))
+
+
+def main():
+    """
+    Command line entry point of the parser benchmark.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark the SHAB publication parsers over recorded publications."
+    )
+    parser.add_argument(
+        "corpus", help="The directory with one XML file per publication."
+    )
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        help="Download publications into the corpus directory first.",
+    )
+    parser.add_argument("--start", help="The first publication date to record.")
+    parser.add_argument("--end", help="The last publication date to record.")
+    parser.add_argument("--sub-rubrics", default="HR01")
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--parsers", help="Comma-separated, e.g. legacy,lxml.")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="Write the results to this JSON file.")
+    args = parser.parse_args()
+
+    if args.record:
+        count = record_corpus(
+            args.corpus,
+            {
+                "publicationDate.start": args.start,
+                "publicationDate.end": args.end,
+                "subRubrics": args.sub_rubrics,
+                "publicationStates": "PUBLISHED",
+            },
+            limit=args.limit,
+        )
+        print(f"Recorded {count} publications in {args.corpus}.")
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        parser.error(f"No publications (*.xml) found in {args.corpus}")
+    results = run_benchmark(
+        corpus, args.parsers.split(",") if args.parsers else None, args.repeat
+    )
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as json_file:
+            json.dump(results, json_file, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+# parse_test.py
+from SIA.shab.benchmark.parse import legacy_parse, run_benchmark
+from SIA.shab.utils import parse_publication_xml
+
+CORPUS = [
+    b"<publication><content><company><name>Muster AG</name><uid>CHE-1</uid>"
+    b"<seat>Bern</seat><address><street>Weg</street><houseNumber>1</houseNumber>"
+    b"<swissZipCode>3000</swissZipCode><town>Bern</town></address></company>"
+    b"<purpose>Architektur</purpose></content></publication>",
+    # A company without address, fields missing from the company
+    b"<publication><content><company><name>Beta GmbH</name></company>"
+    b"</content></publication>",
+    # Only the first company and address count
+    b"<publication><company><name>A</name><address><town>X</town></address>"
+    b"</company><company><name>B</name><address><town>Y</town></address>"
+    b"</company><purpose/></publication>",
+]
+
+
+def test_parsers_match_the_legacy_parser():
+    results = run_benchmark(CORPUS, repeat=1)
+    assert [result["publications"] for result in results] == [3] * len(results)
+
+
+def test_parse_publication_xml():
+    for xml_content in CORPUS:
+        expected = legacy_parse(xml_content, "Bau")
+        assert parse_publication_xml(xml_content, "Bau")._asdict() == expected
+    publication = parse_publication_xml(CORPUS[1], "")
+    assert (publication.uid, publication.street, publication.purpose) == ("", "#", "#")
@@ -1,21 +1,75 @@
 import os
 from datetime import datetime, timedelta
-from xml.etree import ElementTree
 
-from config import read_config
-from utils import (
-    fetch_complete_publication,
-    fetch_publication_list,
+from ..metrics import metrics
+from .archive import PublicationArchive
+from .config import read_config
+from .search import PublicationIndex, search_keywords, update_index
+from .utils import (
+    MAX_WORKERS,
+    WINDOW_DAYS,
+    fetch_complete_publications,
+    limit_connections,
     parse_publication_xml,
     save_to_csv,
+    unique_publication_refs,
 )
 
 
-def main():
+def _search_portal(keywords, params, max_workers, window_days, archive, replay):
+    # Each publication is fetched once, even if it matches several keywords
+    matched_keywords = {}
+    if replay:
+        publications = archive.replay(
+            keywords,
+            params["publicationDate.start"],
+            params["publicationDate.end"],
+            params["subRubrics"].split(","),
+            matched_keywords,
+        )
+    else:
+        limit_connections(max_workers)
+        publication_refs = unique_publication_refs(
+            keywords, params, matched_keywords, max_workers, window_days
+        )
+        # Publications are downloaded while the lists of later date windows
+        # are still being read and the ones already received are parsed
+        publications = fetch_complete_publications(
+            publication_refs, max_workers, archive
+        )
+    parsed = []
+    for ref, complete_publication_xml in metrics.timed(publications, "fetch"):
+        if complete_publication_xml:
+            with metrics.stage("parse"):
+                publication_data = parse_publication_xml(complete_publication_xml, "")
+            parsed.append((ref, publication_data))
+    # The keywords of a publication are known once all lists have been read
+    return [
+        publication_data._replace(keyword=", ".join(matched_keywords[ref]))
+        for ref, publication_data in parsed
+    ]
+
+
+def main(
+    config_path=r"C:\coding\test_Data\results\BBF_filter_config.ini",
+    max_workers=MAX_WORKERS,
+    archive_path=None,
+    replay=False,
+    window_days=WINDOW_DAYS,
+    index_path=None,
+):
     """
     Main function to fetch, parse, and save publication data to a CSV file.
+
+    Args:
+        config_path (str): The path to the filter configuration file.
+        max_workers (int): The maximum number of requests to amtsblattportal at the same time.
+        archive_path (str, optional): The archive of raw publications, read before downloading and filled with the downloads. Defaults to SHAB_ARCHIVE_PATH.
+        replay (bool): Rebuild the export from the archive, or search the index, without network access.
+        window_days (int): The number of days per publication list query.
+        index_path (str, optional): The full-text index to search the keywords in instead of the portal. Defaults to SHAB_INDEX_PATH.
     """
-    config = read_config(r"C:\coding\test_Data\results\BBF_filter_config.ini")
+    config = read_config(config_path)
 
     keywords = config.get("FilterParams", "keywords").split(",")
     publication_date_daily = config.get(
@@ -32,33 +86,38 @@ def main():
     sub_rubrics = config.get("FilterParams", "subRubrics")
     publication_states = config.get("FilterParams", "publicationStates")
 
-    complete_publications = []
-
-    for keyword in keywords:
-        params = {
-            "keyword": keyword.strip(),
-            "publicationDate.start": start_date,
-            "publicationDate.end": end_date,
-            "subRubrics": sub_rubrics,
-            "publicationStates": publication_states,
-        }
+    params = {
+        "publicationDate.start": start_date,
+        "publicationDate.end": end_date,
+        "subRubrics": sub_rubrics,
+        "publicationStates": publication_states,
+    }
+    if archive_path is None:
+        archive_path = os.environ.get("SHAB_ARCHIVE_PATH")
+    if index_path is None:
+        index_path = os.environ.get("SHAB_INDEX_PATH")
+    if replay and not archive_path and not index_path:
+        raise ValueError("Replaying an export requires an archive or index path")
+    archive = PublicationArchive(archive_path) if archive_path else None
+    keywords = [keyword.strip() for keyword in keywords]
 
-        publication_list_xml = fetch_publication_list(params)
-        if publication_list_xml:
-            root = ElementTree.fromstring(publication_list_xml)
-            publication_refs = [
-                pub.get("ref")
-                for pub in root.findall(".//publication")
-                if pub.get("ref")
-            ]
-
-            for ref in publication_refs:
-                complete_publication_xml = fetch_complete_publication(ref)
-                if complete_publication_xml:
-                    publication_data = parse_publication_xml(
-                        complete_publication_xml, keyword.strip()
-                    )
-                    complete_publications.append(publication_data)
+    if index_path:
+        # The date range is swept once without keywords, then every keyword
+        # is searched locally
+        index = PublicationIndex(index_path)
+        if not replay:
+            update_index(index, params, max_workers, window_days, archive)
+        with metrics.stage("search"):
+            complete_publications = search_keywords(
+                index, keywords, start_date, end_date, sub_rubrics.split(",")
+            )
+        index.close()
+    else:
+        complete_publications = _search_portal(
+            keywords, params, max_workers, window_days, archive, replay
+        )
+    if archive is not None:
+        archive.close()
 
     start_date_formatted = datetime.strptime(start_date, "%Y-%m-%d").strftime("%Y%m%d")
     end_date_formatted = datetime.strptime(end_date, "%Y-%m-%d").strftime("%Y%m%d")
@@ -78,7 +137,10 @@ def main():
         "town",
         "purpose",
     ]
-    save_to_csv(complete_publications, csv_file_path, fieldnames)
+    with metrics.stage("write"):
+        save_to_csv(complete_publications, csv_file_path, fieldnames)
+    metrics.inc("rows_total", len(complete_publications))
+    metrics.export("shab_export")
 
 
 if __name__ == "__main__":
@@ -1,85 +1,107 @@
-import csv
+import json
 import os
 import sys
 from datetime import datetime, timedelta
-from xml.etree import ElementTree
 
-import requests
-
-# Base URL for fetching multiple publications
-BASE_URL = "https://amtsblattportal.ch/api/v1/publications/xml"
-
-
-def fetch_publication_list(params):
-    """Fetch the publication list based on the provided parameters."""
-    response = requests.get(BASE_URL, params=params)
-    if response.status_code == 200:
-        return response.content
-    else:
-        print(f"Error fetching publication list: {response.status_code}")
-        return None
-
-
-def fetch_complete_publication(publication_ref):
-    """Fetch the complete publication using the ref URL."""
-    response = requests.get(publication_ref)
-    if response.status_code == 200:
-        return response.content
-    else:
-        print(f"Error fetching publication: {response.status_code}")
-        return None
-
-
-def get_text(element, path):
-    """Helper function to get text from an XML element or return a default value."""
-    return element.findtext(path) if element is not None else "#"
-
-
-def parse_publication_xml(xml_content, keyword):
-    """Parse the complete publication XML and extract required information."""
-    root = ElementTree.fromstring(xml_content)
-    company = root.find(".//company")
-    address = root.find(".//address")
-    purpose = root.find(".//purpose")
-
-    data = {
-        "keyword": keyword,
-        "company": get_text(company, ".//name"),
-        "uid": get_text(company, ".//uid"),
-        "seat": get_text(company, ".//seat"),
-        "street": get_text(address, ".//street"),
-        "houseNumber": get_text(address, ".//houseNumber"),
-        "swissZipCode": get_text(address, ".//swissZipCode"),
-        "town": get_text(address, ".//town"),
-        "purpose": get_text(purpose, "."),
-    }
-
-    return data
-
-
-def save_to_csv(data, file_path, fieldnames):
-    """Save data to a CSV file."""
-    with open(file_path, "w", newline="", encoding="utf-8") as csv_file:
-        writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
-        writer.writeheader()
-        writer.writerows(data)
-
-
-def main():
-    if len(sys.argv) == 3:
-        start_date = sys.argv[1]
-        output_path = sys.argv[2]
+from ..metrics import _write_atomic, metrics
+from .archive import PublicationArchive
+from .utils import (
+    MAX_WORKERS,
+    WINDOW_DAYS,
+    fetch_complete_publications,
+    limit_connections,
+    parse_publication_xml,
+    save_to_csv,
+    unique_publication_refs,
+)
+
+
+def load_state(path):
+    """
+    Load the state of the previous runs.
+
+    Args:
+        path (str): The path to the state file.
+
+    Returns:
+        dict: The high-water mark ("highWaterMark", a YYYY-MM-DD date or None)
+        and the refs of the exported publications ("emitted", mapped to the
+        end date of the run that exported them).
+    """
+    if not os.path.exists(path):
+        return {"highWaterMark": None, "emitted": {}}
+    with open(path, "r", encoding="utf-8") as file:
+        return json.load(file)
+
+
+def save_state(path, state):
+    """
+    Save the state for the next run.
+
+    Args:
+        path (str): The path to the state file.
+        state (dict): The state, see `load_state`.
+    """
+    _write_atomic(path, json.dumps(state, indent=2, sort_keys=True))
+
+
+def _unseen(publication_refs, emitted):
+    for ref in publication_refs:
+        if ref in emitted:
+            metrics.inc("publications_skipped_total")
+        else:
+            yield ref
+
+
+def main(
+    argv=None,
+    max_workers=MAX_WORKERS,
+    state_path=None,
+    archive_path=None,
+    window_days=WINDOW_DAYS,
+):
+    """
+    Export the new SHAB entries published since the last run.
+
+    The state file remembers the date up to which the last run queried (the
+    high-water mark) and the publications it exported. Each run queries from
+    the high-water mark up to today and exports only publications no earlier
+    run exported, so a skipped run is caught up by the next one and no row is
+    exported twice. The start date is only used when there is no state yet.
+
+    Args:
+        argv (list, optional): The start date and the output path, prompted for if not given.
+        max_workers (int): The maximum number of requests to amtsblattportal at the same time.
+        state_path (str, optional): The path to the state file. Defaults to SHAB_STATE_PATH or "shab_daily_cron_state.json" in the output path.
+        archive_path (str, optional): The archive of raw publications, filled with the downloads. Defaults to SHAB_ARCHIVE_PATH.
+        window_days (int): The number of days per publication list query, for catching up after skipped runs.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) == 2:
+        start_date = argv[0]
+        output_path = argv[1]
     else:
         start_date = input(
-            "Enter start date (YYYY-MM-DD) or press Enter to use current date: "
+            "Enter start date (YYYY-MM-DD) or press Enter to continue from the last run: "
         )
-        if not start_date:
-            start_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
         output_path = input("Enter output path: ")
         if not output_path:
             print("Output path is required.")
             sys.exit(1)
 
+    if state_path is None:
+        state_path = os.environ.get(
+            "SHAB_STATE_PATH",
+            os.path.join(output_path, "shab_daily_cron_state.json"),
+        )
+    state = load_state(state_path)
+    if state["highWaterMark"]:
+        if start_date and start_date != state["highWaterMark"]:
+            print(f"Continuing from the last run on {state['highWaterMark']}.")
+        start_date = state["highWaterMark"]
+    elif not start_date:
+        start_date = (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d")
+
     try:
         datetime.strptime(start_date, "%Y-%m-%d")
     except ValueError:
@@ -91,33 +113,44 @@ def main():
         "Architekt, Architektur, Ingenieur, Ingenieurwesen, Generalunternehmung, Raumplanung, Bauleitung"
     ]
 
-    complete_publications = []
-
-    for keyword in keywords:
-        params = {
-            "keyword": keyword.strip(),
-            "publicationDate.start": start_date,
-            "publicationDate.end": end_date,
-            "subRubrics": "HR01",  # HR01 for new entries
-            "publicationStates": "PUBLISHED",  # mandatory for API
-        }
-
-        publication_list_xml = fetch_publication_list(params)
-        if publication_list_xml:
-            root = ElementTree.fromstring(publication_list_xml)
-            publication_refs = [
-                pub.get("ref")
-                for pub in root.findall(".//publication")
-                if pub.get("ref")
-            ]
-
-            for ref in publication_refs:
-                complete_publication_xml = fetch_complete_publication(ref)
-                if complete_publication_xml:
-                    publication_data = parse_publication_xml(
-                        complete_publication_xml, keyword.strip()
-                    )
-                    complete_publications.append(publication_data)
+    params = {
+        "publicationDate.start": start_date,
+        "publicationDate.end": end_date,
+        "subRubrics": "HR01",  # HR01 for new entries
+        "publicationStates": "PUBLISHED",  # mandatory for API
+    }
+    matched_keywords = {}
+    limit_connections(max_workers)
+    publication_refs = unique_publication_refs(
+        [keyword.strip() for keyword in keywords],
+        params,
+        matched_keywords,
+        max_workers,
+        window_days,
+    )
+    emitted = state["emitted"]
+    publication_refs = _unseen(publication_refs, emitted)
+
+    # Publications are downloaded concurrently while the lists are still being
+    # read and the ones already received are parsed
+    if archive_path is None:
+        archive_path = os.environ.get("SHAB_ARCHIVE_PATH")
+    archive = PublicationArchive(archive_path) if archive_path else None
+    publications = fetch_complete_publications(publication_refs, max_workers, archive)
+    parsed = []
+    failed = 0
+    for ref, complete_publication_xml in metrics.timed(publications, "fetch"):
+        if complete_publication_xml:
+            with metrics.stage("parse"):
+                publication_data = parse_publication_xml(complete_publication_xml, "")
+            parsed.append((ref, publication_data))
+        else:
+            failed += 1
+    # The keywords of a publication are known once all lists have been read
+    complete_publications = [
+        publication_data._replace(keyword=", ".join(matched_keywords[ref]))
+        for ref, publication_data in parsed
+    ]
 
     start_date_formatted = datetime.strptime(start_date, "%Y-%m-%d").strftime("%Y%m%d")
     start_date_formatted = datetime.strptime(end_date, "%Y-%m-%d").strftime("%Y%m%d")
@@ -136,7 +169,21 @@ def main():
         "town",
         "purpose",
     ]
-    save_to_csv(complete_publications, csv_file_path, fieldnames)
+    with metrics.stage("write"):
+        save_to_csv(complete_publications, csv_file_path, fieldnames)
+    metrics.inc("rows_total", len(complete_publications))
+    if archive is not None:
+        archive.close()
+
+    # After failed downloads the window is queried again, so they are retried
+    high_water_mark = start_date if failed else end_date
+    if failed:
+        print(f"{failed} publications could not be fetched and will be retried.")
+    # Publications older than the high-water mark are not listed again
+    emitted = {ref: date for ref, date in emitted.items() if date >= high_water_mark}
+    emitted.update((ref, end_date) for ref, _ in parsed)
+    save_state(state_path, {"highWaterMark": high_water_mark, "emitted": emitted})
+    metrics.export("shab_daily_cron")
 
 
 if __name__ == "__main__":
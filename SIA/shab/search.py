@@ -0,0 +1,321 @@
+# search.py
+import argparse
+import re
+import sqlite3
+import threading
+import time
+
+from ..metrics import metrics
+from .archive import publication_meta
+from .utils import (
+    MAX_WORKERS,
+    WINDOW_DAYS,
+    Publication,
+    fetch_complete_publications,
+    limit_connections,
+    list_publication_refs,
+    parse_publication_xml,
+)
+
+# The fields that are searched, the others are only stored
+TEXT_FIELDS = [
+    "company",
+    "seat",
+    "street",
+    "houseNumber",
+    "swissZipCode",
+    "town",
+    "purpose",
+]
+
+# A keyword with any of these is passed to FTS5 as a query of its own
+QUERY_SYNTAX = re.compile(r'\b(AND|OR|NOT|NEAR)\b|[*"():^]')
+
+
+def keyword_query(keyword):
+    """
+    Turn a keyword into an FTS5 query.
+
+    Plain keywords match words starting with each of their terms, so
+    "Architekt" also finds "Architektur". Keywords using the FTS5 query
+    syntax (AND, OR, NOT, NEAR, prefixes with *, phrases in quotes and
+    column filters) are used as they are.
+
+    Args:
+        keyword (str): The keyword, e.g. "Architekt" or "Architekt* NOT Landschaft*".
+
+    Returns:
+        str: The FTS5 query.
+    """
+    if QUERY_SYNTAX.search(keyword):
+        return keyword
+    return plain_query(keyword)
+
+
+def plain_query(keyword):
+    """
+    Turn a keyword into an FTS5 query that treats it as plain words.
+
+    Every term is quoted, so characters of the query syntax in the keyword
+    are not interpreted, and matches words starting with it.
+
+    Args:
+        keyword (str): The keyword, e.g. "Bau (Hochbau)".
+
+    Returns:
+        str: The FTS5 query, e.g. '"Bau"* "(Hochbau)"*'.
+    """
+    terms = keyword.split()
+    return " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+
+
+class PublicationIndex:
+    """
+    Local SQLite FTS5 full-text index of parsed SHAB publications.
+
+    The exported fields of each publication are stored with its publication
+    date and sub-rubric, and the company, seat, address and purpose are
+    indexed, so keyword filters run locally instead of as one portal search
+    per keyword.
+    """
+
+    def __init__(self, path):
+        """
+        Open (or create) the index database.
+
+        Args:
+            path (str): The path to the SQLite database file.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS publications (
+                id INTEGER PRIMARY KEY,
+                ref TEXT UNIQUE NOT NULL,
+                publication_date TEXT,
+                sub_rubric TEXT,
+                indexed_at REAL NOT NULL,
+                {", ".join(f"{field} TEXT" for field in Publication._fields[1:])}
+            )
+            """)
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS publications_date "
+            "ON publications (publication_date, sub_rubric)"
+        )
+        self._connection.execute(f"""
+            CREATE VIRTUAL TABLE IF NOT EXISTS publications_text USING fts5(
+                {", ".join(TEXT_FIELDS)},
+                content='publications',
+                content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )
+            """)
+        self._connection.commit()
+
+    def __contains__(self, ref):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM publications WHERE ref = ?", (ref,)
+            ).fetchone()
+        return row is not None
+
+    def add(self, ref, publication, publication_date=None, sub_rubric=None):
+        """
+        Add a publication to the index. Publications already indexed are kept.
+
+        Args:
+            ref (str): The reference URL of the publication.
+            publication (Publication): The parsed publication.
+            publication_date (str, optional): The publication date (YYYY-MM-DD).
+            sub_rubric (str, optional): The sub-rubric, e.g. "HR01".
+        """
+        fields = Publication._fields[1:]
+        values = [getattr(publication, field) for field in fields]
+        with self._lock:
+            cursor = self._connection.execute(
+                f"INSERT OR IGNORE INTO publications "
+                f"(ref, publication_date, sub_rubric, indexed_at, {', '.join(fields)}) "
+                f"VALUES ({', '.join('?' * (len(fields) + 4))})",
+                [ref, publication_date, sub_rubric, time.time()] + values,
+            )
+            if cursor.rowcount:
+                self._connection.execute(
+                    f"INSERT INTO publications_text (rowid, {', '.join(TEXT_FIELDS)}) "
+                    f"VALUES ({', '.join('?' * (len(TEXT_FIELDS) + 1))})",
+                    [cursor.lastrowid]
+                    + [getattr(publication, field) for field in TEXT_FIELDS],
+                )
+            self._connection.commit()
+
+    def get(self, ref):
+        """
+        Look up an indexed publication.
+
+        Args:
+            ref (str): The reference URL of the publication.
+
+        Returns:
+            Publication: The publication with an empty keyword, or None if it is not indexed.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {', '.join(Publication._fields[1:])} FROM publications "
+                "WHERE ref = ?",
+                (ref,),
+            ).fetchone()
+        return None if row is None else Publication("", *row)
+
+    def search(self, query, start_date=None, end_date=None, sub_rubrics=None):
+        """
+        Search the index.
+
+        Args:
+            query (str): The FTS5 query, see `keyword_query`.
+            start_date (str, optional): The first publication date (YYYY-MM-DD).
+            end_date (str, optional): The last publication date (YYYY-MM-DD).
+            sub_rubrics (list, optional): The sub-rubrics to include, e.g. ["HR01"]. None includes all.
+
+        Returns:
+            list: The reference URLs of the matching publications, ordered by publication date.
+        """
+        sql = (
+            "SELECT ref FROM publications_text "
+            "JOIN publications ON publications.id = publications_text.rowid "
+            "WHERE publications_text MATCH ?"
+        )
+        params = [query]
+        if start_date:
+            sql += " AND publication_date >= ?"
+            params.append(start_date)
+        if end_date:
+            sql += " AND publication_date <= ?"
+            params.append(end_date)
+        if sub_rubrics:
+            sql += f" AND sub_rubric IN ({', '.join('?' * len(sub_rubrics))})"
+            params.extend(sub_rubrics)
+        sql += " ORDER BY publication_date, publications.id"
+        with self._lock:
+            return [ref for (ref,) in self._connection.execute(sql, params)]
+
+    def close(self):
+        """
+        Close the database connection.
+        """
+        with self._lock:
+            self._connection.close()
+
+
+def update_index(
+    index, params, max_workers=MAX_WORKERS, window_days=WINDOW_DAYS, archive=None
+):
+    """
+    Add the publications of a date range that are not indexed yet.
+
+    The publication list is read once without keywords, so a date range
+    costs one sweep of the portal however many keywords are searched later.
+
+    Args:
+        index (PublicationIndex): The index to update.
+        params (dict): The parameters for the API request (date range, sub-rubrics, states).
+        max_workers (int): The maximum number of requests at the same time.
+        window_days (int): The number of days per publication list query.
+        archive (PublicationArchive, optional): The archive of raw publications.
+
+    Returns:
+        int: The number of publications added.
+    """
+    limit_connections(max_workers)
+    refs = (
+        ref
+        for ref in list_publication_refs(params, max_workers, window_days)
+        if ref not in index
+    )
+    publications = fetch_complete_publications(refs, max_workers, archive)
+    added = 0
+    for ref, xml_content in metrics.timed(publications, "fetch"):
+        if xml_content:
+            with metrics.stage("parse"):
+                publication = parse_publication_xml(xml_content, "")
+                publication_date, sub_rubric = publication_meta(xml_content)
+            index.add(ref, publication, publication_date, sub_rubric)
+            added += 1
+    return added
+
+
+def search_keywords(index, keywords, start_date, end_date, sub_rubrics=None):
+    """
+    Search the index for each keyword, like the portal search of the exporters.
+
+    A keyword that looks like a query but is not valid FTS5 syntax, e.g.
+    "Bau (Hochbau)" or "AG:", is searched as plain words. Empty keywords are
+    skipped.
+
+    Args:
+        index (PublicationIndex): The index to search.
+        keywords (list): The keywords, plain or in FTS5 query syntax, see `keyword_query`.
+        start_date (str): The first publication date (YYYY-MM-DD).
+        end_date (str): The last publication date (YYYY-MM-DD).
+        sub_rubrics (list, optional): The sub-rubrics to include, e.g. ["HR01"]. None includes all.
+
+    Returns:
+        list: The matching publications once each, with the keywords they matched,
+        ordered by the first keyword they matched, then by publication date.
+    """
+    matched_keywords = {}
+    for keyword in keywords:
+        if not keyword.strip():
+            continue
+        try:
+            refs = index.search(
+                keyword_query(keyword), start_date, end_date, sub_rubrics
+            )
+        except sqlite3.OperationalError as error:
+            print(f"Searching {keyword!r} as plain words ({error}).")
+            refs = index.search(plain_query(keyword), start_date, end_date, sub_rubrics)
+        for ref in refs:
+            matched_keywords.setdefault(ref, []).append(keyword)
+    return [
+        index.get(ref)._replace(keyword=", ".join(matched))
+        for ref, matched in matched_keywords.items()
+    ]
+
+
+def main():
+    """
+    Command line entry point for searching the index.
+    """
+    parser = argparse.ArgumentParser(
+        description="Search the local full-text index of SHAB publications."
+    )
+    parser.add_argument("index", help="The index database file.")
+    parser.add_argument(
+        "keywords",
+        nargs="+",
+        help='Plain keywords or FTS5 queries, e.g. "Architekt* NOT Landschaft*".',
+    )
+    parser.add_argument("--start", help="The first publication date (YYYY-MM-DD).")
+    parser.add_argument("--end", help="The last publication date (YYYY-MM-DD).")
+    parser.add_argument("--sub-rubrics", help="Comma-separated, e.g. HR01.")
+    args = parser.parse_args()
+
+    index = PublicationIndex(args.index)
+    start = time.perf_counter()
+    publications = search_keywords(
+        index,
+        args.keywords,
+        args.start,
+        args.end,
+        args.sub_rubrics.split(",") if args.sub_rubrics else None,
+    )
+    elapsed = time.perf_counter() - start
+    for publication in publications:
+        print(f"{publication.keyword}\t{publication.uid}\t{publication.company}")
+    print(f"{len(publications)} publications in {elapsed * 1000:.1f} ms.")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
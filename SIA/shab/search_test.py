@@ -0,0 +1,74 @@
+# search_test.py
+import pytest
+
+from SIA.shab.search import (
+    PublicationIndex,
+    keyword_query,
+    plain_query,
+    search_keywords,
+)
+from SIA.shab.utils import Publication
+
+
+def publication(company, purpose):
+    return Publication(
+        "", company, "CHE-1", "Bern", "Weg", "1", "3000", "Bern", purpose
+    )
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = PublicationIndex(str(tmp_path / "index.sqlite"))
+    index.add(
+        "a", publication("Muster AG", "Architektur und Bau"), "2024-01-02", "HR01"
+    )
+    index.add("b", publication("Beta GmbH", "Ingenieurwesen"), "2024-01-03", "HR01")
+    index.add("c", publication("Gamma AG", "Hochbau"), "2024-02-01", "HR02")
+    yield index
+    index.close()
+
+
+def test_keyword_query():
+    assert keyword_query("Architekt") == '"Architekt"*'
+    assert keyword_query("Bau Leitung") == '"Bau"* "Leitung"*'
+    assert keyword_query("Architekt* NOT Bau*") == "Architekt* NOT Bau*"
+    assert plain_query('Bau "Hoch') == '"Bau"* """Hoch"*'
+
+
+def test_search(index):
+    assert index.search(keyword_query("Architekt")) == ["a"]
+    assert index.search("Architektur OR Ingenieur*") == ["a", "b"]
+    assert index.search("purpose:Bau*") == ["a"]
+    assert index.search("Bau* OR Hochbau", "2024-01-01", "2024-01-31") == ["a"]
+    assert index.search("AG", sub_rubrics=["HR02"]) == ["c"]
+
+
+def test_search_keywords(index):
+    publications = search_keywords(
+        index, ["Ingenieur", "Muster", "Architekt"], "2024-01-01", "2024-12-31"
+    )
+    assert [(p.keyword, p.company) for p in publications] == [
+        ("Ingenieur", "Beta GmbH"),
+        ("Muster, Architekt", "Muster AG"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "keyword, companies",
+    [
+        ("AG:", ["Muster AG", "Gamma AG"]),
+        ("Bau (Hochbau", []),
+        ('Muster "AG', ["Muster AG"]),
+    ],
+)
+def test_search_keywords_falls_back_to_plain_words(index, keyword, companies):
+    publications = search_keywords(index, [keyword, ""], "2024-01-01", "2024-12-31")
+    assert [p.company for p in publications] == companies
+    assert all(p.keyword == keyword for p in publications)
+
+
+def test_add_keeps_indexed_publications(index):
+    index.add("a", publication("Other AG", "Handel"), "2024-01-02", "HR01")
+    assert index.get("a").company == "Muster AG"
+    assert "a" in index and "z" not in index
+    assert index.get("z") is None
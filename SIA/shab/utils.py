@@ -1,12 +1,124 @@
 # utils.py
 import csv
+import itertools
+import os
+import queue
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from xml.etree import ElementTree
 
 import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from lxml import etree as lxml_etree
+except ImportError:  # pragma: no cover - optional dependency
+    lxml_etree = None
+
+from ..metrics import metrics
 
 BASE_URL = "https://amtsblattportal.ch/api/v1/publications/xml"
 
+# Number of publications downloaded at the same time
+MAX_WORKERS = int(os.environ.get("SHAB_MAX_WORKERS", 8))
+
+# Publications per page of the publication list
+PAGE_SIZE = int(os.environ.get("SHAB_PAGE_SIZE", 500))
+
+# Days per query of the publication list, so long date ranges are listed concurrently
+WINDOW_DAYS = int(os.environ.get("SHAB_WINDOW_DAYS", 7))
+
+Publication = namedtuple(
+    "Publication",
+    [
+        "keyword",
+        "company",
+        "uid",
+        "seat",
+        "street",
+        "houseNumber",
+        "swissZipCode",
+        "town",
+        "purpose",
+    ],
+)
+Publication.__doc__ = """
+The fields of a publication exported to CSV.
+
+Args:
+    keyword (str): The keywords the publication matched.
+    company (str): The name of the company.
+    uid (str): The UID of the company.
+    seat (str): The seat of the company.
+    street (str): The street of the first address.
+    houseNumber (str): The house number of the first address.
+    swissZipCode (str): The zip code of the first address.
+    town (str): The town of the first address.
+    purpose (str): The purpose of the company.
+"""
+
+# The fields read from the first company and the first address of a
+# publication, by element tag
+SCOPE_FIELDS = {
+    "company": {"name": "company", "uid": "uid", "seat": "seat"},
+    "address": {
+        "street": "street",
+        "houseNumber": "houseNumber",
+        "swissZipCode": "swissZipCode",
+        "town": "town",
+    },
+}
+SCOPE_TAGS = ("company", "address", "purpose")
+
+if lxml_etree is not None:
+    _lxml_parser = lxml_etree.XMLParser(resolve_entities=False)
+else:
+    _lxml_parser = None
+
+# Keep-alive session shared by all requests, see `limit_connections`
+session = requests.Session()
+
+
+def limit_connections(max_workers=MAX_WORKERS):
+    """
+    Cap the number of requests in flight across all threads.
+
+    The session keeps at most `max_workers` connections, and a request waits
+    for a free connection, so listing and fetching together never exceed the
+    cap however many threads they use.
+
+    Args:
+        max_workers (int): The maximum number of concurrent requests.
+    """
+    adapter = HTTPAdapter(
+        pool_connections=max_workers, pool_maxsize=max_workers, pool_block=True
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+limit_connections()
+
+
+def _get(url, params=None, stream=False):
+    start = time.perf_counter()
+    try:
+        response = session.get(url, params=params, stream=stream)
+    except Exception:
+        metrics.observe_request(url, time.perf_counter() - start)
+        raise
+    if stream:
+        # The body has not been read yet, so count what the server announced
+        size = int(response.headers.get("Content-Length", 0))
+    else:
+        size = len(response.content)
+    metrics.observe_request(
+        url, time.perf_counter() - start, response.status_code, size
+    )
+    return response
+
 
 def fetch_publication_list(params):
     """
@@ -18,7 +130,7 @@ def fetch_publication_list(params):
     Returns:
         str: The XML content of the publication list.
     """
-    response = requests.get(BASE_URL, params=params)
+    response = _get(BASE_URL, params=params)
     if response.status_code == 200:
         return response.content
     else:
@@ -26,6 +138,179 @@ def fetch_publication_list(params):
         return None
 
 
+def _iter_elements(source, tag):
+    # Yield the elements with the tag as they are parsed, then free each one
+    # and its finished siblings, wherever they sit in the document
+    if lxml_etree is not None:
+        for _, element in lxml_etree.iterparse(
+            source, events=("end",), tag=tag, resolve_entities=False
+        ):
+            yield element
+            element.clear()
+            while element.getprevious() is not None:
+                del element.getparent()[0]
+        return
+    parents = []
+    for event, element in ElementTree.iterparse(source, events=("start", "end")):
+        if event == "start":
+            parents.append(element)
+            continue
+        parents.pop()
+        if element.tag == tag:
+            yield element
+            element.clear()
+            if parents:
+                parents[-1].remove(element)
+
+
+def iter_publication_refs(params, page_size=PAGE_SIZE):
+    """
+    Walk all pages of the publication list and yield the publication refs.
+
+    Each page is parsed incrementally while it is downloaded, with lxml when
+    it is installed, and parsed publications are freed right away, so memory
+    use does not grow with the size of the list. Refs are yielded as soon as
+    they are read.
+
+    Args:
+        params (dict): The parameters for the API request.
+        page_size (int): The number of publications per page.
+
+    Yields:
+        str: The reference URL of each publication.
+    """
+    first_ref = None
+    for page in itertools.count():
+        page_params = dict(
+            params, **{"pageRequest.page": page, "pageRequest.size": page_size}
+        )
+        response = _get(BASE_URL, params=page_params, stream=True)
+        if response.status_code != 200:
+            print(f"Error fetching publication list: {response.status_code}")
+            response.close()
+            return
+
+        count = 0
+        with response:
+            response.raw.decode_content = True
+            for element in _iter_elements(response.raw, "publication"):
+                ref = element.get("ref")
+                if count == 0:
+                    # A server ignoring the page parameters repeats the first page
+                    if ref is not None and ref == first_ref:
+                        return
+                    first_ref = ref
+                count += 1
+                if ref:
+                    yield ref
+        if count < page_size:
+            return
+
+
+def split_date_range(params, window_days=WINDOW_DAYS):
+    """
+    Split the date range of publication list parameters into windows.
+
+    Args:
+        params (dict): The parameters for the API request, with "publicationDate.start" and "publicationDate.end".
+        window_days (int): The number of days per window.
+
+    Returns:
+        list: The parameters of each window, in date order. Parameters without a complete date range are returned as is.
+    """
+    start = params.get("publicationDate.start")
+    end = params.get("publicationDate.end")
+    if not start or not end:
+        return [params]
+    day = datetime.strptime(start, "%Y-%m-%d")
+    last_day = datetime.strptime(end, "%Y-%m-%d")
+    windows = []
+    while day <= last_day:
+        window_end = min(day + timedelta(days=window_days - 1), last_day)
+        windows.append(
+            dict(
+                params,
+                **{
+                    "publicationDate.start": day.strftime("%Y-%m-%d"),
+                    "publicationDate.end": window_end.strftime("%Y-%m-%d"),
+                },
+            )
+        )
+        day = window_end + timedelta(days=1)
+    return windows or [params]
+
+
+def list_publication_refs(params, max_workers=MAX_WORKERS, window_days=WINDOW_DAYS):
+    """
+    List the publication refs of a date range, querying its windows concurrently.
+
+    The refs of the earliest window still being read are yielded as soon as
+    they are parsed, see `ordered_chain`.
+
+    Args:
+        params (dict): The parameters for the API request.
+        max_workers (int): The maximum number of windows listed at the same time.
+        window_days (int): The number of days per window.
+
+    Yields:
+        str: The reference URL of each publication, in window order.
+    """
+    windows = split_date_range(params, window_days)
+    yield from ordered_chain(iter_publication_refs, windows, max_workers)
+
+
+def unique_publication_refs(
+    keywords,
+    params,
+    matched_keywords,
+    max_workers=MAX_WORKERS,
+    window_days=WINDOW_DAYS,
+):
+    """
+    Query the publication list for each keyword and yield every publication once.
+
+    The date range is split into windows and the windows of all keywords are
+    listed concurrently. The lists are merged in keyword order, then window
+    order, so the result does not depend on which query finishes first. The
+    refs of the first list still being read are yielded as soon as they are
+    parsed, so fetching starts before listing has finished.
+
+    A publication matching several keywords is yielded the first time it is
+    listed, so it is only fetched and written once. The keywords it matched
+    are collected in `matched_keywords`, which is complete once the generator
+    is exhausted.
+
+    Args:
+        keywords (list): The keywords to search for.
+        params (dict): The other parameters for the API request (date range, sub-rubrics, states).
+        matched_keywords (dict): Filled with the reference URL of each publication mapped to the keywords it matched.
+        max_workers (int): The maximum number of lists queried at the same time.
+        window_days (int): The number of days per query.
+
+    Yields:
+        str: The reference URL of each publication, in the order it was first listed.
+    """
+    windows = split_date_range(params, window_days)
+    queries = [(keyword, window) for keyword in keywords for window in windows]
+    listed = ordered_chain(
+        lambda query: (
+            (query[0], ref)
+            for ref in iter_publication_refs(dict(query[1], keyword=query[0]))
+        ),
+        queries,
+        max_workers,
+    )
+    for keyword, ref in listed:
+        matched = matched_keywords.get(ref)
+        if matched is None:
+            matched_keywords[ref] = [keyword]
+            yield ref
+            continue
+        metrics.inc("publications_deduplicated_total")
+        if keyword not in matched:
+            matched.append(keyword)
+
+
 def fetch_complete_publication(publication_ref):
     """
     Fetch the complete publication using the ref URL.
@@ -36,7 +321,7 @@ def fetch_complete_publication(publication_ref):
     Returns:
         str: The XML content of the complete publication.
     """
-    response = requests.get(publication_ref)
+    response = _get(publication_ref)
     if response.status_code == 200:
         return response.content
     else:
@@ -44,6 +329,126 @@ def fetch_complete_publication(publication_ref):
         return None
 
 
+def ordered_map(function, items, max_workers=MAX_WORKERS):
+    """
+    Apply a function to items on a thread pool and yield the results in order.
+
+    At most `max_workers` calls run at a time and only a few results are
+    buffered, so the items can come from a generator and the caller can
+    process each result while the next ones are still running.
+
+    Args:
+        function (function): The function to apply, e.g. `fetch_complete_publication`.
+        items (iterable): The items to apply the function to.
+        max_workers (int): The maximum number of concurrent calls.
+
+    Yields:
+        The result of the function for each item, in the order of the items.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= 2 * max_workers:
+                yield pending.popleft().result()
+            # Hand out finished results while the items are still coming in
+            while pending and pending[0].done():
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def _produce(function, item, output):
+    try:
+        for value in function(item):
+            output.put((True, value))
+    except BaseException as error:
+        output.put((False, error))
+    else:
+        output.put((False, None))
+
+
+def ordered_chain(function, items, max_workers=MAX_WORKERS):
+    """
+    Run a generator function for items on a thread pool and chain the values in order.
+
+    Up to `max_workers` generators run at a time. The values of the first
+    unfinished generator are yielded as soon as it produces them, while the
+    later ones run ahead and buffer their values until it is their turn. The
+    buffers are not bounded, so a generator running ahead never waits for the
+    caller while holding a connection of the session.
+
+    Args:
+        function (function): The generator function, e.g. `iter_publication_refs`.
+        items (iterable): The items to run the generator function for.
+        max_workers (int): The maximum number of generators running at the same time.
+
+    Yields:
+        The values of the generator of each item, in the order of the items.
+    """
+    items = iter(items)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+
+        def submit():
+            for item in items:
+                output = queue.Queue()
+                executor.submit(_produce, function, item, output)
+                pending.append(output)
+                return
+
+        for _ in range(max_workers):
+            submit()
+        while pending:
+            output = pending.popleft()
+            while True:
+                ok, value = output.get()
+                if not ok:
+                    break
+                yield value
+            if value is not None:
+                raise value
+            submit()
+
+
+def fetch_complete_publications(
+    publication_refs, max_workers=MAX_WORKERS, archive=None
+):
+    """
+    Fetch complete publications concurrently over the pooled session.
+
+    With an archive, archived publications are read from it instead of being
+    downloaded, and downloaded publications are added to it.
+
+    Args:
+        publication_refs (iterable): The reference URLs of the publications.
+        max_workers (int): The maximum number of concurrent downloads.
+        archive (PublicationArchive, optional): The archive of raw publications.
+
+    Returns:
+        iterable: The reference URL and the XML content (None if it could not be
+        fetched) of each publication, in the order of `publication_refs`.
+    """
+    if archive is None:
+        return ordered_map(
+            lambda ref: (ref, fetch_complete_publication(ref)),
+            publication_refs,
+            max_workers,
+        )
+
+    def fetch(ref):
+        xml_content = archive.get(ref)
+        if xml_content is not None:
+            metrics.inc("archive_hits_total")
+            return ref, xml_content
+        xml_content = fetch_complete_publication(ref)
+        if xml_content:
+            archive.put(ref, xml_content)
+        return ref, xml_content
+
+    return ordered_map(fetch, publication_refs, max_workers)
+
+
 def get_text(element, path):
     """
     Helper function to get text from an XML element or return a default value.
@@ -58,35 +463,75 @@ def get_text(element, path):
     return element.findtext(path) if element is not None else "#"
 
 
-def parse_publication_xml(xml_content, keyword):
+def _first_elements(root):
+    # One walk over the tree, stopping once the first company, address and
+    # purpose have all been found
+    found = {}
+    for element in root.iter():
+        if element.tag in SCOPE_TAGS and element.tag not in found:
+            found[element.tag] = element
+            if len(found) == len(SCOPE_TAGS):
+                break
+    return found
+
+
+def extract_publication(root, keyword):
     """
-    Parse the complete publication XML and extract required information.
+    Extract the exported fields from a parsed publication.
+
+    The fields are read from the first company, the first address and the
+    first purpose of the publication, in one walk over the tree and one walk
+    over each of the company and the address. Fields of a missing company or
+    address and a missing purpose are "#", fields missing from a company or
+    address are empty.
 
     Args:
-        xml_content (str): The XML content of the publication.
+        root (Element): The root element of the publication, from ElementTree or lxml.
         keyword (str): The keyword used for the search.
 
     Returns:
-        dict: A dictionary containing the extracted information.
+        Publication: The extracted information.
     """
-    root = ElementTree.fromstring(xml_content)
-    company = root.find(".//company")
-    address = root.find(".//address")
-    purpose = root.find(".//purpose")
+    found = _first_elements(root)
+
+    values = {"keyword": keyword}
+    for scope, fields in SCOPE_FIELDS.items():
+        element = found.get(scope)
+        if element is None:
+            values.update((field, "#") for field in fields.values())
+            continue
+        values.update((field, "") for field in fields.values())
+        remaining = set(fields)
+        for child in element.iter():
+            if child.tag in remaining:
+                remaining.discard(child.tag)
+                values[fields[child.tag]] = child.text or ""
+                if not remaining:
+                    break
+    purpose = found.get("purpose")
+    values["purpose"] = "#" if purpose is None else purpose.text or ""
+    return Publication(**values)
+
 
-    data = {
-        "keyword": keyword,
-        "company": company.findtext(".//name", ""),
-        "uid": company.findtext(".//uid", ""),
-        "seat": company.findtext(".//seat", ""),
-        "street": address.findtext(".//street", ""),
-        "houseNumber": address.findtext(".//houseNumber", ""),
-        "swissZipCode": address.findtext(".//swissZipCode", ""),
-        "town": address.findtext(".//town", ""),
-        "purpose": purpose.findtext(".", "#") if purpose is not None else "#",
-    }
+def parse_publication_xml(xml_content, keyword):
+    """
+    Parse the complete publication XML and extract required information.
 
-    return data
+    The XML is parsed with lxml when it is installed, else with ElementTree.
+
+    Args:
+        xml_content (bytes): The XML content of the publication.
+        keyword (str): The keyword used for the search.
+
+    Returns:
+        Publication: The extracted information, see `extract_publication`.
+    """
+    if lxml_etree is None:
+        return extract_publication(ElementTree.fromstring(xml_content), keyword)
+    if isinstance(xml_content, str):
+        xml_content = xml_content.encode("utf-8")
+    root = lxml_etree.fromstring(xml_content, parser=_lxml_parser)
+    return extract_publication(root, keyword)
 
 
 def save_to_csv(data, file_path, fieldnames):
@@ -94,7 +539,7 @@ def save_to_csv(data, file_path, fieldnames):
     Save data to a CSV file.
 
     Args:
-        data (list): The data to save.
+        data (list): The data to save, as dictionaries or Publication records.
         file_path (str): The path to the CSV file.
         fieldnames (list): The field names for the CSV file.
 
@@ -104,4 +549,6 @@ def save_to_csv(data, file_path, fieldnames):
     with open(file_path, "w", newline="", encoding="utf-8") as csv_file:
         writer = csv.DictWriter(csv_file, fieldnames=fieldnames)
         writer.writeheader()
-        writer.writerows(data)
+        writer.writerows(
+            row._asdict() if isinstance(row, Publication) else row for row in data
+        )
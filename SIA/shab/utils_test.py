@@ -0,0 +1,142 @@
+# utils_test.py
+import io
+import threading
+
+import pytest
+
+from SIA.shab import utils
+from SIA.shab.utils import iter_publication_refs, ordered_chain, split_date_range
+
+PARSERS = ["elementtree"] + (["lxml"] if utils.lxml_etree is not None else [])
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, body):
+        self.raw = io.BytesIO(body)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def publication_list(refs, wrapper=None):
+    publications = "".join(
+        f'<publication ref="{ref}"><meta><id>{ref}</id></meta></publication>'
+        for ref in refs
+    )
+    if wrapper:
+        publications = f"<{wrapper}>{publications}</{wrapper}>"
+    return f'<?xml version="1.0"?><bulk-export>{publications}</bulk-export>'.encode()
+
+
+@pytest.fixture(params=PARSERS)
+def parser(request, monkeypatch):
+    if request.param == "elementtree":
+        monkeypatch.setattr(utils, "lxml_etree", None)
+    return request.param
+
+
+@pytest.fixture
+def portal(parser, monkeypatch):
+    requests = []
+
+    def serve(refs, paginate=True, wrapper=None):
+        def get(url, params=None, stream=False):
+            requests.append(params)
+            page, size = params["pageRequest.page"], params["pageRequest.size"]
+            page_refs = refs[page * size : (page + 1) * size] if paginate else refs
+            return FakeResponse(publication_list(page_refs, wrapper))
+
+        monkeypatch.setattr(utils, "_get", get)
+        return requests
+
+    return serve
+
+
+def test_iter_publication_refs_reads_all_pages(portal):
+    refs = [f"ref{i}" for i in range(7)]
+    requests = portal(refs)
+    assert list(iter_publication_refs({"keyword": "Bau"}, page_size=3)) == refs
+    assert [params["pageRequest.page"] for params in requests] == [0, 1, 2]
+    assert all(params["keyword"] == "Bau" for params in requests)
+
+
+def test_iter_publication_refs_stops_after_a_full_last_page(portal):
+    refs = [f"ref{i}" for i in range(6)]
+    requests = portal(refs)
+    assert list(iter_publication_refs({}, page_size=3)) == refs
+    assert len(requests) == 3
+
+
+def test_iter_publication_refs_without_paging_on_the_server(portal):
+    refs = [f"ref{i}" for i in range(5)]
+    requests = portal(refs, paginate=False)
+    assert list(iter_publication_refs({}, page_size=3)) == refs
+    assert len(requests) == 2
+
+
+def test_iter_elements_frees_nested_publications(parser):
+    body = publication_list([f"ref{i}" for i in range(3)], wrapper="publications")
+    elements = list(utils._iter_elements(io.BytesIO(body), "publication"))
+    # The publications are emptied once the caller moves on
+    assert [len(element) for element in elements] == [0, 0, 0]
+    if parser == "lxml":
+        # Only the last publication is still attached to the wrapper
+        assert len(elements[-1].getparent()) == 1
+
+
+@pytest.mark.parametrize("wrapper", [None, "publications"])
+def test_iter_publication_refs_nested(portal, wrapper):
+    refs = [f"ref{i}" for i in range(4)]
+    portal(refs, wrapper=wrapper)
+    assert list(iter_publication_refs({}, page_size=10)) == refs
+
+
+def test_ordered_chain_streams_the_first_generator():
+    release = threading.Event()
+
+    def generate(item):
+        yield item * 10
+        if item == 0:
+            # The first generator is still running when its value is taken
+            assert release.wait(5)
+        yield item * 10 + 1
+
+    chained = ordered_chain(generate, range(3), max_workers=2)
+    assert next(chained) == 0
+    release.set()
+    assert list(chained) == [1, 10, 11, 20, 21]
+
+
+def test_ordered_chain_raises_the_errors_of_the_generators():
+    def generate(item):
+        yield item
+        if item == 1:
+            raise ValueError(item)
+
+    chained = ordered_chain(generate, range(3), max_workers=2)
+    assert [next(chained), next(chained)] == [0, 1]
+    with pytest.raises(ValueError):
+        next(chained)
+
+
+def test_split_date_range():
+    params = {
+        "publicationDate.start": "2024-01-01",
+        "publicationDate.end": "2024-01-10",
+        "subRubrics": "HR01",
+    }
+    windows = split_date_range(params, 7)
+    assert [
+        (window["publicationDate.start"], window["publicationDate.end"])
+        for window in windows
+    ] == [("2024-01-01", "2024-01-07"), ("2024-01-08", "2024-01-10")]
+    assert all(window["subRubrics"] == "HR01" for window in windows)
+    assert split_date_range({"keyword": "Bau"}) == [{"keyword": "Bau"}]